@@ -1,11 +1,14 @@
 from pathlib import Path
 from fastapi import FastAPI, Request, HTTPException
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from prometheus_fastapi_instrumentator import Instrumentator
 
 from .routes import enroll, consent, auth, users
 from .routes import caption_ws
+from .utils import offload
+from src.embeddings import get_embedding_service
 from .firebase_client import auth as fb_auth, firebase_admin  # NEW
 from firebase_admin import exceptions as fb_exc               # NEW
 
@@ -59,6 +62,26 @@ async def session_middleware(request: Request, call_next):
 async def health() -> dict[str, str]:
     return {"status": "ok"}
 
+# ───────────────────────────────────────── offload pools
+@app.exception_handler(offload.PoolSaturated)
+async def pool_saturated(request: Request, exc: offload.PoolSaturated):
+    # Shed load instead of queueing without bound; clients retry
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "1"})
+
+@app.get("/status/offload")
+async def offload_status() -> dict:
+    """Saturation of the blocking-I/O thread pool and the CPU process pool."""
+    return offload.stats()
+
+@app.get("/status/embeddings")
+async def embeddings_status() -> dict:
+    """Per-backend batch counters, including face encodings on the CPU pool."""
+    return get_embedding_service().stats()
+
+@app.on_event("shutdown")
+def shutdown_offload() -> None:
+    offload.shutdown()
+
 # ───────────────────────────────────────── routers
 app.include_router(enroll.router,  prefix="/enroll")
 app.include_router(consent.router, prefix="/consent")
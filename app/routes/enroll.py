@@ -1,3 +1,4 @@
+import asyncio
 import uuid
 from pathlib import Path
 from datetime import date
@@ -5,13 +6,14 @@ from datetime import date
 from fastapi import APIRouter, File, UploadFile, HTTPException, Depends
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-import requests
 import numpy as np
-import face_recognition
 
+from src.embeddings import get_embedding_service
 from ..database import get_session
 from ..models import User, VoiceSample, FaceSample
 from ..utils.encryption import encrypt_file, encrypt_bytes, decrypt_bytes
+from ..utils.fetch import get_fetcher
+from ..utils import offload
 from ..utils.whisper_worker import transcribe_voice, speaker_job, face_job
 from ..utils import tts
 
@@ -23,6 +25,16 @@ UPLOAD_ROOT = Path('uploads')
 VOICE_ROOT = UPLOAD_ROOT / 'voice'
 FACE_ROOT = UPLOAD_ROOT / 'face'
 
+def _embeddings():
+    """The shared embedding service, with face batches on the offload CPU pool.
+
+    Face encodings hold the GIL for seconds; the process pool loads dlib once
+    per process and the service still counts the batches.
+    """
+    service = get_embedding_service()
+    service.route('face', offload.cpu_pool)
+    return service
+
 class Prefs(BaseModel):
     name: str | None = None
     greeting: str | None = None
@@ -36,6 +48,28 @@ class FaceRequest(BaseModel):
     user_id: str
     urls: list[str]
 
+def _exists(db: Session, model, user_id: str) -> bool:
+    return db.query(model).filter_by(user_id=user_id).first() is not None
+
+def _save(db: Session, row) -> None:
+    db.add(row)
+    db.commit()
+
+def _store_encrypted(raw: Path, data: bytes) -> str:
+    """Write ``data`` to ``raw``, encrypt it beside it and return that path."""
+    raw.parent.mkdir(parents=True, exist_ok=True)
+    with open(raw, 'wb') as fh:
+        fh.write(data)
+    enc = raw.with_suffix('.enc')
+    encrypt_file(str(raw), str(enc))
+    return str(enc)
+
+def _save_embedding(user_id: str, emb: np.ndarray) -> str:
+    EMBED_ROOT.mkdir(parents=True, exist_ok=True)
+    emb_path = EMBED_ROOT / f"{user_id}.npy"
+    np.save(emb_path, emb)
+    return str(emb_path)
+
 @router.post('/voice/{user_id}')
 async def enroll_voice(
     user_id: str, file: UploadFile | None = File(None), db: Session = Depends(get_session),
@@ -51,22 +85,15 @@ async def enroll_voice(
     if file.content_type != 'audio/wav':
         raise HTTPException(status_code=400, detail='invalid file')
 
+    # Database, disk and broker calls block, so they run on the I/O pool
     # Always use string user_id in the DB to match your model definition
-    if db.query(VoiceSample).filter_by(user_id=user_id).first():
+    if await offload.run_io(_exists, db, VoiceSample, user_id):
         raise HTTPException(status_code=409, detail='already enrolled')
 
-    user_dir = MEDIA_ROOT / user_id
-    user_dir.mkdir(parents=True, exist_ok=True)
-    raw_path = user_dir / 'voice.wav'
     data = await file.read()
-    with open(raw_path, 'wb') as fh:
-        fh.write(data)
-    enc_path = raw_path.with_suffix('.enc')
-    encrypt_file(str(raw_path), str(enc_path))
-    voice_sample = VoiceSample(user_id=user_id, file_path=str(enc_path))
-    db.add(voice_sample)
-    db.commit()
-    transcribe_voice.delay(str(enc_path), user_id)
+    enc_path = await offload.run_io(_store_encrypted, MEDIA_ROOT / user_id / 'voice.wav', data)
+    await offload.run_io(_save, db, VoiceSample(user_id=user_id, file_path=enc_path))
+    await offload.run_io(transcribe_voice.delay, enc_path, user_id)
     return {"message": "queued"}
 
 @router.post('/face/{user_id}')
@@ -83,37 +110,28 @@ async def enroll_face(
         raise HTTPException(status_code=400, detail='invalid user id')
     if not front or not left or not right:
         raise HTTPException(status_code=400, detail='missing images')
-    user_dir = MEDIA_ROOT / user_id
-    user_dir.mkdir(parents=True, exist_ok=True)
-    if db.query(FaceSample).filter_by(user_id=user_id).first():
+    if await offload.run_io(_exists, db, FaceSample, user_id):
         raise HTTPException(status_code=409, detail='already enrolled')
-    paths = {}
-    for name, file in [('front', front), ('left', left), ('right', right)]:
-        if file.content_type != 'image/jpeg':
-            raise HTTPException(status_code=400, detail='images must be jpeg')
-        raw = user_dir / f"{name}.jpg"
-        data = await file.read()
-        with open(raw, 'wb') as fh:
-            fh.write(data)
-        enc = raw.with_suffix('.enc')
-        encrypt_file(str(raw), str(enc))
-        paths[name] = str(enc)
-    # Embeddings
-    img = face_recognition.load_image_file(str(user_dir / 'front.jpg'))
-    encodings = face_recognition.face_encodings(img)
-    emb = encodings[0] if encodings else np.zeros(128)
-    EMBED_ROOT.mkdir(parents=True, exist_ok=True)
-    emb_path = EMBED_ROOT / f"{user_id}.npy"
-    np.save(emb_path, emb)
+    files = [('front', front), ('left', left), ('right', right)]
+    if any(file.content_type != 'image/jpeg' for _, file in files):
+        raise HTTPException(status_code=400, detail='images must be jpeg')
+    user_dir = MEDIA_ROOT / user_id
+    images = {name: await file.read() for name, file in files}
+    # The front image is encoded in the process pool while the three
+    # images are written and encrypted on the I/O pool
+    encoded = _embeddings().aembed_many('face', [images['front']])
+    stored = [offload.run_io(_store_encrypted, user_dir / f"{name}.jpg", data) for name, data in images.items()]
+    (emb,), *enc_paths = await asyncio.gather(encoded, *stored)
+    paths = dict(zip(images, enc_paths))
+    emb_path = await offload.run_io(_save_embedding, user_id, emb)
     sample = FaceSample(
         user_id=user_id,
         front_path=paths['front'],
         left_path=paths['left'],
         right_path=paths['right'],
-        embeddings_path=str(emb_path),
+        embeddings_path=emb_path,
     )
-    db.add(sample)
-    db.commit()
+    await offload.run_io(_save, db, sample)
     return {"message": "faces stored"}
 
 @router.post('/prefs/{user_id}')
@@ -160,28 +178,38 @@ async def enroll_init(db: Session = Depends(get_session)):
     db.commit()
     return {"user_id": user_id}
 
+def _get_user(db: Session, user_id: str) -> User | None:
+    return db.query(User).filter_by(id=user_id).first()
+
+def _store_voice_upload(voice_dir: Path, body: bytes) -> tuple[str, str]:
+    voice_dir.mkdir(parents=True, exist_ok=True)
+    enc_path = voice_dir / 'voice.enc'
+    enc_path.write_bytes(body)
+    wav_path = voice_dir / 'voice.wav'
+    wav_path.write_bytes(decrypt_bytes(body))
+    return str(enc_path), str(wav_path)
+
+def _store_face_uploads(face_dir: Path, images: dict[str, bytes]) -> list[str]:
+    face_dir.mkdir(parents=True, exist_ok=True)
+    enc_paths = []
+    for name, body in images.items():
+        path = face_dir / f'{name}.enc'
+        path.write_bytes(encrypt_bytes(body))
+        enc_paths.append(str(path))
+    return enc_paths
+
 @router.post('/voice')
 async def upload_voice(payload: VoiceRequest, db: Session = Depends(get_session)):
     """Fetch encrypted audio from TUS URL, decrypt, store and enqueue job."""
-    user = db.query(User).filter_by(id=payload.user_id).first()
-    if not user:
+    if not await offload.run_io(_get_user, db, payload.user_id):
         raise HTTPException(status_code=404, detail='user not found')
-    voice_dir = VOICE_ROOT / payload.user_id
-    voice_dir.mkdir(parents=True, exist_ok=True)
     try:
-        resp = requests.get(payload.tus_url, timeout=10)
-        resp.raise_for_status()
+        body = await get_fetcher().fetch(payload.tus_url)
     except Exception as exc:
         raise HTTPException(status_code=400, detail=f'failed to fetch audio: {exc}')
-    enc_path = voice_dir / 'voice.enc'
-    enc_path.write_bytes(resp.content)
-    dec_data = decrypt_bytes(resp.content)
-    wav_path = voice_dir / 'voice.wav'
-    wav_path.write_bytes(dec_data)
-    sample = VoiceSample(user_id=payload.user_id, file_path=str(enc_path))
-    db.add(sample)
-    db.commit()
-    speaker_job.delay(str(wav_path), payload.user_id)
+    enc_path, wav_path = await offload.run_io(_store_voice_upload, VOICE_ROOT / payload.user_id, body)
+    await offload.run_io(_save, db, VoiceSample(user_id=payload.user_id, file_path=enc_path))
+    await offload.run_io(speaker_job.delay, wav_path, payload.user_id)
     return {"message": "queued"}
 
 @router.post('/face')
@@ -189,31 +217,24 @@ async def upload_face(payload: FaceRequest, db: Session = Depends(get_session)):
     """Fetch face images, encrypt them and enqueue processing job."""
     if len(payload.urls) != 3:
         raise HTTPException(status_code=400, detail='expected three urls')
-    user = db.query(User).filter_by(id=payload.user_id).first()
-    if not user:
+    if not await offload.run_io(_get_user, db, payload.user_id):
         raise HTTPException(status_code=404, detail='user not found')
-    face_dir = FACE_ROOT / payload.user_id
-    face_dir.mkdir(parents=True, exist_ok=True)
     names = ['front', 'left', 'right']
-    enc_paths = []
-    for name, url in zip(names, payload.urls):
-        try:
-            resp = requests.get(url, timeout=10)
-            resp.raise_for_status()
-        except Exception as exc:
-            raise HTTPException(status_code=400, detail=f'failed to fetch {name}: {exc}')
-        enc_data = encrypt_bytes(resp.content)
-        path = face_dir / f'{name}.enc'
-        path.write_bytes(enc_data)
-        enc_paths.append(str(path))
+    # All three images are downloaded at once over the shared pool
+    bodies = await get_fetcher().fetch_all(payload.urls, return_exceptions=True)
+    for name, body in zip(names, bodies):
+        if isinstance(body, BaseException):
+            raise HTTPException(status_code=400, detail=f'failed to fetch {name}: {body}')
+    enc_paths = await offload.run_io(
+        _store_face_uploads, FACE_ROOT / payload.user_id, dict(zip(names, bodies))
+    )
     sample = FaceSample(user_id=payload.user_id,
                         front_path=enc_paths[0],
                         left_path=enc_paths[1],
                         right_path=enc_paths[2],
                         embeddings_path='')
-    db.add(sample)
-    db.commit()
-    face_job.delay(enc_paths, payload.user_id)
+    await offload.run_io(_save, db, sample)
+    await offload.run_io(face_job.delay, enc_paths, payload.user_id)
     return {"message": "queued"}
 
 @router.get('/status/{user_id}')
@@ -1,6 +1,7 @@
 from .encryption import (
     encrypt_file,
     decrypt_file,
+    decrypt_buffer,
     encrypt_bytes,
     decrypt_bytes,
 )
@@ -8,6 +9,7 @@ from .encryption import (
 __all__ = [
     "encrypt_file",
     "decrypt_file",
+    "decrypt_buffer",
     "encrypt_bytes",
     "decrypt_bytes",
 ]
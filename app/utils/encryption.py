@@ -1,5 +1,10 @@
+import io
 import os
 import base64
+import hashlib
+import shutil
+import struct
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Union
 
 # ------------------------------------------------------------
 # Optional dependencies (cryptography).  Fall back gracefully
@@ -7,7 +12,8 @@ import base64
 
 try:
     from cryptography.hazmat.primitives.ciphers.aead import AESGCM
-    from cryptography.fernet import Fernet
+    from cryptography.exceptions import InvalidTag
+    from cryptography.fernet import Fernet, InvalidToken, MultiFernet
     _crypto_available = True
 except Exception:  # pragma: no cover – cryptography not installed
     class AESGCM:  # type: ignore
@@ -28,80 +34,381 @@ except Exception:  # pragma: no cover – cryptography not installed
             return data
         def decrypt(self, data: bytes) -> bytes:
             return data
+    class MultiFernet(Fernet):  # type: ignore
+        def rotate(self, data: bytes) -> bytes:
+            return data
+    class InvalidTag(Exception):  # type: ignore
+        pass
+    class InvalidToken(Exception):  # type: ignore
+        pass
     _crypto_available = False
 
 # ------------------------------------------------------------
 # AES-256-GCM · FILE encryption helpers
 # ------------------------------------------------------------
 _AES_KEY_ENV = "AES_KEY"
+# Comma-separated older keys, still accepted for decryption while assets
+# are rotated to AES_KEY (see app/utils/key_rotation.py)
+_AES_OLD_KEYS_ENV = "AES_KEYS"
+
+
+def _decode_key(key_b64: str) -> Optional[bytes]:
+    try:
+        key = base64.urlsafe_b64decode(key_b64.strip())
+    except Exception:
+        return None
+    return key if len(key) == 32 else None
 
-def _load_aes_key() -> bytes:
+
+def _load_aes_keys() -> List[bytes]:
     """
-    Load a 32-byte AES key from the AES_KEY env-var (URL-safe base64);
-    otherwise generate a fresh key (dev / fallback use).
+    Load the current 32-byte AES key from AES_KEY and older ones from
+    AES_KEYS (URL-safe base64); without AES_KEY generate a fresh key
+    (dev / fallback use).
     """
-    key_b64 = os.getenv(_AES_KEY_ENV)
-    if key_b64:
+    current = _decode_key(os.getenv(_AES_KEY_ENV) or "")
+    keys = [current or AESGCM.generate_key(bit_length=256)]
+    for value in (os.getenv(_AES_OLD_KEYS_ENV) or "").split(","):
+        key = _decode_key(value) if value.strip() else None
+        if key and key not in keys:
+            keys.append(key)
+    return keys
+
+
+def key_id(key: bytes) -> bytes:
+    """Return the 4-byte identifier stored in files encrypted with *key*."""
+    return hashlib.sha256(key).digest()[:4]
+
+
+AES_KEYS: List[bytes] = _load_aes_keys()
+AES_KEY: bytes = AES_KEYS[0]
+_KEYRING = {key_id(key): key for key in AES_KEYS}
+
+# Streaming format: a header followed by fixed-size chunks, each sealed on
+# its own so files are processed in constant memory and any byte range can
+# be decrypted without touching the rest.
+#
+#   header = MAGIC (4) | version (1) | chunk size (4, big-endian)
+#            | key id (4, version 2 only) | nonce prefix (7)
+#   chunk  = AES-GCM(plaintext[i * size:(i + 1) * size]) + 16-byte tag
+#
+# Chunk i uses the nonce prefix | i (4 bytes) | final flag (1 byte) and the
+# header as associated data, so reordered, dropped or truncated chunks and
+# edited headers fail authentication.  The key id selects the key from the
+# keyring; version 1 files (no key id) and legacy single-shot blobs (12-byte
+# nonce + ciphertext, no MAGIC) are tried against every key.
+MAGIC = b"GSE\x00"
+FORMAT_VERSION = 2
+CHUNK_SIZE = 64 * 1024
+_HEADERS = {1: struct.Struct(">4sBI7s"), 2: struct.Struct(">4sBI4s7s")}
+_PREAMBLE = struct.Struct(">4sB")
+_TAG_SIZE = 16
+
+
+class _Header:
+    __slots__ = ("raw", "chunk_size", "prefix", "key_id", "ciphers")
+
+    def __init__(self, raw: bytes, chunk_size: int, prefix: bytes, kid: Optional[bytes]) -> None:
+        self.raw = raw
+        self.chunk_size = chunk_size
+        self.prefix = prefix
+        self.key_id = kid
+        if kid is None:
+            self.ciphers = [AESGCM(key) for key in AES_KEYS]
+        elif kid in _KEYRING:
+            self.ciphers = [AESGCM(_KEYRING[kid])]
+        else:
+            raise KeyError(f"no key with id {kid.hex()} in AES_KEY/AES_KEYS")
+
+    @property
+    def size(self) -> int:
+        return len(self.raw)
+
+    def open(self, index: int, final: bool, sealed: bytes) -> bytes:
+        """Decrypt chunk *index*, settling on the first key that fits."""
+        nonce = _chunk_nonce(self.prefix, index, final)
+        for cipher in self.ciphers:
+            try:
+                plaintext = cipher.decrypt(nonce, sealed, self.raw)
+            except InvalidTag:
+                continue
+            self.ciphers = [cipher]
+            return plaintext
+        raise InvalidTag()
+
+
+def _chunk_nonce(prefix: bytes, index: int, final: bool) -> bytes:
+    return prefix + struct.pack(">IB", index, 1 if final else 0)
+
+
+def _read_exact(src: BinaryIO, size: int) -> bytes:
+    """Read up to ``size`` bytes, retrying short reads from pipes and sockets."""
+    parts = []
+    while size > 0:
+        part = src.read(size)
+        if not part:
+            break
+        parts.append(part)
+        size -= len(part)
+    return b"".join(parts)
+
+
+def _read_header(src: BinaryIO) -> Optional[_Header]:
+    """Parse the chunked-format header; ``None`` (rewound) for legacy blobs."""
+    preamble = _read_exact(src, _PREAMBLE.size)
+    if len(preamble) == _PREAMBLE.size:
+        magic, version = _PREAMBLE.unpack(preamble)
+        if magic == MAGIC:
+            layout = _HEADERS.get(version)
+            if layout is None:
+                raise ValueError(f"unsupported encryption format version {version}")
+            raw = preamble + _read_exact(src, layout.size - _PREAMBLE.size)
+            if version == 1:
+                _, _, chunk_size, prefix = layout.unpack(raw)
+                return _Header(raw, chunk_size, prefix, None)
+            _, _, chunk_size, kid, prefix = layout.unpack(raw)
+            return _Header(raw, chunk_size, prefix, kid)
+    src.seek(0)
+    return None
+
+
+def _decrypt_legacy(payload: bytes) -> bytes:
+    for key in AES_KEYS:
         try:
-            key = base64.urlsafe_b64decode(key_b64)
-            if len(key) == 32:
-                return key
-        except Exception:
-            pass
-    # Generate a new key
-    return AESGCM.generate_key(bit_length=256)
+            return AESGCM(key).decrypt(payload[:12], payload[12:], None)
+        except InvalidTag:
+            continue
+    raise InvalidTag()
+
+
+def _plaintext_chunks(src: BinaryIO) -> Iterator[bytes]:
+    """Yield the plaintext of ``src`` (chunked or legacy) piece by piece."""
+    header = _read_header(src)
+    if header is None:
+        yield _decrypt_legacy(src.read())
+        return
+    sealed = header.chunk_size + _TAG_SIZE
+    chunk = _read_exact(src, sealed)
+    index = 0
+    while True:
+        following = _read_exact(src, sealed) if len(chunk) == sealed else b""
+        final = not following
+        yield header.open(index, final, chunk)
+        if final:
+            return
+        chunk = following
+        index += 1
+
+
+def _rechunk(pieces: Iterable[bytes], size: int) -> Iterator[bytes]:
+    """Yield *pieces* re-cut into blocks of exactly *size* bytes (last one shorter)."""
+    pending = b""
+    for piece in pieces:
+        data = pending + piece if pending else piece
+        view = memoryview(data)
+        start = 0
+        while len(data) - start >= size:
+            yield bytes(view[start:start + size])
+            start += size
+        pending = bytes(view[start:])
+    if pending:
+        yield pending
+
+
+def _seal_chunks(blocks: Iterable[bytes], dst: BinaryIO, chunk_size: int) -> None:
+    """Write *blocks* (``chunk_size`` bytes, last one shorter) encrypted with AES_KEY."""
+    prefix = os.urandom(7)
+    header = _HEADERS[FORMAT_VERSION].pack(MAGIC, FORMAT_VERSION, chunk_size, key_id(AES_KEY), prefix)
+    aesgcm = AESGCM(AES_KEY)
+    dst.write(header)
+    blocks = iter(blocks)
+    chunk = next(blocks, b"")
+    index = 0
+    while True:
+        # Look one block ahead to know which one is final
+        following = next(blocks, b"") if len(chunk) == chunk_size else b""
+        final = not following
+        dst.write(aesgcm.encrypt(_chunk_nonce(prefix, index, final), chunk, header))
+        if final:
+            return
+        chunk = following
+        index += 1
+
+
+def encrypt_stream(src: BinaryIO, dst: BinaryIO, chunk_size: int = CHUNK_SIZE) -> None:
+    """Encrypt the readable ``src`` into ``dst`` in the chunked format."""
+    _seal_chunks(iter(lambda: _read_exact(src, chunk_size), b""), dst, chunk_size)
+
 
-AES_KEY: bytes = _load_aes_key()
+def decrypt_stream(src: BinaryIO, dst: BinaryIO) -> None:
+    """Decrypt ``src`` (chunked or legacy) into ``dst``.
 
-def encrypt_file(in_path: str, out_path: str) -> None:
+    Raises ``cryptography.exceptions.InvalidTag`` if a chunk fails
+    authentication; everything before it has been written by then.
     """
-    Encrypt *in_path* → *out_path* with AES-256-GCM.
+    for chunk in _plaintext_chunks(src):
+        dst.write(chunk)
+
+
+def _write_atomic(out_path: str, write) -> None:
+    # Written beside the target and renamed, so readers never see a partial file
+    tmp = f"{out_path}.part"
+    try:
+        with open(tmp, "wb") as dst:
+            write(dst)
+        os.replace(tmp, out_path)
+    finally:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+
+
+def encrypt_file(in_path: str, out_path: str, chunk_size: int = CHUNK_SIZE) -> None:
+    """
+    Encrypt *in_path* → *out_path* with AES-256-GCM in ``chunk_size`` chunks.
     If cryptography isn’t available, falls back to a simple file copy.
     """
-    try:
-        aesgcm = AESGCM(AES_KEY)
-        with open(in_path, "rb") as fh:
-            data = fh.read()
-        nonce = os.urandom(12)  # 96-bit nonce for GCM
-        ciphertext = aesgcm.encrypt(nonce, data, None)
-        with open(out_path, "wb") as fh:
-            fh.write(nonce + ciphertext)
-    except Exception:
-        with open(in_path, "rb") as src, open(out_path, "wb") as dst:
-            dst.write(src.read())
+    if not _crypto_available:
+        shutil.copyfile(in_path, out_path)
+        return
+    with open(in_path, "rb") as src:
+        _write_atomic(out_path, lambda dst: encrypt_stream(src, dst, chunk_size))
+
 
 def decrypt_file(in_path: str, out_path: str) -> None:
     """
-    Decrypt *in_path* → *out_path* with AES-256-GCM.
-    Falls back to a raw copy when cryptography isn’t available.
+    Decrypt *in_path* → *out_path* with AES-256-GCM, chunk by chunk.
+    Legacy single-shot blobs that fail to decrypt (e.g. written while
+    cryptography was missing) are copied as is, as are all files when
+    cryptography isn’t available.  Tampered chunked files raise instead.
     """
+    if not _crypto_available:
+        shutil.copyfile(in_path, out_path)
+        return
+
+    def write(dst: BinaryIO) -> None:
+        with open(in_path, "rb") as src:
+            legacy = _read_header(src) is None
+            src.seek(0)
+            try:
+                decrypt_stream(src, dst)
+            except Exception:
+                if not legacy:
+                    raise
+                dst.seek(0)
+                dst.truncate()
+                src.seek(0)
+                shutil.copyfileobj(src, dst)
+
+    _write_atomic(out_path, write)
+
+
+def decrypt_buffer(src: Union[bytes, bytearray, memoryview, BinaryIO]) -> bytes:
+    """Decrypt an in-memory ciphertext (or readable stream) to bytes.
+
+    Same format handling and fallbacks as :func:`decrypt_file`, without
+    touching the filesystem, so workers can decode plaintext from memory.
+    """
+    if not isinstance(src, (bytes, bytearray, memoryview)):
+        src = src.read()
+    if not _crypto_available:
+        return bytes(src)
+    out = bytearray()
+    buf = io.BytesIO(src)
+    legacy = _read_header(buf) is None
+    buf.seek(0)
     try:
-        aesgcm = AESGCM(AES_KEY)
-        with open(in_path, "rb") as fh:
-            payload = fh.read()
-        nonce, ciphertext = payload[:12], payload[12:]
-        plaintext = aesgcm.decrypt(nonce, ciphertext, None)
-        with open(out_path, "wb") as fh:
-            fh.write(plaintext)
+        for chunk in _plaintext_chunks(buf):
+            out += chunk
     except Exception:
-        with open(in_path, "rb") as src, open(out_path, "wb") as dst:
-            dst.write(src.read())
+        if not legacy:
+            raise
+        return bytes(src)
+    return bytes(out)
+
+
+def plaintext_size(path: str) -> int:
+    """Return the decrypted size of the encrypted file at *path*."""
+    with open(path, "rb") as src:
+        header = _read_header(src)
+        total = os.fstat(src.fileno()).st_size
+    if header is None:
+        return max(0, total - 12 - _TAG_SIZE) if _crypto_available else total
+    body = total - header.size
+    chunks = max(1, -(-body // (header.chunk_size + _TAG_SIZE)))
+    return body - chunks * _TAG_SIZE
+
+
+def decrypt_range(path: str, offset: int, length: int) -> bytes:
+    """
+    Return plaintext bytes ``offset:offset + length`` of the file at *path*,
+    decrypting only the chunks that overlap them (legacy blobs are
+    decrypted whole).
+    """
+    if offset < 0 or length < 0:
+        raise ValueError("offset and length must be non-negative")
+    if not _crypto_available:
+        with open(path, "rb") as src:
+            src.seek(offset)
+            return src.read(length)
+    with open(path, "rb") as src:
+        header = _read_header(src)
+        if header is None:
+            return _decrypt_legacy(src.read())[offset:offset + length]
+        chunk_size = header.chunk_size
+        sealed = chunk_size + _TAG_SIZE
+        last = max(1, -(-(os.fstat(src.fileno()).st_size - header.size) // sealed)) - 1
+        first = offset // chunk_size
+        stop = min(last, (offset + length - 1) // chunk_size) if length else first - 1
+        parts = []
+        for index in range(first, stop + 1):
+            src.seek(header.size + index * sealed)
+            parts.append(header.open(index, index == last, _read_exact(src, sealed)))
+    data = b"".join(parts)
+    skip = offset - first * chunk_size
+    return data[skip:skip + length]
+
+
+def file_key_id(path: str) -> Optional[str]:
+    """Return the hex id of the key *path* is encrypted with, if recorded."""
+    with open(path, "rb") as src:
+        header = _read_header(src)
+    return header.key_id.hex() if header is not None and header.key_id else None
+
+
+def needs_rotation(path: str) -> bool:
+    """Return whether *path* is not yet encrypted with the current AES_KEY."""
+    return file_key_id(path) != key_id(AES_KEY).hex()
+
+
+def reencrypt_file(path: str, chunk_size: int = CHUNK_SIZE) -> None:
+    """Re-encrypt *path* in place with AES_KEY, streaming chunk by chunk."""
+    with open(path, "rb") as src:
+        blocks = _rechunk(_plaintext_chunks(src), chunk_size)
+        _write_atomic(path, lambda dst: _seal_chunks(blocks, dst, chunk_size))
 
 # ------------------------------------------------------------
 # Fernet · BYTES encryption helpers (snippets, DB fields, etc.)
 # ------------------------------------------------------------
 _FERNET_KEY_ENV = "FERNET_KEY"
+# Comma-separated older Fernet keys, accepted until tokens are rotated
+_FERNET_OLD_KEYS_ENV = "FERNET_KEYS"
 fernet_key = os.getenv(_FERNET_KEY_ENV) or Fernet.generate_key()
+_fernet_old_keys = [k.strip() for k in (os.getenv(_FERNET_OLD_KEYS_ENV) or "").split(",") if k.strip()]
 
 try:
-    fernet = Fernet(fernet_key)
+    _fernet_current = Fernet(fernet_key)
+    # Encrypts with the first key, decrypts with whichever key matches
+    fernet = MultiFernet([_fernet_current] + [Fernet(k) for k in _fernet_old_keys])
 except Exception:
     class _DummyFernet:
         def encrypt(self, data: bytes) -> bytes:
             return data
         def decrypt(self, data: bytes) -> bytes:
             return data
+        def rotate(self, data: bytes) -> bytes:
+            return data
     fernet = _DummyFernet()
+    _fernet_current = fernet
 
 def encrypt_bytes(data: bytes) -> bytes:
     """Encrypt raw bytes when Fernet is available; otherwise return unchanged."""
@@ -111,8 +418,18 @@ def decrypt_bytes(data: bytes) -> bytes:
     """Decrypt raw bytes when Fernet is available; otherwise return unchanged."""
     return fernet.decrypt(data)
 
-# ------------------------------------------------------------
-# TODO:
-#   • Build a key-rotation utility to walk existing assets,
-#     decrypt them with the old key, and re-encrypt with the new one.
-# ------------------------------------------------------------
+def is_fernet_token(data: bytes) -> bool:
+    """Return whether *data* looks like a Fernet token (version byte 0x80)."""
+    return data.startswith(b"gAAAAA")
+
+def bytes_need_rotation(token: bytes) -> bool:
+    """Return whether the Fernet *token* was not made with the current key."""
+    try:
+        _fernet_current.decrypt(token)
+    except InvalidToken:
+        return True
+    return False
+
+def rotate_bytes(token: bytes) -> bytes:
+    """Re-encrypt the Fernet *token* with the current key."""
+    return fernet.rotate(token)
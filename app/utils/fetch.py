@@ -0,0 +1,160 @@
+"""Pooled HTTP fetching of enrollment assets.
+
+Enrollment pulls several images or audio files from the upload server per
+user.  :class:`Fetcher` keeps one keep-alive ``httpx`` connection pool per
+process and downloads a whole batch concurrently, at most
+``max_concurrency`` requests at a time, so an enrollment costs roughly one
+round trip instead of one per asset.  Async callers (the API) use
+:meth:`Fetcher.fetch_all`; synchronous ones (Celery tasks) use
+:meth:`Fetcher.fetch_all_sync`, which runs on a small thread pool.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import httpx
+
+FETCH_CONCURRENCY = int(os.getenv("FETCH_CONCURRENCY", "8"))
+
+
+class Fetcher:
+    """Download URLs over shared, bounded connection pools."""
+
+    def __init__(
+        self,
+        max_concurrency: int = FETCH_CONCURRENCY,
+        timeout: float = 30.0,
+        keepalive_expiry: float = 30.0,
+        transport: Any = None,
+    ) -> None:
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.timeout = timeout
+        self._limits = httpx.Limits(
+            max_connections=self.max_concurrency,
+            max_keepalive_connections=self.max_concurrency,
+            keepalive_expiry=keepalive_expiry,
+        )
+        # Tests pass an ``httpx.MockTransport``, which serves both clients
+        self._transport = transport
+        self._lock = threading.Lock()
+        self._client: Optional[httpx.Client] = None
+        self._aclient: Optional[httpx.AsyncClient] = None
+        self._aloop: Optional[asyncio.AbstractEventLoop] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._active = 0
+        self._counts = {"requests": 0, "failures": 0, "bytes": 0}
+
+    def _sync_client(self) -> httpx.Client:
+        with self._lock:
+            if self._client is None:
+                self._client = httpx.Client(
+                    timeout=self.timeout, limits=self._limits, transport=self._transport
+                )
+            return self._client
+
+    def _async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        # Pooled connections belong to the loop that opened them
+        if self._aclient is None or self._aloop is not loop:
+            self._aloop = loop
+            self._aclient = httpx.AsyncClient(
+                timeout=self.timeout, limits=self._limits, transport=self._transport
+            )
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        return self._aclient
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.max_concurrency, thread_name_prefix="fetch")
+            return self._pool
+
+    def _start(self) -> None:
+        with self._lock:
+            self._active += 1
+
+    def _finish(self, content: Optional[bytes]) -> None:
+        with self._lock:
+            self._active -= 1
+            self._counts["requests"] += 1
+            if content is None:
+                self._counts["failures"] += 1
+            else:
+                self._counts["bytes"] += len(content)
+
+    async def fetch(self, url: str) -> bytes:
+        """Return the body of ``url``; raises ``httpx.HTTPError`` on failure."""
+        client = self._async_client()
+        async with self._slots:
+            self._start()
+            content = None
+            try:
+                resp = await client.get(url)
+                resp.raise_for_status()
+                content = resp.content
+            finally:
+                self._finish(content)
+        return content
+
+    async def fetch_all(
+        self, urls: Sequence[str], return_exceptions: bool = False
+    ) -> List[Union[bytes, BaseException]]:
+        """Fetch ``urls`` concurrently; bodies come back in input order."""
+        return list(
+            await asyncio.gather(*(self.fetch(url) for url in urls), return_exceptions=return_exceptions)
+        )
+
+    def fetch_sync(self, url: str) -> bytes:
+        client = self._sync_client()
+        self._start()
+        content = None
+        try:
+            resp = client.get(url)
+            resp.raise_for_status()
+            content = resp.content
+        finally:
+            self._finish(content)
+        return content
+
+    def fetch_all_sync(self, urls: Sequence[str]) -> List[bytes]:
+        """Blocking :meth:`fetch_all`; the first failure is re-raised."""
+        if len(urls) <= 1:
+            return [self.fetch_sync(url) for url in urls]
+        return list(self._executor().map(self.fetch_sync, urls))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"max_concurrency": self.max_concurrency, "active": self._active, **self._counts}
+
+    async def aclose(self) -> None:
+        if self._aclient is not None:
+            client, self._aclient = self._aclient, None
+            await client.aclose()
+
+    def close(self) -> None:
+        with self._lock:
+            client, self._client = self._client, None
+            pool, self._pool = self._pool, None
+        if client is not None:
+            client.close()
+        if pool is not None:
+            pool.shutdown(wait=False)
+
+
+_fetcher: Optional[Fetcher] = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher() -> Fetcher:
+    """Return the process-wide :class:`Fetcher`."""
+    global _fetcher
+    with _fetcher_lock:
+        if _fetcher is None:
+            _fetcher = Fetcher()
+        return _fetcher
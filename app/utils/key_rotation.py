@@ -0,0 +1,221 @@
+"""Re-encrypt stored assets with the current keys.
+
+Rotation procedure:
+
+1. Generate a new key, set it as ``AES_KEY`` (``FERNET_KEY``) and move the
+   old one to ``AES_KEYS`` (``FERNET_KEYS``); restart the services.  Both
+   keys now decrypt, new data uses the new key.
+2. Run ``python -m app.utils.key_rotation``.  It walks every ``.enc`` file
+   under ``media/``, ``uploads/voice`` and ``uploads/face`` plus the
+   ``VoicePrint``/``FacePrint`` blobs that hold Fernet tokens, and
+   re-encrypts whatever is not yet under the current key on a bounded pool
+   of workers, throttled to ``--rate-mb`` MB/s.
+3. Once it reports no failures, drop the old keys.
+
+Finished items are appended to a checkpoint file, so an interrupted run
+resumes where it stopped; files already under the current key are skipped
+in any case.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Set
+
+from . import encryption
+
+logger = logging.getLogger(__name__)
+
+ASSET_ROOTS = ("media", "uploads/voice", "uploads/face")
+CHECKPOINT = "key_rotation.checkpoint"
+
+
+class Throttle:
+    """Block callers so that at most ``rate`` bytes per second pass."""
+
+    def __init__(self, rate: Optional[float]) -> None:
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def consume(self, nbytes: int) -> None:
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next, now)
+            self._next = start + nbytes / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+
+class Checkpoint:
+    """Append-only record of items rotated to one target key."""
+
+    def __init__(self, path: str, target: str) -> None:
+        self.path = Path(path)
+        self.target = target
+        self.done: Set[str] = set()
+        self._lock = threading.Lock()
+        if self.path.exists():
+            lines = self.path.read_text(encoding="utf-8").splitlines()
+            # A checkpoint for another key says nothing about this rotation
+            if lines and lines[0] == f"# target {target}":
+                self.done.update(line for line in lines[1:] if line)
+                return
+        self.path.write_text(f"# target {target}\n", encoding="utf-8")
+
+    def add(self, item: str) -> None:
+        with self._lock:
+            self.done.add(item)
+            with open(self.path, "a", encoding="utf-8") as fh:
+                fh.write(item + "\n")
+
+
+def _target() -> str:
+    fernet_key = encryption.fernet_key
+    if isinstance(fernet_key, str):
+        fernet_key = fernet_key.encode()
+    return f"{encryption.key_id(encryption.AES_KEY).hex()}-{encryption.key_id(fernet_key).hex()}"
+
+
+def iter_assets(roots: Iterable[str] = ASSET_ROOTS) -> Iterator[Path]:
+    """Yield every ``.enc`` file below *roots* in a stable order."""
+    for root in roots:
+        base = Path(root)
+        if base.is_dir():
+            yield from sorted(p for p in base.rglob("*.enc") if p.is_file())
+
+
+def rotate_asset(path: Path) -> bool:
+    """Re-encrypt one file under the current key; ``False`` if it already was."""
+    with open(path, "rb") as fh:
+        head = fh.read(8)
+    if encryption.is_fernet_token(head):
+        token = path.read_bytes()
+        if not encryption.bytes_need_rotation(token):
+            return False
+        tmp = path.with_name(path.name + ".part")
+        tmp.write_bytes(encryption.rotate_bytes(token))
+        os.replace(tmp, path)
+        return True
+    if not encryption.needs_rotation(str(path)):
+        return False
+    encryption.reencrypt_file(str(path))
+    return True
+
+
+def _rotate_prints(session_factory: Callable[[], Any], checkpoint: Checkpoint, report: Dict[str, Any]) -> None:
+    """Rotate the Fernet-encrypted ``vector`` blobs of voice and face prints."""
+    from ..models import FacePrint, VoicePrint
+
+    with session_factory() as db:
+        for model in (VoicePrint, FacePrint):
+            for row in db.query(model).yield_per(500):
+                item = f"db:{model.__tablename__}:{row.id}"
+                if item in checkpoint.done:
+                    report["resumed"] += 1
+                    continue
+                blob = bytes(row.vector or b"")
+                if not encryption.is_fernet_token(blob):
+                    report["skipped"] += 1  # stored in the clear
+                    continue
+                try:
+                    if encryption.bytes_need_rotation(blob):
+                        row.vector = encryption.rotate_bytes(blob)
+                        report["rotated"] += 1
+                    else:
+                        report["skipped"] += 1
+                except Exception as exc:
+                    report["failed"] += 1
+                    logger.warning("Could not rotate %s: %s", item, exc)
+                    continue
+                report["bytes"] += len(blob)
+                db.commit()
+                checkpoint.add(item)
+
+
+def rotate_all(
+    roots: Iterable[str] = ASSET_ROOTS,
+    workers: int = 4,
+    rate: Optional[float] = None,
+    checkpoint_path: str = CHECKPOINT,
+    session_factory: Optional[Callable[[], Any]] = None,
+    include_db: bool = True,
+) -> Dict[str, Any]:
+    """Rotate every asset and print blob; return counts and throughput.
+
+    ``rate`` caps file I/O in bytes per second.  ``session_factory``
+    defaults to the application's database sessions.
+    """
+    checkpoint = Checkpoint(checkpoint_path, _target())
+    throttle = Throttle(rate)
+    report: Dict[str, Any] = {"rotated": 0, "skipped": 0, "resumed": 0, "failed": 0, "bytes": 0}
+    lock = threading.Lock()
+    started = time.monotonic()
+
+    def work(path: Path) -> None:
+        size = path.stat().st_size
+        # Each file is read once and written once
+        throttle.consume(2 * size)
+        try:
+            changed = rotate_asset(path)
+        except Exception as exc:
+            logger.warning("Could not rotate %s: %s", path, exc)
+            with lock:
+                report["failed"] += 1
+            return
+        checkpoint.add(str(path))
+        with lock:
+            report["rotated" if changed else "skipped"] += 1
+            report["bytes"] += size
+
+    pending = []
+    for path in iter_assets(roots):
+        if str(path) in checkpoint.done:
+            report["resumed"] += 1
+        else:
+            pending.append(path)
+    with ThreadPoolExecutor(max(1, int(workers)), thread_name_prefix="rotate") as pool:
+        list(pool.map(work, pending))
+
+    if include_db:
+        if session_factory is None:
+            from ..database import SessionLocal as session_factory
+        _rotate_prints(session_factory, checkpoint, report)
+
+    seconds = time.monotonic() - started
+    report["seconds"] = round(seconds, 3)
+    report["mb_per_second"] = round(report["bytes"] / seconds / 1e6, 2) if seconds else 0.0
+    report["key_id"] = checkpoint.target
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Re-encrypt stored assets with the current keys")
+    parser.add_argument("roots", nargs="*", default=list(ASSET_ROOTS), help="Directories to walk")
+    parser.add_argument("--workers", type=int, default=4, help="Files re-encrypted concurrently")
+    parser.add_argument("--rate-mb", type=float, default=None, help="I/O limit in MB/s")
+    parser.add_argument("--checkpoint", default=CHECKPOINT, help="Progress file for resuming")
+    parser.add_argument("--skip-db", action="store_true", help="Leave voice/face print blobs alone")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    report = rotate_all(
+        args.roots,
+        workers=args.workers,
+        rate=args.rate_mb * 1e6 if args.rate_mb else None,
+        checkpoint_path=args.checkpoint,
+        include_db=not args.skip_db,
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
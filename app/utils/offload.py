@@ -0,0 +1,188 @@
+"""Run blocking work from async routes without stalling the event loop.
+
+The FastAPI routes are ``async def``, so anything synchronous they call
+(SQLAlchemy queries, file writes, encryption, Celery ``delay``) runs on the
+event loop and freezes every other request on that worker.  Such calls go
+through :func:`run_io`, which uses a bounded thread pool, and CPU-bound work
+that holds the GIL through :func:`run_cpu`, which uses a process pool.
+Face encodings reach the process pool through the shared
+:class:`~src.embeddings.EmbeddingService`, whose ``face`` backend is routed
+to :data:`cpu_pool`, so they also show up in the embedding metrics.
+
+Each :class:`OffloadPool` admits at most ``workers + max_queue`` calls.
+Beyond that it raises :class:`PoolSaturated` instead of queueing without
+limit, and routes answer ``503``.  :meth:`OffloadPool.stats` reports how
+busy the pool is and how long calls waited for a worker.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+_SAMPLES = 1024
+
+
+class PoolSaturated(RuntimeError):
+    """Raised when a pool already holds ``workers + max_queue`` calls."""
+
+
+def _timed(fn: Callable[..., Any], args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Tuple[float, Any, float]:
+    # Wall-clock stamps, so they compare across processes
+    started = time.time()
+    result = fn(*args, **kwargs)
+    return started, result, time.time()
+
+
+def _percentile(samples: Deque[float], q: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))], 2)
+
+
+class OffloadPool:
+    """A bounded executor that records queueing and saturation."""
+
+    def __init__(self, name: str, workers: int, max_queue: int, kind: str = "thread") -> None:
+        if kind not in ("thread", "process"):
+            raise ValueError("kind must be 'thread' or 'process'")
+        self.name = name
+        self.kind = kind
+        self.workers = max(1, int(workers))
+        self.max_queue = max(0, int(max_queue))
+        self._lock = threading.Lock()
+        self._pool: Optional[Executor] = None
+        self._in_flight = 0
+        self._peak = 0
+        self._counts = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0}
+        self._wait_ms: Deque[float] = deque(maxlen=_SAMPLES)
+        self._run_ms: Deque[float] = deque(maxlen=_SAMPLES)
+
+    def _executor(self) -> Executor:
+        if self._pool is None:
+            if self.kind == "process":
+                # Forking a process that already runs threads can deadlock
+                self._pool = ProcessPoolExecutor(
+                    self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            else:
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix=f"offload-{self.name}")
+        return self._pool
+
+    def _admit(self) -> Executor:
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_queue:
+                self._counts["rejected"] += 1
+                raise PoolSaturated(f"{self.name} pool is saturated")
+            self._in_flight += 1
+            self._peak = max(self._peak, self._in_flight)
+            self._counts["submitted"] += 1
+            return self._executor()
+
+    def _release(self, submitted: float, timing: Optional[Tuple[float, float]]) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            if timing is None:
+                self._counts["failed"] += 1
+                return
+            started, finished = timing
+            self._counts["completed"] += 1
+            self._wait_ms.append(max(0.0, started - submitted) * 1000)
+            self._run_ms.append((finished - started) * 1000)
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """Queue ``fn(*args, **kwargs)``; raises :class:`PoolSaturated` when full.
+
+        For process pools ``fn`` and its arguments must be picklable.
+        """
+        executor = self._admit()
+        submitted = time.time()
+        outer: Future = Future()
+
+        def done(inner: Future) -> None:
+            try:
+                started, result, finished = inner.result()
+            except BaseException as exc:
+                self._release(submitted, None)
+                outer.set_exception(exc)
+                return
+            self._release(submitted, (started, finished))
+            outer.set_result(result)
+
+        try:
+            executor.submit(_timed, fn, args, kwargs).add_done_callback(done)
+        except BaseException:
+            self._release(submitted, None)
+            raise
+        return outer
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Run ``fn(*args, **kwargs)`` on the pool and await its result."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        """Return occupancy, queue depth and wait/run latency percentiles."""
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "queued": max(0, self._in_flight - self.workers),
+                "peak_in_flight": self._peak,
+                "utilization": round(min(self._in_flight, self.workers) / self.workers, 2),
+                **self._counts,
+                "wait_ms": {
+                    "p50": _percentile(self._wait_ms, 0.5),
+                    "p99": _percentile(self._wait_ms, 0.99),
+                },
+                "run_ms": {
+                    "p50": _percentile(self._run_ms, 0.5),
+                    "p99": _percentile(self._run_ms, 0.99),
+                },
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+
+io_pool = OffloadPool(
+    "io",
+    workers=int(os.getenv("OFFLOAD_IO_WORKERS", "16")),
+    max_queue=int(os.getenv("OFFLOAD_IO_QUEUE", "256")),
+)
+cpu_pool = OffloadPool(
+    "cpu",
+    workers=int(os.getenv("OFFLOAD_CPU_WORKERS", str(min(4, os.cpu_count() or 1)))),
+    max_queue=int(os.getenv("OFFLOAD_CPU_QUEUE", "32")),
+    kind="process",
+)
+
+
+async def run_io(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run blocking I/O (database, files, brokers) on the thread pool."""
+    return await io_pool.run(fn, *args, **kwargs)
+
+
+async def run_cpu(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run CPU-bound, picklable work on the process pool."""
+    return await cpu_pool.run(fn, *args, **kwargs)
+
+
+def stats() -> Dict[str, Any]:
+    return {"io": io_pool.stats(), "cpu": cpu_pool.stats()}
+
+
+def shutdown() -> None:
+    io_pool.shutdown(wait=False)
+    cpu_pool.shutdown(wait=False)
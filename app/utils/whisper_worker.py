@@ -2,10 +2,12 @@ import os
 from pathlib import Path
 
 from celery import Celery
-import whisper
+from src.transcription.audio import decode_audio
+from src.transcription.cache import TranscriptionCache
+from src.transcription.registry import get_registry
 from ..database import SessionLocal
 from ..models import VoiceSample
-from .encryption import decrypt_file
+from .encryption import decrypt_buffer
 
 celery_app = Celery(
     'whisper_worker',
@@ -13,19 +15,32 @@ celery_app = Celery(
     backend=os.getenv('CELERY_BACKEND', 'redis://redis:6379/0'),
 )
 
-model = None
+WORKER_MODEL = 'tiny'
+
+# Unload the model after this many idle seconds between tasks (unset = keep)
+_idle = os.getenv('WHISPER_IDLE_TIMEOUT')
+if _idle:
+    get_registry().idle_timeout = float(_idle)
+    get_registry().start_reaper(interval=min(60.0, float(_idle)))
+
+# Re-submitted voice samples reuse their transcript instead of hitting Whisper
+_cache = TranscriptionCache(directory=os.getenv('TRANSCRIPT_CACHE_DIR'))
 
 def get_model():
-    global model
-    if model is None:
-        model = whisper.load_model('tiny')
-    return model
+    """Return the worker's Whisper model from the shared registry."""
+    return get_registry().get(WORKER_MODEL)
 
 @celery_app.task
 def transcribe_voice(file_path: str, user_id: str) -> None:
-    temp_path = Path(file_path).with_suffix('.decrypted.wav')
-    decrypt_file(file_path, str(temp_path))
-    transcript = get_model().transcribe(str(temp_path))['text']
+    # Plaintext audio is decrypted and decoded in memory, never written out
+    with open(file_path, 'rb') as fh:
+        audio = decode_audio(decrypt_buffer(fh))
+    # Keyed on the decoded PCM so re-encoded or remuxed copies still hit
+    key = _cache.key(audio, WORKER_MODEL)
+    transcript = _cache.get(key)
+    if transcript is None:
+        transcript = get_model().transcribe(audio)['text']
+        _cache.put(key, transcript)
     out_dir = Path('transcripts')
     out_dir.mkdir(parents=True, exist_ok=True)
     txt_path = out_dir / f"{user_id}.txt"
@@ -36,10 +51,6 @@ def transcribe_voice(file_path: str, user_id: str) -> None:
        if sample:
            sample.transcript_path = str(txt_path)
            db.commit()
-    try:
-        os.remove(temp_path)
-    except FileNotFoundError:
-        pass
 
 @celery_app.task
 def speaker_job(file_path: str, user_id: str) -> None:
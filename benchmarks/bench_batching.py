@@ -0,0 +1,109 @@
+"""Compare Whisper throughput with and without dynamic micro-batching.
+
+Runs the same set of short segments through ``TranscriptionService`` from
+several concurrent client threads, once with the per-call path and once with
+the batching engine enabled, and prints requests per second and latencies.
+
+Usage::
+
+    python benchmarks/bench_batching.py --model tiny --clients 8 --requests 64
+    python benchmarks/bench_batching.py --audio sample.wav --seconds 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.transcription.audio import SAMPLE_RATE, decode_audio  # noqa: E402
+from src.transcription.base import TranscriptionService  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark Whisper micro-batching")
+    parser.add_argument("--model", default="tiny", help="Whisper model name")
+    parser.add_argument("--audio", help="Audio file to cut segments from (default: noise)")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Segment length in seconds")
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent client threads")
+    parser.add_argument("--requests", type=int, default=64, help="Total segments to transcribe")
+    parser.add_argument("--batch-size", type=int, default=8, help="Maximum batch size")
+    parser.add_argument("--wait-ms", type=float, default=20.0, help="Batch collection window")
+    return parser.parse_args()
+
+
+def load_segments(args: argparse.Namespace) -> List[np.ndarray]:
+    length = int(args.seconds * SAMPLE_RATE)
+    if args.audio:
+        audio = decode_audio(args.audio)
+    else:
+        rng = np.random.default_rng(0)
+        audio = (rng.standard_normal(length * 4) * 0.05).astype(np.float32)
+    if len(audio) < length:
+        audio = np.pad(audio, (0, length - len(audio)))
+    starts = np.linspace(0, len(audio) - length, num=args.requests).astype(int)
+    return [audio[s : s + length] for s in starts]
+
+
+def run(service: TranscriptionService, segments: List[np.ndarray], clients: int) -> dict:
+    latencies: List[float] = []
+
+    def one(segment: np.ndarray) -> None:
+        start = time.perf_counter()
+        service.transcribe(segment)
+        latencies.append(time.perf_counter() - start)
+
+    # Warm up so model initialisation is not measured
+    service.transcribe(segments[0])
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(one, segments))
+    elapsed = time.perf_counter() - start
+    ordered = sorted(latencies)
+    return {
+        "throughput": len(segments) / elapsed,
+        "p50": statistics.median(ordered),
+        "p95": ordered[int((len(ordered) - 1) * 0.95)],
+    }
+
+
+def main() -> None:
+    args = parse_args()
+    segments = load_segments(args)
+
+    per_call = TranscriptionService(args.model)
+    if per_call.model is None:
+        raise SystemExit("Whisper is not available")
+    batched = TranscriptionService(
+        args.model,
+        batching={
+            "enabled": True,
+            "max_batch_size": args.batch_size,
+            "max_wait_ms": args.wait_ms,
+        },
+    )
+    results = {
+        "per-call": run(per_call, segments, args.clients),
+        "batched": run(batched, segments, args.clients),
+    }
+    print(f"{len(segments)} segments of {args.seconds:.1f}s, {args.clients} clients, model={args.model}")
+    for name, res in results.items():
+        print(
+            f"{name:>9}: {res['throughput']:6.2f} req/s   "
+            f"p50 {res['p50'] * 1000:7.1f} ms   p95 {res['p95'] * 1000:7.1f} ms"
+        )
+    print(f"mean batch size: {batched.batcher.mean_batch_size:.2f}")
+    speedup = results["batched"]["throughput"] / results["per-call"]["throughput"]
+    print(f"speedup: {speedup:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
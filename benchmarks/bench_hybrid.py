@@ -0,0 +1,101 @@
+"""Compare vector-only and hybrid (BM25 + vector) memory search.
+
+Fills a throwaway :class:`Memory` with synthetic transcripts, each of which
+mentions one made-up name, then searches for those names in both modes and
+prints latency percentiles and how often the transcript with the name is in
+the top ``k`` results.  Rare tokens like these are where embeddings alone
+tend to miss.
+
+Usage::
+
+    python benchmarks/bench_hybrid.py --docs 2000 --queries 200
+    python benchmarks/bench_hybrid.py --top-k 5 --rrf-k 30
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.memory.memory import Memory  # noqa: E402
+
+WORDS = (
+    "meeting budget schedule project review client call plan design team "
+    "report deadline update travel office launch email notes weekend dinner "
+    "doctor school garden invoice contract release feedback hiring"
+).split()
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark hybrid memory search")
+    parser.add_argument("--docs", type=int, default=1000, help="Transcripts to store")
+    parser.add_argument("--queries", type=int, default=100, help="Searches per mode")
+    parser.add_argument("--words", type=int, default=60, help="Words per transcript")
+    parser.add_argument("--top-k", type=int, default=5, help="Results per search")
+    parser.add_argument("--rrf-k", type=int, default=60, help="Reciprocal rank fusion constant")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def build_corpus(args: argparse.Namespace) -> List[Tuple[str, str]]:
+    rng = random.Random(args.seed)
+    corpus = []
+    for n in range(args.docs):
+        name = "".join(rng.choice("bcdfghklmnprstvz") + rng.choice("aeiou") for _ in range(3)) + str(n)
+        words = [rng.choice(WORDS) for _ in range(args.words)]
+        words.insert(rng.randrange(len(words)), name.capitalize())
+        corpus.append((name, " ".join(words) + "."))
+    return corpus
+
+
+def run(memory: Memory, corpus: List[Tuple[str, str]], mode: str, args: argparse.Namespace) -> dict:
+    rng = random.Random(args.seed + 1)
+    latencies: List[float] = []
+    found = 0
+    for name, _ in rng.sample(corpus, min(args.queries, len(corpus))):
+        query = f"what did we decide with {name.capitalize()}"
+        start = time.perf_counter()
+        results = memory.search(query, top_k=args.top_k, mode=mode)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found += any(name.capitalize() in text for text in results)
+    latencies.sort()
+    return {
+        "recall": found / len(latencies),
+        "p50": statistics.median(latencies),
+        "p95": latencies[int(len(latencies) * 0.95)],
+    }
+
+
+def main() -> None:
+    args = parse_args()
+    corpus = build_corpus(args)
+    with tempfile.TemporaryDirectory() as tmp:
+        memory = Memory(persist_directory=tmp, result_ttl=0, rrf_k=args.rrf_k)
+        start = time.perf_counter()
+        memory.add_many([text for _, text in corpus])
+        print(f"stored {len(corpus)} transcripts in {time.perf_counter() - start:.2f}s")
+
+        start = time.perf_counter()
+        memory.wait_lexical()
+        memory.search("warm up", mode="hybrid")
+        print(f"built BM25 index in {(time.perf_counter() - start) * 1000:.1f} ms: "
+              f"{memory.search_stats()['bm25']}")
+
+        for mode in ("vector", "hybrid"):
+            stats = run(memory, corpus, mode, args)
+            print(
+                f"{mode:>6}: recall@{args.top_k} {stats['recall']:.2%}  "
+                f"p50 {stats['p50']:.2f} ms  p95 {stats['p95']:.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Measure recall and scan size of int8-quantized memory storage.
+
+Stores the same synthetic embeddings in a float32 ``NumpyCollection`` and in
+int8 collections with several re-rank factors, then compares each int8
+result list with the exact float32 one.  Vectors are drawn around a set of
+topic centroids so that neighbours are close, as with real transcript
+embeddings.  "scanned" is what one query reads per vector; "stored" is the
+on-disk size per vector, which int8 raises because the codes sit next to
+the float32 rows.
+
+Usage::
+
+    python benchmarks/bench_quantization.py --vectors 50000 --queries 200
+    python benchmarks/bench_quantization.py --dim 768 --top-k 20 --rerank 1 2 4 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.memory.vector_index import NumpyCollection  # noqa: E402
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark int8 vector quantization")
+    parser.add_argument("--vectors", type=int, default=20000, help="Stored embeddings")
+    parser.add_argument("--queries", type=int, default=200, help="Searches per configuration")
+    parser.add_argument("--dim", type=int, default=384, help="Embedding dimension")
+    parser.add_argument("--topics", type=int, default=200, help="Clusters the vectors are drawn around")
+    parser.add_argument("--top-k", type=int, default=10, help="Results per search")
+    parser.add_argument("--rerank", type=int, nargs="+", default=[1, 2, 4, 8], help="Re-rank factors")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args()
+
+
+def make_vectors(args: argparse.Namespace, rng: np.random.Generator, count: int) -> np.ndarray:
+    centroids = rng.standard_normal((args.topics, args.dim)).astype(np.float32)
+    vectors = centroids[rng.integers(0, args.topics, count)]
+    vectors += 0.6 * rng.standard_normal((count, args.dim)).astype(np.float32)
+    return vectors
+
+
+def fill(directory: str, vectors: np.ndarray, **kwargs) -> NumpyCollection:
+    collection = NumpyCollection(directory, **kwargs)
+    ids = [str(i) for i in range(len(vectors))]
+    for start in range(0, len(vectors), 4096):
+        stop = start + 4096
+        collection.add(documents=ids[start:stop], ids=ids[start:stop], embeddings=vectors[start:stop])
+    return collection
+
+
+def search(collection: NumpyCollection, queries: np.ndarray, k: int) -> tuple:
+    results: List[set] = []
+    latencies: List[float] = []
+    for query in queries:
+        start = time.perf_counter()
+        hits = collection.query(query_embeddings=[query], n_results=k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(set(hits["ids"][0]))
+    return results, latencies
+
+
+def main() -> None:
+    args = parse_args()
+    rng = np.random.default_rng(args.seed)
+    vectors = make_vectors(args, rng, args.vectors + args.queries)
+    stored, queries = vectors[: args.vectors], vectors[args.vectors :]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        exact = fill(f"{tmp}/float32", stored)
+        truth, latencies = search(exact, queries, args.top_k)
+        print(
+            f"float32      : scanned {exact.stats()['scanned_bytes_per_vector']:5d} B/vector  "
+            f"stored {exact.stats()['stored_bytes_per_vector']:5d} B/vector  "
+            f"recall@{args.top_k} 100.00%  p50 {statistics.median(latencies):.2f} ms"
+        )
+        for rerank in args.rerank:
+            compact = fill(f"{tmp}/int8-{rerank}", stored, quantization="int8", rerank=rerank)
+            found, latencies = search(compact, queries, args.top_k)
+            recall = np.mean([len(f & t) / len(t) for f, t in zip(found, truth)])
+            print(
+                f"int8 rerank {rerank}: scanned {compact.stats()['scanned_bytes_per_vector']:5d} B/vector  "
+                f"stored {compact.stats()['stored_bytes_per_vector']:5d} B/vector  "
+                f"recall@{args.top_k} {recall:.2%}  p50 {statistics.median(latencies):.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Load-test the enrollment API and report tail latency.
+
+Runs ``--enrollments`` face (or voice) enrollments against a running API,
+``--concurrency`` at a time, and meanwhile probes ``GET /health`` every
+``--probe-interval`` seconds.  Health latency shows whether enrollments
+block the event loop: with the offload pools it should stay near the idle
+baseline, while blocking routes push its p99 up to the length of a face
+encoding.  At the end the API's ``/status/offload`` pool saturation is
+printed.
+
+Usage::
+
+    uvicorn app.main:app --port 8000 &
+    python benchmarks/load_enroll.py --url http://localhost:8000 --enrollments 200 --concurrency 32
+    python benchmarks/load_enroll.py --kind voice --audio sample.wav
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import io
+import json
+import statistics
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import httpx
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load-test concurrent enrollments")
+    parser.add_argument("--url", default="http://localhost:8000", help="API base URL")
+    parser.add_argument("--kind", choices=["face", "voice"], default="face")
+    parser.add_argument("--enrollments", type=int, default=100, help="Enrollments to run")
+    parser.add_argument("--concurrency", type=int, default=16, help="Enrollments in flight at once")
+    parser.add_argument("--image", help="JPEG sent as every face image (a blank one by default)")
+    parser.add_argument("--audio", help="WAV sent for voice enrollments (silence by default)")
+    parser.add_argument("--probe-interval", type=float, default=0.05, help="Seconds between health probes")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    return parser.parse_args()
+
+
+def blank_jpeg(size: int = 480) -> bytes:
+    from PIL import Image
+
+    buf = io.BytesIO()
+    Image.new("RGB", (size, size), (128, 128, 128)).save(buf, format="JPEG")
+    return buf.getvalue()
+
+
+def silent_wav(seconds: float = 3.0) -> bytes:
+    import wave
+
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as fh:
+        fh.setnchannels(1)
+        fh.setsampwidth(2)
+        fh.setframerate(16000)
+        fh.writeframes(b"\x00\x00" * int(16000 * seconds))
+    return buf.getvalue()
+
+
+def percentiles(samples: List[float]) -> str:
+    if not samples:
+        return "no samples"
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return (
+        f"n={len(ordered):4d}  p50 {statistics.median(ordered):8.1f} ms  "
+        f"p95 {pick(0.95):8.1f} ms  p99 {pick(0.99):8.1f} ms  max {ordered[-1]:8.1f} ms"
+    )
+
+
+async def enroll_once(client: httpx.AsyncClient, args: argparse.Namespace, payload: bytes) -> int:
+    user_id = str(uuid.uuid4())
+    if args.kind == "face":
+        files = {name: (f"{name}.jpg", payload, "image/jpeg") for name in ("front", "left", "right")}
+    else:
+        files = {"file": ("voice.wav", payload, "audio/wav")}
+    resp = await client.post(f"/enroll/{args.kind}/{user_id}", files=files)
+    return resp.status_code
+
+
+async def run(args: argparse.Namespace) -> None:
+    if args.kind == "face":
+        payload = open(args.image, "rb").read() if args.image else blank_jpeg()
+    else:
+        payload = open(args.audio, "rb").read() if args.audio else silent_wav()
+    limits = httpx.Limits(max_connections=args.concurrency + 1)
+    latencies: List[float] = []
+    probes: List[float] = []
+    statuses: Dict[int, int] = {}
+    slots = asyncio.Semaphore(args.concurrency)
+    done = asyncio.Event()
+
+    async with httpx.AsyncClient(base_url=args.url, timeout=args.timeout, limits=limits) as client:
+        # Idle baseline for the health probe
+        idle: List[float] = []
+        for _ in range(20):
+            start = time.perf_counter()
+            await client.get("/health")
+            idle.append((time.perf_counter() - start) * 1000)
+
+        async def probe() -> None:
+            while not done.is_set():
+                start = time.perf_counter()
+                try:
+                    await client.get("/health")
+                    probes.append((time.perf_counter() - start) * 1000)
+                except httpx.HTTPError:
+                    pass
+                await asyncio.sleep(args.probe_interval)
+
+        async def one() -> None:
+            async with slots:
+                start = time.perf_counter()
+                try:
+                    status = await enroll_once(client, args, payload)
+                except httpx.HTTPError:
+                    status = 0
+                latencies.append((time.perf_counter() - start) * 1000)
+                statuses[status] = statuses.get(status, 0) + 1
+
+        prober = asyncio.create_task(probe())
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(args.enrollments)))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await prober
+
+        pools: Optional[dict] = None
+        try:
+            pools = (await client.get("/status/offload")).json()
+        except (httpx.HTTPError, ValueError):
+            pass
+
+    print(f"{args.enrollments} {args.kind} enrollments, concurrency {args.concurrency}, {elapsed:.1f} s "
+          f"({args.enrollments / elapsed:.1f}/s)")
+    print(f"status codes : {dict(sorted(statuses.items()))}")
+    print(f"enroll       : {percentiles(latencies)}")
+    print(f"health idle  : {percentiles(idle)}")
+    print(f"health loaded: {percentiles(probes)}")
+    if pools is not None:
+        print("offload pools:")
+        print(json.dumps(pools, indent=2))
+
+
+def main() -> None:
+    asyncio.run(run(parse_args()))
+
+
+if __name__ == "__main__":
+    main()
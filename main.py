@@ -69,6 +69,9 @@ def main() -> None:
         logger.info("Processed audio: %s", result)
     except Exception as exc:
         logger.exception("Audio processing failed: %s", exc)
+    finally:
+        # Wait for the transcript to be written to memory
+        assistant.close()
 
 if __name__ == '__main__':
     main()
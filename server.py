@@ -1,20 +1,27 @@
-from flask import Flask, request, jsonify, render_template
-from flask_socketio import SocketIO, emit
+from flask import Flask, Response, request, jsonify, render_template, stream_with_context
+from flask_socketio import SocketIO, emit, join_room, leave_room
 import logging
 import tempfile
 import subprocess
+import threading
 from pathlib import Path
 import yaml
 import json
+import re
 import atexit
 import shutil
 import os
+import numpy as np
 from dotenv import load_dotenv
 
-from src.sessions import SessionManager
-from src.transcription.base import TranscriptionService
-from src.memory.memory import Memory
-from src.assistant.chat import ChatAssistant
+from src.embeddings import get_embedding_service
+from src.lazy import LazyResource, warm_up
+from src.memory.ingest import IngestQueue
+from src.sessions import SessionManager, TranscriptFeed, TranscriptStore
+from src.transcription.audio import StreamDecoder, decode_audio, write_wav
+from src.transcription.pipeline import QueueFullError, TranscriptionPipeline
+from src.transcription.registry import get_registry
+from src.transcription.vad import VoiceActivityFilter
 
 def load_config(path: str) -> dict:
     """Load YAML configuration and substitute environment variables."""
@@ -36,67 +43,363 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# ---- Config and Transcriber setup ----
+# ---- Config and lazily built subsystems ----
 config = load_config("config.yaml")
-transcriber = TranscriptionService(
-    config.get("whisper_model", "base"),
-    enable_diarization=bool(config.get("enable_diarization", False)),
+
+
+def _build_transcriber():
+    from src.transcription.base import TranscriptionService
+
+    cache = dict(config.get("transcription_cache", {}) or {})
+    if cache.pop("disk", False):
+        # Hidden directory so it never sorts as the latest session
+        root = Path(config.get("session_root", "sessions"))
+        cache.setdefault("directory", str(root / ".cache" / "transcripts"))
+    return TranscriptionService(
+        config.get("whisper_model", "base"),
+        enable_diarization=config.get("enable_diarization", False),
+        batching=config.get("batching"),
+        cache=cache,
+    )
+
+
+def _build_memory():
+    from src.memory.memory import Memory
+
+    cache = config.get("search_cache", {}) or {}
+    chunking = config.get("memory_chunking", {}) or {}
+    search = config.get("memory_search", {}) or {}
+    storage = config.get("memory_storage", {}) or {}
+    return Memory(
+        persist_directory=os.getenv("VECTOR_STORE_DIR", "vector_store"),
+        query_cache_size=int(cache.get("query_cache_size", 256)),
+        result_ttl=float(cache.get("result_ttl", 30)),
+        chunk_tokens=int(chunking.get("max_tokens", 200)),
+        chunk_overlap=int(chunking.get("overlap", 40)),
+        search_mode=str(search.get("mode", "vector")),
+        rrf_k=int(search.get("rrf_k", 60)),
+        lexical_refresh=float(search.get("lexical_refresh", 30)),
+        quantization=storage.get("quantization") or None,
+        rerank=int(storage.get("rerank", 4)),
+    )
+
+
+def _build_chatbot():
+    from src.assistant.chat import ChatAssistant
+
+    return ChatAssistant(model_name="gpt-4o")
+
+
+# Whisper, Chroma and LangChain are only loaded on first use (or by the
+# background warm-up) so cheap routes can be served as soon as we import.
+transcriber = LazyResource("transcriber", _build_transcriber)
+memory = LazyResource("memory", _build_memory)
+chatbot = LazyResource("chatbot", _build_chatbot)
+HEAVY_RESOURCES = (transcriber, memory, chatbot)
+queue_cfg = config.get("transcription_queue", {}) or {}
+batching_cfg = config.get("batching", {}) or {}
+# Inference is serialized per model, so extra workers only pay off when the
+# batcher can group their segments: then fill one batch
+default_concurrency = (
+    int(batching_cfg.get("max_batch_size", 8)) if batching_cfg.get("enabled") else 1
+)
+pipeline = TranscriptionPipeline(
+    transcriber,
+    concurrency=int(queue_cfg.get("concurrency", default_concurrency)),
+    max_queue=int(queue_cfg.get("max_queue", 32)),
 )
+JOB_TIMEOUT = float(queue_cfg.get("timeout", 300))
+# One embedding pool per process, shared by memory and any other caller
+embed_cfg = config.get("embeddings", {}) or {}
+embeddings = get_embedding_service(
+    max_workers=int(embed_cfg.get("max_workers", 2)),
+    executor=str(embed_cfg.get("executor", "thread")),
+    max_pending=int(embed_cfg.get("max_pending", 64)),
+)
+# Transcripts are embedded and stored in batches off the request path
+ingest_cfg = config.get("memory_ingest", {}) or {}
+ingest = IngestQueue(
+    memory,
+    flush_interval=float(ingest_cfg.get("flush_interval", 0.5)),
+    max_batch=int(ingest_cfg.get("max_batch", 64)),
+    max_queue=int(ingest_cfg.get("max_queue", 10000)),
+)
+atexit.register(ingest.close)
 session_manager = SessionManager(config.get("session_root", "sessions"))
-memory = Memory()
-chatbot = ChatAssistant(model_name="gpt-4o")
 
 # Flask debug mode configuration
 FLASK_DEBUG = bool(config.get("flask_debug", False))
+# Rolling-window partial/final captions for Socket.IO chunks
+STREAMING = bool(config.get("streaming_transcription", False))
+# Drop silence from live chunks and uploads before they reach Whisper
+vad_cfg = dict(config.get("vad", {}) or {})
+vad = VoiceActivityFilter(**vad_cfg) if vad_cfg.pop("enabled", False) else None
+
+# Created on first use by _session_dir()
+SESSION_DIR: Path | None = None
+TMP_SESSION_DIR: Path | None = None
+_session_lock = threading.Lock()
+
+
+def _session_dir() -> Path:
+    """Return the current session directory, preparing it on first use."""
+    global SESSION_DIR, TMP_SESSION_DIR
+    if SESSION_DIR is None:
+        with _session_lock:
+            if SESSION_DIR is None:
+                try:
+                    SESSION_DIR = Path(session_manager.create_today_session())
+                    logger.info("Session directory ready at %s", SESSION_DIR)
+                except Exception as exc:
+                    logger.exception("Failed to prepare session directory: %s", exc)
+                    TMP_SESSION_DIR = Path(tempfile.mkdtemp(prefix="session_"))
+                    SESSION_DIR = TMP_SESSION_DIR
+                    logger.info("Temporary session directory created at %s", SESSION_DIR)
+    return SESSION_DIR
+
+
+def _refresh_session_dir() -> Path:
+    """Switch to today's session directory if the date has rolled over."""
+    global SESSION_DIR
+    try:
+        new_path = Path(session_manager.create_today_session())
+        if new_path != SESSION_DIR:
+            SESSION_DIR = new_path
+    except Exception as exc:
+        logger.exception("Failed to ensure session directory: %s", exc)
+    return _session_dir()
 
-TMP_SESSION_CREATED = False
-try:
-    SESSION_DIR = Path(session_manager.create_today_session())
-    logger.info("Session directory ready at %s", SESSION_DIR)
-except Exception as exc:
-    logger.exception("Failed to prepare session directory: %s", exc)
-    SESSION_DIR = Path(tempfile.mkdtemp(prefix="session_"))
-    TMP_SESSION_CREATED = True
-    logger.info("Temporary session directory created at %s", SESSION_DIR)
 
 def _cleanup_tmpdir() -> None:
-    if TMP_SESSION_CREATED:
+    if TMP_SESSION_DIR is not None:
         try:
-            shutil.rmtree(SESSION_DIR)
-            logger.info("Removed temporary session directory %s", SESSION_DIR)
+            shutil.rmtree(TMP_SESSION_DIR)
+            logger.info("Removed temporary session directory %s", TMP_SESSION_DIR)
         except Exception as exc:
-            logger.warning("Failed to remove temporary session directory %s: %s", SESSION_DIR, exc)
+            logger.warning("Failed to remove temporary session directory %s: %s", TMP_SESSION_DIR, exc)
 
 atexit.register(_cleanup_tmpdir)
 
+# Line indexes of recently used sessions' transcript.txt
+_transcripts: dict[Path, TranscriptStore] = {}
+# Held across append and publish so pushes follow file order
+_publish_locks: dict[str, threading.Lock] = {}
+MAX_TRANSCRIPT_LINES = 1000
+# Recent transcript lines per session for subscribers that reconnect
+feed_cfg = config.get("transcript_feed", {}) or {}
+feed = TranscriptFeed(replay=int(feed_cfg.get("replay", 500)))
+SSE_KEEPALIVE = float(feed_cfg.get("keepalive", 15))
+
+
+def _transcript_store(session_dir: Path) -> TranscriptStore:
+    """Return the transcript index for ``session_dir``."""
+    path = session_dir / "transcript.txt"
+    with _session_lock:
+        store = _transcripts.get(path)
+        if store is None:
+            if len(_transcripts) >= 8:
+                _transcripts.pop(next(iter(_transcripts)))
+            store = _transcripts[path] = TranscriptStore(path)
+        return store
+
+
+def _resolve_session(name: str | None) -> Path | None:
+    """Return the directory of session ``name`` (default: the current one)."""
+    current = _session_dir()
+    if not name or name == current.name:
+        return current
+    if not re.fullmatch(r"\d{4}-\d{2}-\d{2}", name):
+        return None
+    path = Path(session_manager.root) / name
+    return path if path.is_dir() else None
+
+
+def _publish_lock(session: str) -> threading.Lock:
+    with _session_lock:
+        lock = _publish_locks.get(session)
+        if lock is None:
+            lock = _publish_locks[session] = threading.Lock()
+        return lock
+
+
+def _append_transcript(session_dir: Path, text: str) -> None:
+    """Append ``text`` to the session transcript and push it to subscribers."""
+    store = _transcript_store(session_dir)
+    # One lock per session keeps file order, sequence numbers and pushes in step
+    with _publish_lock(session_dir.name):
+        generation = store.generation
+        count = store.append(text)
+        reset = store.generation != generation
+        lines = text.split("\n")
+        for seq, line in enumerate(lines, start=count - len(lines) + 1):
+            event = feed.publish(session_dir.name, seq, line, reset=reset)
+            reset = False
+            socketio.emit("final_transcript", event, to=f"transcript:{session_dir.name}")
+
+
+def _remember(text: str, session_dir: Path, user_id: str | None = None) -> None:
+    """Queue ``text`` for memory with its session, user and speaker labels.
+
+    Diarized transcripts ("SPEAKER: words" per line) are stored line by line
+    so searches can filter on the speaker.
+    """
+    diarized = transcriber.ready and transcriber.diarization is not None
+    for line in text.split("\n") if diarized else [text]:
+        speaker = None
+        if diarized:
+            label, sep, said = line.partition(": ")
+            if sep:
+                speaker, line = label, said
+        ingest.put(line, {"session": session_dir.name, "user_id": user_id, "speaker": speaker})
+
+
+def _transcript_events(session_dir: Path, since: int) -> list[dict]:
+    """Return transcript lines after ``since``, from the replay buffer if possible."""
+    events = feed.since(session_dir.name, since)
+    if events is None:
+        # Older than the replay buffer: read the missed lines from the file
+        lines, cursor = _transcript_store(session_dir).since(since, MAX_TRANSCRIPT_LINES)
+        events = [
+            {"seq": seq, "text": line, "session": session_dir.name}
+            for seq, line in enumerate(lines, start=cursor - len(lines) + 1)
+        ]
+    return events
+
+# Build the heavy subsystems in the background instead of on the first
+# request.  Opt-in (config ``warm_up``, overridden by ``WARM_UP``) so that
+# importing this module, as the tests do, does not start loading them.
+if os.getenv("WARM_UP", str(config.get("warm_up", False))).lower() in ("1", "true", "yes"):
+    warm_up(HEAVY_RESOURCES)
+
 app = Flask(__name__)
 socketio = SocketIO(app, cors_allowed_origins="*")
 
+# One long-lived ffmpeg decoder (and streaming window) per Socket.IO connection
+_decoders: dict[str, StreamDecoder] = {}
+_streams: dict = {}
+_decoders_lock = threading.Lock()
+# Socket.IO runs each event on its own thread; chunks of one connection must
+# reach the recording and the decoder one at a time and in ``seq`` order
+_chunk_locks: dict[str, threading.Lock] = {}
+# Per connection: current recording, next expected seq, chunks that arrived
+# early, and whether its decoder failed
+_chunk_order: dict[str, dict] = {}
+MAX_HELD_CHUNKS = 32
+# Decoded audio waiting for a pipeline worker, and connections being drained
+_pending_audio: dict[str, list] = {}
+_draining: set[str] = set()
+# Disconnected connections whose stream is flushed once their audio is drained
+_closing: set[str] = set()
+
+
+def _decoder_for(sid: str) -> StreamDecoder:
+    """Return the streaming decoder for ``sid``, starting one if needed."""
+    with _decoders_lock:
+        decoder = _decoders.get(sid)
+        if decoder is None:
+            decoder = StreamDecoder()
+            _decoders[sid] = decoder
+        return decoder
+
+
+def _chunk_lock(sid: str) -> threading.Lock:
+    with _decoders_lock:
+        lock = _chunk_locks.get(sid)
+        if lock is None:
+            lock = _chunk_locks[sid] = threading.Lock()
+        return lock
+
+
+def _stream_for(sid: str):
+    """Return the rolling transcription window for ``sid``."""
+    with _decoders_lock:
+        stream = _streams.get(sid)
+        if stream is None:
+            stream = transcriber.stream()
+            _streams[sid] = stream
+        return stream
+
+
+def _close_decoder(sid: str) -> np.ndarray:
+    """Stop ``sid``'s decoder and return the PCM it still held."""
+    with _decoders_lock:
+        decoder = _decoders.pop(sid, None)
+    if decoder is not None:
+        try:
+            return decoder.close()
+        except Exception as exc:
+            logger.warning("Failed to close decoder for %s: %s", sid, exc)
+    return np.zeros(0, dtype=np.float32)
+
+
+def _flush_stream(stream) -> None:
+    """Commit the remaining audio of a closed connection's window to memory."""
+    try:
+        for event in stream.flush():
+            _remember(event["text"], _session_dir())
+    except Exception as exc:
+        logger.warning("Failed to flush stream: %s", exc)
+
 @app.route("/")
 def index():
     return render_template("index.html")
 
+
+@app.route("/healthz")
+def liveness():
+    """Liveness probe: the process is up and serving requests."""
+    return jsonify({"status": "ok"})
+
+
+@app.route("/readyz")
+def readiness():
+    """Readiness probe: 503 until Whisper, memory and chat are initialised."""
+    components = {resource.name: resource.describe() for resource in HEAVY_RESOURCES}
+    ready = all(resource.ready for resource in HEAVY_RESOURCES)
+    return jsonify({"ready": ready, "components": components}), 200 if ready else 503
+
 @app.route("/search")
 def search_route():
+    """Semantic search over stored transcripts.
+
+    Optional ``session``, ``user``, ``speaker``, ``from`` and ``to``
+    (``YYYY-MM-DD``) filter the results; ``limit`` and ``cursor`` page
+    through them.  Either one returns ``metadatas`` and ``next_cursor`` too.
+    ``mode`` (``vector`` or ``hybrid``) overrides the configured ranking.
+    """
     query = request.args.get("q", "")
     if not query:
         return jsonify({"error": "missing query"}), 400
+    filters = {
+        key: request.args[arg]
+        for arg, key in (
+            ("session", "session"),
+            ("user", "user_id"),
+            ("speaker", "speaker"),
+            ("from", "date_from"),
+            ("to", "date_to"),
+        )
+        if request.args.get(arg)
+    }
+    options = {"mode": request.args["mode"]} if request.args.get("mode") else {}
+    paged = bool(filters) or "limit" in request.args or "cursor" in request.args
     try:
-        results = memory.search(query)
+        if not paged:
+            return jsonify({"results": memory.search(query, **options)})
+        limit = min(int(request.args.get("limit", 10)), 100)
+        page = memory.search_page(
+            query, limit=limit, cursor=request.args.get("cursor"), **options, **filters
+        )
+    except ValueError as exc:
+        return jsonify({"error": f"invalid search parameters: {exc}"}), 400
     except Exception as exc:
         logger.exception("Search failed: %s", exc)
         return jsonify({"error": f"search failed: {exc}"}), 500
-    return jsonify({"results": results})
+    return jsonify(page)
 
 @app.route("/transcribe", methods=["POST"])
 def transcribe_route():
-    global SESSION_DIR
-    try:
-        new_path = Path(session_manager.create_today_session())
-        if new_path != SESSION_DIR:
-            SESSION_DIR = new_path
-    except Exception as exc:
-        logger.exception("Failed to ensure session directory: %s", exc)
+    session_dir = _refresh_session_dir()
 
     if "file" not in request.files:
         logger.warning("No file provided in request")
@@ -105,10 +408,9 @@ def transcribe_route():
     file = request.files["file"]
     logger.info("Received file: %s", file.filename)
 
-    video_path = SESSION_DIR / "video.webm"
-    audio_path = SESSION_DIR / "audio.wav"
-    transcript_path = SESSION_DIR / "transcript.txt"
-    tags_path = SESSION_DIR / "tags.json"
+    video_path = session_dir / "video.webm"
+    audio_path = session_dir / "audio.wav"
+    tags_path = session_dir / "tags.json"
     tags = request.form.get("tags", "")
 
     try:
@@ -116,12 +418,8 @@ def transcribe_route():
         with open(video_path, "wb") as dest:
             dest.write(data)
         logger.info("Saved final video to %s", video_path)
-        subprocess.run(
-            ["ffmpeg", "-y", "-i", str(video_path), str(audio_path)],
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-        )
+        audio = decode_audio(data)
+        write_wav(str(audio_path), audio)
         logger.info("Audio extracted to %s", audio_path)
     except subprocess.CalledProcessError as exc:
         logger.error("ffmpeg failed: %s", exc)
@@ -131,17 +429,18 @@ def transcribe_route():
         return jsonify({"error": f"Error processing file: {exc}"}), 500
 
     try:
-        text = transcriber.transcribe(str(audio_path))
+        future = pipeline.transcribe(audio)
+    except QueueFullError as exc:
+        logger.warning("Rejecting transcription of %s: %s", file.filename, exc)
+        return jsonify({"error": str(exc)}), 429
+
+    try:
+        text = future.result(timeout=JOB_TIMEOUT)
         if text is None:
             raise RuntimeError("transcription returned None")
-        with open(transcript_path, "a", encoding="utf-8") as tf:
-            tf.write(text + "\n")
+        _append_transcript(session_dir, text)
         logger.info("Transcription complete for %s", file.filename)
-        try:
-            memory.add(text)
-        except Exception as exc:
-            logger.warning("Failed to store transcript in memory: %s", exc)
-        socketio.emit("final_transcript", {"text": text})
+        _remember(text, session_dir, user_id=request.form.get("user_id"))
 
         if tags:
             try:
@@ -156,7 +455,7 @@ def transcribe_route():
                 existing.extend(new_tags)
                 tags_path.write_text(json.dumps(existing), encoding="utf-8")
         # Mark Whisper transcription as done
-        session_manager.write_status(str(SESSION_DIR), True, False)
+        session_manager.write_status(str(session_dir), True, False)
     except Exception as exc:
         logger.exception("Transcription failed: %s", exc)
         return jsonify({"error": f"transcription failed: {exc}"}), 500
@@ -171,24 +470,27 @@ def upload_route():
         return jsonify({"error": "missing file"}), 400
 
     file = request.files["file"]
-    with tempfile.TemporaryDirectory() as tmpdir:
-        video_path = Path(tmpdir) / file.filename
-        audio_path = Path(tmpdir) / "audio.wav"
-        file.save(video_path)
-        try:
-            subprocess.run(
-                ["ffmpeg", "-y", "-i", str(video_path), str(audio_path)],
-                check=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-            )
-        except Exception as exc:
-            logger.exception("ffmpeg failed: %s", exc)
-            return jsonify({"error": f"ffmpeg failed: {exc}"}), 500
+    try:
+        audio = decode_audio(file.read())
+    except Exception as exc:
+        logger.exception("ffmpeg failed: %s", exc)
+        return jsonify({"error": f"ffmpeg failed: {exc}"}), 500
 
-        text = transcriber.transcribe(str(audio_path))
-        if text is None:
-            return jsonify({"error": "transcription failed"}), 500
+    if vad is not None:
+        audio = vad.filter(audio, session=_session_dir().name)
+        if audio.size == 0:
+            return jsonify({"text": ""})
+
+    try:
+        text = pipeline.transcribe(audio).result(timeout=JOB_TIMEOUT)
+    except QueueFullError as exc:
+        logger.warning("Rejecting upload: %s", exc)
+        return jsonify({"error": str(exc)}), 429
+    except Exception as exc:
+        logger.exception("Upload transcription failed: %s", exc)
+        text = None
+    if text is None:
+        return jsonify({"error": "transcription failed"}), 500
     return jsonify({"text": text})
 
 
@@ -208,83 +510,362 @@ def chat_route():
 
 
 @socketio.on("chunk")
-def handle_chunk(data: bytes) -> None:
-    """Process a streaming video chunk sent over WebSocket."""
-    global SESSION_DIR
-    try:
-        new_path = Path(session_manager.create_today_session())
-        if new_path != SESSION_DIR:
-            SESSION_DIR = new_path
-    except Exception as exc:
-        logger.exception("Failed to ensure session directory: %s", exc)
-
-    session_video = SESSION_DIR / "video.webm"
+def handle_chunk(data) -> None:
+    """Process a streaming video chunk sent over WebSocket.
+
+    ``data`` is ``{"rec": id, "seq": n, "data": bytes}``: ``seq`` counts the
+    chunks of recording ``rec`` from 0.  Events are handled on separate
+    threads, so chunks that arrive early wait until the ones before them
+    have been processed.  Bare bytes (older clients) are taken in arrival
+    order.
+    """
+    sid = request.sid
+    with _chunk_lock(sid):
+        for chunk in _ordered_chunks(sid, data):
+            _handle_chunk(sid, chunk)
+
+
+def _ordered_chunks(sid: str, data) -> list:
+    """Return the chunks of ``sid`` that can be processed now, in order."""
+    if not isinstance(data, dict):
+        rec, seq, data = None, None, data
+    else:
+        rec, seq, data = data.get("rec"), int(data.get("seq", 0)), data.get("data") or b""
+    with _decoders_lock:
+        if sid in _closing:
+            return []
+        order = _chunk_order.get(sid)
+        restart = order is not None and order["rec"] != rec
+        if order is None or restart:
+            order = _chunk_order[sid] = {"rec": rec, "next": 0, "held": {}, "failed": False}
+    if restart:
+        # A new recording starts with a new container header: finish the
+        # previous one's audio and give this one its own decoder
+        _finish_live_audio(sid, _close_decoder(sid), closing=False)
+    if order["failed"]:
+        return []
+    if seq is None:
+        return [data]
+    held = order["held"]
+    if seq >= order["next"]:
+        held[seq] = data
+    if len(held) > MAX_HELD_CHUNKS and order["next"] not in held:
+        logger.warning("Chunk %d from %s never arrived; skipping ahead", order["next"], sid)
+        order["next"] = min(held)
+    ready = []
+    while order["next"] in held:
+        ready.append(held.pop(order["next"]))
+        order["next"] += 1
+    return ready
+
+
+def _handle_chunk(sid: str, data: bytes) -> None:
+    session_video = _refresh_session_dir() / "video.webm"
     try:
         with open(session_video, "ab") as dest:
             dest.write(data)
     except Exception as exc:
         logger.exception("Failed to write chunk to %s: %s", session_video, exc)
 
-    with tempfile.TemporaryDirectory() as tmpdir:
-        video_path = Path(tmpdir) / "chunk.webm"
-        audio_path = Path(tmpdir) / "chunk.wav"
-        with open(video_path, "wb") as fh:
-            fh.write(data)
-        try:
-            subprocess.run(
-                ["ffmpeg", "-y", "-i", str(video_path), str(audio_path)],
-                check=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-            )
-        except Exception as exc:
-            logger.exception("Failed to process chunk: %s", exc)
-            emit("transcription", {"error": str(exc)})
+    order = _chunk_order.get(sid)
+    if order is not None and order["failed"]:
+        return
+    try:
+        audio = _decoder_for(sid).feed(data)
+    except Exception as exc:
+        logger.exception("Failed to process chunk: %s", exc)
+        # Later chunks carry no container header, so a new decoder could not
+        # read them: the rest of this recording is dropped
+        _close_decoder(sid)
+        if order is not None:
+            order["failed"] = True
+        emit("transcription", {"error": f"{exc}; start a new recording", "fatal": True})
+        return
+    if audio.size == 0:
+        # ffmpeg has not produced samples for this chunk yet; they will be
+        # returned together with the next one.
+        return
+
+    if vad is not None:
+        audio = vad.filter(audio, session=sid)
+        if audio.size == 0:
+            # No speech: skip the chunk, but let a streaming window that
+            # still holds audio finalise its tail now that the speaker paused.
+            with _decoders_lock:
+                stream = _streams.get(sid)
+                waiting = bool(_pending_audio.get(sid))
+            if stream is None or not (waiting or stream.buffered_seconds):
+                return
+    if STREAMING:
+        _stream_for(sid)
+    _enqueue_live_audio(sid, audio)
+
+
+def _enqueue_live_audio(sid: str, audio: np.ndarray) -> None:
+    """Hand decoded audio for ``sid`` to the transcription pipeline.
+
+    Audio that arrives while an earlier job for the same connection is still
+    queued or running is picked up by that job, so results stay in order and
+    a backlog is transcribed as one larger window.
+    """
+    with _decoders_lock:
+        _pending_audio.setdefault(sid, []).append(audio)
+        if sid in _draining:
             return
+        _draining.add(sid)
+    try:
+        pipeline.submit(_drain_live_audio, sid)
+    except QueueFullError as exc:
+        with _decoders_lock:
+            _draining.discard(sid)
+            _pending_audio.pop(sid, None)
+        logger.warning("Dropping audio from %s: %s", sid, exc)
+        emit("transcription", {"error": str(exc)})
+
+
+def _finish_live_audio(sid: str, tail: np.ndarray, closing: bool = True) -> None:
+    """Transcribe the last PCM of a recording, then flush its window.
+
+    ``tail`` is what the decoder still held.  With ``closing`` the
+    connection is gone and its streaming window is committed to memory once
+    the pending audio has been transcribed.
+    """
+    if vad is not None and tail.size:
+        tail = vad.filter(tail, session=sid)
+    if STREAMING and tail.size:
+        _stream_for(sid)
+    with _decoders_lock:
+        if tail.size:
+            _pending_audio.setdefault(sid, []).append(tail)
+        if closing:
+            # The drain job flushes and drops the window when it runs dry
+            _closing.add(sid)
+        else:
+            # An empty chunk tells the drain job to flush the window
+            _pending_audio.setdefault(sid, []).append(np.zeros(0, dtype=np.float32))
+        if sid in _draining:
+            return
+        _draining.add(sid)
+    try:
+        pipeline.submit(_drain_live_audio, sid)
+    except QueueFullError:
+        with _decoders_lock:
+            _draining.discard(sid)
+            _pending_audio.pop(sid, None)
+            if closing:
+                _closing.discard(sid)
+                _streams.pop(sid, None)
+        logger.warning("Discarding the last audio of %s: queue is full", sid)
+
+
+def _drain_live_audio(sid: str) -> None:
+    """Pipeline job: transcribe pending audio for ``sid`` and push results."""
+    while True:
+        with _decoders_lock:
+            chunks = _pending_audio.pop(sid, None)
+            if not chunks:
+                _draining.discard(sid)
+                closing = sid in _closing
+                _closing.discard(sid)
+                stream = _streams.pop(sid, None) if closing else None
+            else:
+                stream = _streams.get(sid)
+        if not chunks:
+            if stream is not None:
+                _flush_stream(stream)
+            return
+        audio = np.concatenate(chunks)
+        # An empty chunk marks silence detected by the VAD after speech
+        ended = chunks[-1].size == 0
         try:
-            text = transcriber.transcribe(str(audio_path))
-            if text is None:
-                raise RuntimeError("transcription returned None")
-            try:
-                memory.add(text)
-            except Exception as exc:
-                logger.warning("Failed to store transcript in memory: %s", exc)
+            if STREAMING:
+                if stream is None:
+                    continue
+                events = stream.push(audio) if audio.size else []
+                if ended:
+                    events += stream.flush()
+            else:
+                if audio.size == 0:
+                    continue
+                text = transcriber.transcribe(audio)
+                if text is None:
+                    raise RuntimeError("transcription returned None")
+                events = [{"text": text, "final": True}]
         except Exception as exc:
             logger.exception("Chunk transcription failed: %s", exc)
-            emit("transcription", {"error": str(exc)})
-            return
-    emit("transcription", {"text": text})
+            socketio.emit("transcription", {"error": str(exc)}, to=sid)
+            continue
+        for event in events:
+            if event["final"]:
+                _remember(event["text"], _session_dir())
+            if not STREAMING:
+                event = {"text": event["text"]}
+            socketio.emit("transcription", event, to=sid)
+
+
+@socketio.on("disconnect")
+def handle_disconnect(reason=None) -> None:
+    """Stop the streaming decoder owned by the disconnected client."""
+    sid = request.sid
+    # Let a chunk being processed finish before the decoder is flushed
+    with _chunk_lock(sid):
+        tail = _close_decoder(sid)
+        with _decoders_lock:
+            _chunk_order.pop(sid, None)
+            _chunk_locks.pop(sid, None)
+        # The words still buffered in ffmpeg are transcribed like any chunk
+        _finish_live_audio(sid, tail)
+
+
+@socketio.on("subscribe")
+def handle_subscribe(data=None) -> None:
+    """Join a session's transcript room and replay lines after ``since``.
+
+    ``data`` is ``{"session": name, "since": seq}``; both are optional.  The
+    client is added to the room before the replay, so a line published in
+    between may arrive twice and should be skipped by its ``seq``.
+    """
+    data = data or {}
+    session_dir = _resolve_session(data.get("session"))
+    if session_dir is None:
+        emit("subscribed", {"error": "unknown session"})
+        return
+    try:
+        since = int(data.get("since") or 0)
+    except (TypeError, ValueError):
+        emit("subscribed", {"error": "since must be an integer"})
+        return
+    join_room(f"transcript:{session_dir.name}")
+    latest = len(_transcript_store(session_dir))
+    # A cursor past the end means the transcript was reset; start over
+    events = _transcript_events(session_dir, since if since <= latest else 0)
+    emit("subscribed", {"session": session_dir.name, "seq": latest})
+    for event in events:
+        emit("final_transcript", event)
+
+
+@socketio.on("unsubscribe")
+def handle_unsubscribe(data=None) -> None:
+    session_dir = _resolve_session((data or {}).get("session"))
+    if session_dir is not None:
+        leave_room(f"transcript:{session_dir.name}")
+
+
+@app.route("/stream/transcript", methods=["GET"])
+def stream_transcript():
+    """Server-Sent Events stream of transcript lines.
+
+    Resumes after ``?since=seq`` or the ``Last-Event-ID`` header that
+    browsers send automatically when an ``EventSource`` reconnects.
+    """
+    session_dir = _resolve_session(request.args.get("session"))
+    if session_dir is None:
+        return jsonify({"error": "unknown session"}), 404
+    try:
+        since = int(request.headers.get("Last-Event-ID") or request.args.get("since") or 0)
+    except ValueError:
+        return jsonify({"error": "since must be an integer"}), 400
+
+    def events():
+        # A cursor past the end means the transcript was reset; start over
+        cursor = since if since <= len(_transcript_store(session_dir)) else 0
+        yield "retry: 3000\n\n"
+        while True:
+            pending = _transcript_events(session_dir, cursor)
+            if not pending:
+                if not feed.wait(session_dir.name, cursor, timeout=SSE_KEEPALIVE):
+                    yield ": keep-alive\n\n"
+                continue
+            for event in pending:
+                cursor = event["seq"]
+                yield f"id: {cursor}\nevent: transcript\ndata: {json.dumps(event)}\n\n"
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return Response(stream_with_context(events()), mimetype="text/event-stream", headers=headers)
+
+
+@app.route("/status/pipeline", methods=["GET"])
+def pipeline_status():
+    """Return transcription queue depth, counters and job latencies."""
+    return jsonify(pipeline.stats())
+
+
+@app.route("/status/vad", methods=["GET"])
+def vad_status():
+    """Return the audio seconds the VAD skipped, overall and per session."""
+    if vad is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **vad.stats()})
+
+
+@app.route("/status/cache", methods=["GET"])
+def cache_status():
+    """Return transcription cache hits, misses and size."""
+    if not transcriber.ready:
+        return jsonify({"ready": False}), 503
+    cache = transcriber.cache
+    if cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **cache.stats()})
+
+
+@app.route("/status/memory", methods=["GET"])
+def memory_status():
+    """Return ingestion counters, search cache hits and search latencies."""
+    search_cache = memory.cache_stats() if memory.ready else None
+    search = memory.search_stats() if memory.ready else None
+    return jsonify({**ingest.stats(), "search_cache": search_cache, "search": search})
+
+
+@app.route("/status/embeddings", methods=["GET"])
+def embeddings_status():
+    """Return embedding pool occupancy and per-backend throughput."""
+    return jsonify(embeddings.stats())
+
+
+@app.route("/status/models", methods=["GET"])
+def models_status():
+    """Return the resident Whisper models and their memory use."""
+    return jsonify({"models": get_registry().stats()})
+
+
+def _transcript_status():
+    """Return the last transcript line, plus more lines when asked.
+
+    ``?n=N`` adds the last ``N`` lines; ``?cursor=C`` adds the lines after
+    line ``C`` (at most ``limit``).  Both include ``cursor``, the line count
+    to pass on the next poll so only new lines are returned.
+    """
+    try:
+        args = {k: int(v) for k, v in request.args.items() if k in ("n", "cursor", "limit")}
+    except ValueError:
+        return jsonify({"error": "n, cursor and limit must be integers"}), 400
+    n, cursor = args.get("n"), args.get("cursor")
+    limit = min(args.get("limit", MAX_TRANSCRIPT_LINES), MAX_TRANSCRIPT_LINES)
+    try:
+        store = _transcript_store(_session_dir())
+        last = store.last(1)
+        body = {"text": last[-1] if last else ""}
+        if cursor is not None:
+            body["lines"], body["cursor"] = store.since(cursor, limit)
+        elif n is not None:
+            body["lines"] = store.last(min(n, MAX_TRANSCRIPT_LINES))
+            body["cursor"] = len(store)
+    except Exception as exc:
+        logger.exception("Failed to read transcript: %s", exc)
+        return jsonify({"error": f"failed to read transcript: {exc}"}), 500
+    return jsonify(body)
 
 
 @app.route("/status/latest", methods=["GET"])
 def latest_status():
     """Return the most recent line of the current transcript."""
-    transcript_path = SESSION_DIR / "transcript.txt"
-    text = ""
-    try:
-        if transcript_path.exists():
-            lines = transcript_path.read_text(encoding="utf-8").splitlines()
-            if lines:
-                text = lines[-1]
-    except Exception as exc:
-        logger.exception("Failed to read transcript: %s", exc)
-        return jsonify({"error": f"failed to read transcript: {exc}"}), 500
-    return jsonify({"text": text})
+    return _transcript_status()
 
 @app.route("/status/last-line", methods=["GET"])
 def status_last_line():
     """Return the most recent line of transcription."""
-    transcript_path = SESSION_DIR / "transcript.txt"
-    text = ""
-    try:
-        if transcript_path.exists():
-            lines = transcript_path.read_text(encoding="utf-8").splitlines()
-            if lines:
-                text = lines[-1]
-    except Exception as exc:
-        logger.exception("Failed to read transcript: %s", exc)
-        return jsonify({"error": f"failed to read transcript: {exc}"}), 500
-    return jsonify({"text": text})
+    return _transcript_status()
 
 if __name__ == "__main__":
     socketio.run(app, debug=FLASK_DEBUG)
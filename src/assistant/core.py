@@ -1,5 +1,6 @@
 import logging
 from src.transcription.base import TranscriptionService
+from src.memory.ingest import IngestQueue
 from src.memory.memory import Memory
 
 logger = logging.getLogger(__name__)
@@ -12,12 +13,17 @@ class Assistant:
         """Initialize the assistant with the given Whisper model."""
         self.transcription = TranscriptionService(model_name)
         self.memory = Memory()
+        self.ingest = IngestQueue(self.memory)
+
+    def close(self) -> None:
+        """Store any queued transcripts and stop the ingestion thread."""
+        self.ingest.close()
 
     def process_audio(self, audio_path: str) -> str:
         logger.info("Processing audio file %s", audio_path)
         text = self.transcription.transcribe(audio_path)
         if text is not None:
-            self.memory.add(text)
+            self.ingest.put(text)
             return text
         logger.warning("Transcription failed for %s", audio_path)
         return ""
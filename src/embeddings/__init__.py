@@ -0,0 +1,12 @@
+from .backends import FaceBackend, RemoteFaceBackend, TextBackend, VoiceBackend
+from .service import EmbeddingFunction, EmbeddingService, get_embedding_service
+
+__all__ = [
+    "EmbeddingFunction",
+    "EmbeddingService",
+    "FaceBackend",
+    "RemoteFaceBackend",
+    "TextBackend",
+    "VoiceBackend",
+    "get_embedding_service",
+]
@@ -0,0 +1,153 @@
+"""Embedding backends for :class:`~src.embeddings.service.EmbeddingService`.
+
+A backend turns a batch of inputs of one kind into vectors with
+``embed_many(items) -> list``.  Models are loaded on the first batch, in
+whichever thread or process the service runs it, so constructing a backend
+is cheap and backends can be shipped to a process pool before use.
+"""
+
+from __future__ import annotations
+
+import io
+import threading
+from pathlib import Path
+from typing import Any, Callable, List, Optional, Sequence, Union
+
+import numpy as np
+
+from src.memfile import memory_path
+
+FACE_DIM = 128
+
+Image = Union[bytes, str, Path, np.ndarray]
+Audio = Union[bytes, str, Path]
+
+
+class TextBackend:
+    """Sentence embeddings (MiniLM when installed, hashed words otherwise)."""
+
+    kind = "text"
+
+    def __init__(self, factory: Optional[Callable[[], Callable[[Sequence[str]], Any]]] = None) -> None:
+        self._factory = factory
+        self._embed: Optional[Callable[[Sequence[str]], Any]] = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        state = {**self.__dict__, "_embed": None}
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def name(self) -> str:
+        return self._model().name()
+
+    def _model(self) -> Any:
+        # Pool threads and name() may ask at once; load MiniLM only once
+        with self._lock:
+            if self._embed is None:
+                if self._factory is None:
+                    from src.memory.vector_index import default_embedding
+
+                    self._embed = default_embedding()
+                else:
+                    self._embed = self._factory()
+            return self._embed
+
+    def embed_many(self, items: Sequence[str]) -> List[np.ndarray]:
+        return list(np.asarray(self._model()(list(items)), dtype=np.float32))
+
+
+class FaceBackend:
+    """128-d dlib face encodings of the first face in each image.
+
+    Images may be encoded bytes (JPEG/PNG), paths or RGB arrays; an image
+    without a detectable face yields a zero vector.
+    """
+
+    kind = "face"
+
+    def __init__(self, model: str = "hog") -> None:
+        self.model = model
+
+    def embed_many(self, items: Sequence[Image]) -> List[np.ndarray]:
+        try:
+            import face_recognition  # dlib loads its models on import
+        except Exception as exc:
+            raise RuntimeError("face_recognition not available") from exc
+        vectors = []
+        for item in items:
+            if isinstance(item, bytes):
+                item = face_recognition.load_image_file(io.BytesIO(item))
+            elif not isinstance(item, np.ndarray):
+                item = face_recognition.load_image_file(str(item))
+            locations = face_recognition.face_locations(item, model=self.model)
+            encodings = face_recognition.face_encodings(item, locations[:1]) if locations else []
+            vectors.append(
+                np.asarray(encodings[0], dtype=np.float32) if encodings else np.zeros(FACE_DIM, np.float32)
+            )
+        return vectors
+
+
+class RemoteFaceBackend:
+    """Face encodings computed by the API's ``/embed`` endpoint."""
+
+    kind = "face"
+
+    def __init__(self, url: str, timeout: float = 30.0) -> None:
+        self.url = url
+        self.timeout = timeout
+
+    def embed_many(self, items: Sequence[bytes]) -> List[np.ndarray]:
+        import requests
+
+        vectors = []
+        for item in items:
+            resp = requests.post(self.url, files={"file": ("image.jpg", item)}, timeout=self.timeout)
+            resp.raise_for_status()
+            data = resp.json()
+            vectors.append(np.array(data.get("vector") or data.get("embedding"), dtype=np.float32))
+        return vectors
+
+
+class VoiceBackend:
+    """Picovoice Eagle speaker profiles, returned as byte vectors.
+
+    ``factory`` builds the profiler once per process; batches from several
+    threads take turns on it.  Audio is a WAV path or WAV bytes, the latter
+    handed over through :func:`~src.memfile.memory_path`.
+    """
+
+    kind = "voice"
+
+    def __init__(self, factory: Callable[[], Any]) -> None:
+        self._factory = factory
+        self._profiler: Any = None
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        state = {**self.__dict__, "_profiler": None}
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def embed_many(self, items: Sequence[Audio]) -> List[np.ndarray]:
+        with self._lock:
+            if self._profiler is None:
+                self._profiler = self._factory()
+            return [self._enroll(item) for item in items]
+
+    def _enroll(self, item: Audio) -> np.ndarray:
+        if isinstance(item, (bytes, bytearray, memoryview)):
+            # Eagle only reads files; keep the plaintext WAV in memory
+            with memory_path(item, suffix=".wav") as path:
+                profile = self._profiler.enroll(path)
+        else:
+            profile = self._profiler.enroll(str(item))
+        return np.frombuffer(bytes(profile), dtype=np.uint8)
@@ -0,0 +1,239 @@
+"""Process-wide embedding service shared by memory, enrollment and workers.
+
+Text for :class:`~src.memory.memory.Memory`, face images for enrollment and
+voice samples for speaker profiles all go through one
+:class:`EmbeddingService`.  Callers hand it whole batches with
+:meth:`EmbeddingService.embed_many` (or :meth:`~EmbeddingService.aembed_many`
+from async code) and a bounded thread or process pool runs them, so models
+are loaded once per worker, concurrent callers cannot oversubscribe the
+machine and every backend reports its throughput.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+from .backends import FaceBackend, TextBackend, VoiceBackend
+
+logger = logging.getLogger(__name__)
+
+EXECUTORS = ("thread", "process")
+
+# Backends of the current pool process, installed by ``_init_process``
+_process_backends: Dict[str, Any] = {}
+
+
+def _init_process(backends: Dict[str, Any]) -> None:
+    _process_backends.update(backends)
+
+
+def _embed_in_process(kind: str, items: List[Any]) -> List[Any]:
+    return _process_backends[kind].embed_many(items)
+
+
+class EmbeddingService:
+    """Run batched embedding requests for registered backends on a pool.
+
+    ``executor="process"`` suits backends that hold the GIL (dlib face
+    encodings); each pool process gets its own copy of every backend
+    registered before the first request.  At most ``max_pending`` batches
+    may be queued or running; further callers wait for a slot.
+    """
+
+    def __init__(
+        self,
+        backends: Optional[Dict[str, Any]] = None,
+        max_workers: int = 2,
+        executor: str = "thread",
+        max_pending: int = 64,
+    ) -> None:
+        if executor not in EXECUTORS:
+            raise ValueError(f"executor must be one of {EXECUTORS}")
+        self.max_workers = max(1, int(max_workers))
+        self.executor = executor
+        self.max_pending = max(1, int(max_pending))
+        self._backends: Dict[str, Any] = dict(backends or {})
+        # Kinds whose batches run on an outside executor instead of the pool
+        self._routes: Dict[str, Any] = {}
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self._pool: Optional[Executor] = None
+        self._pending = 0
+        self._counts: Dict[str, Dict[str, float]] = {}
+
+    def register(self, kind: str, backend: Any) -> None:
+        """Use ``backend`` for ``kind``, replacing any earlier one."""
+        with self._lock:
+            if self._pool is not None and self.executor == "process":
+                raise RuntimeError("backends cannot change once the process pool is running")
+            self._backends[kind] = backend
+
+    def route(self, kind: str, executor: Any) -> None:
+        """Run ``kind`` batches on ``executor`` (anything with ``submit``).
+
+        The API sends face encodings to its offload process pool this way;
+        the pool bounds and measures them, this service still counts them.
+        """
+        with self._lock:
+            self._routes[kind] = executor
+
+    def backend(self, kind: str) -> Any:
+        try:
+            return self._backends[kind]
+        except KeyError:
+            raise KeyError(f"no embedding backend registered for {kind!r}") from None
+
+    def _executor(self) -> Executor:
+        with self._lock:
+            if self._pool is None:
+                if self.executor == "process":
+                    self._pool = ProcessPoolExecutor(
+                        self.max_workers, initializer=_init_process, initargs=(dict(self._backends),)
+                    )
+                else:
+                    self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="embed")
+            return self._pool
+
+    def submit(self, kind: str, items: Sequence[Any]) -> Future:
+        """Queue one batch; the future resolves to one vector per item."""
+        backend = self.backend(kind)
+        items = list(items)
+        self._slots.acquire()
+        with self._lock:
+            self._pending += 1
+        started = time.perf_counter()
+        route = self._routes.get(kind)
+        try:
+            if route is not None:
+                future = route.submit(backend.embed_many, items)
+            elif self.executor == "process":
+                future = self._executor().submit(_embed_in_process, kind, items)
+            else:
+                future = self._executor().submit(backend.embed_many, items)
+        except RuntimeError:
+            if route is not None:
+                # A routed executor's refusal (e.g. saturation) is the caller's
+                self._finish(kind, 0, started, ok=False)
+                raise
+            # The pool refuses work once the interpreter is exiting; finish
+            # batches still being flushed at that point in the caller
+            future = Future()
+            try:
+                future.set_result(backend.embed_many(items))
+            except Exception as exc:
+                future.set_exception(exc)
+        except BaseException:
+            self._finish(kind, 0, started, ok=False)
+            raise
+        future.add_done_callback(
+            lambda f: self._finish(kind, len(items), started, ok=f.exception() is None)
+        )
+        return future
+
+    def _finish(self, kind: str, size: int, started: float, ok: bool) -> None:
+        with self._lock:
+            self._pending -= 1
+            counts = self._counts.setdefault(
+                kind, {"batches": 0, "items": 0, "failures": 0, "seconds": 0.0}
+            )
+            counts["batches"] += 1
+            counts["items" if ok else "failures"] += size
+            counts["seconds"] += time.perf_counter() - started
+        self._slots.release()
+
+    def embed_many(self, kind: str, items: Sequence[Any], timeout: Optional[float] = None) -> List[Any]:
+        """Embed ``items`` of ``kind`` as one batch and wait for the vectors."""
+        if not items:
+            return []
+        return list(self.submit(kind, items).result(timeout))
+
+    def embed(self, kind: str, item: Any, timeout: Optional[float] = None) -> Any:
+        return self.embed_many(kind, [item], timeout)[0]
+
+    async def aembed_many(self, kind: str, items: Sequence[Any]) -> List[Any]:
+        """Like :meth:`embed_many` without blocking the event loop."""
+        if not items:
+            return []
+        # Waiting for a pool slot may block, so submit from a thread too
+        future = await asyncio.to_thread(self.submit, kind, items)
+        return list(await asyncio.wrap_future(future))
+
+    def function(self, kind: str = "text") -> "EmbeddingFunction":
+        """Return a callable embedding texts through this service."""
+        return EmbeddingFunction(self, kind)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return pool occupancy and per-backend batch and throughput counters."""
+        with self._lock:
+            backends = {}
+            for kind, counts in self._counts.items():
+                seconds = counts["seconds"]
+                backends[kind] = {
+                    "batches": int(counts["batches"]),
+                    "items": int(counts["items"]),
+                    "failures": int(counts["failures"]),
+                    "mean_batch_size": round((counts["items"] + counts["failures"]) / counts["batches"], 2),
+                    "items_per_second": round(counts["items"] / seconds, 2) if seconds else 0.0,
+                }
+            return {
+                "executor": self.executor,
+                "max_workers": self.max_workers,
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "routes": {kind: getattr(route, "name", type(route).__name__) for kind, route in self._routes.items()},
+                "backends": backends,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=wait)
+
+
+class EmbeddingFunction:
+    """Chroma-style ``__call__(input)`` adapter over :class:`EmbeddingService`."""
+
+    def __init__(self, service: EmbeddingService, kind: str = "text") -> None:
+        self.service = service
+        self.kind = kind
+
+    def __call__(self, input: Sequence[str]) -> List[Any]:  # noqa: A002
+        texts = [input] if isinstance(input, str) else list(input)
+        return self.service.embed_many(self.kind, texts)
+
+    def name(self) -> str:
+        backend = self.service.backend(self.kind)
+        name = getattr(backend, "name", None)
+        return name() if callable(name) else type(backend).__name__
+
+
+def _eagle() -> Any:
+    from pv_eagle_python import Eagle  # type: ignore
+
+    return Eagle()
+
+
+_service: Optional[EmbeddingService] = None
+_service_lock = threading.Lock()
+
+
+def get_embedding_service(**options: Any) -> EmbeddingService:
+    """Return the process-wide service with the default text, face and voice backends.
+
+    ``options`` (``max_workers``, ``executor``, ``max_pending``) configure
+    the service when this call creates it and are ignored afterwards.
+    """
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = EmbeddingService(
+                {"text": TextBackend(), "face": FaceBackend(), "voice": VoiceBackend(_eagle)},
+                **options,
+            )
+        return _service
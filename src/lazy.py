@@ -0,0 +1,105 @@
+"""Deferred construction of expensive subsystems.
+
+A :class:`LazyResource` stands in for an object that is slow to build
+(a Whisper model, the vector store, a LangChain chain).  The object is
+created on first attribute access, or ahead of time by :func:`warm_up`, and
+every attribute lookup is then forwarded to it.  Each resource reports its
+state so readiness checks can tell when the heavy parts are available.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class LazyResource:
+    """Proxy that builds its target with ``factory`` on first use."""
+
+    def __init__(self, name: str, factory: Callable[[], Any]) -> None:
+        self._name = name
+        self._factory = factory
+        self._instance: Any = None
+        self._state = PENDING
+        self._error: Optional[str] = None
+        self._seconds: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _resolve(self) -> Any:
+        """Return the target, building it if this is the first use.
+
+        A failed build is retried on the next call and its exception is
+        propagated to the caller.
+        """
+        if self._state == READY:
+            return self._instance
+        with self._lock:
+            if self._state != READY:
+                self._state = LOADING
+                start = time.monotonic()
+                try:
+                    instance = self._factory()
+                except Exception as exc:
+                    self._state = FAILED
+                    self._error = str(exc)
+                    logger.exception("Failed to initialise %s: %s", self._name, exc)
+                    raise
+                self._instance = instance
+                self._seconds = round(time.monotonic() - start, 3)
+                self._error = None
+                self._state = READY
+                logger.info("Initialised %s in %.2fs", self._name, self._seconds)
+        return self._instance
+
+    # ``name``, ``ready`` and ``describe`` belong to the proxy and are not
+    # forwarded; the wrapped objects define none of them
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def ready(self) -> bool:
+        """Whether the target has been built (accessing it is then cheap)."""
+        return self._state == READY
+
+    def describe(self) -> Dict[str, Any]:
+        """Return the resource's state, build time and last error."""
+        return {"state": self._state, "seconds": self._seconds, "error": self._error}
+
+    def __getattr__(self, name: str) -> Any:
+        # Only reached for attributes not set on the proxy itself
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._resolve(), name)
+
+    def __repr__(self) -> str:
+        return f"<LazyResource {self._name} ({self._state})>"
+
+
+def warm_up(resources: Iterable[LazyResource], background: bool = True) -> Optional[threading.Thread]:
+    """Build ``resources`` in order, on a daemon thread unless ``background`` is false."""
+    resources = list(resources)
+
+    def _run() -> None:
+        for resource in resources:
+            try:
+                resource._resolve()
+            except Exception:
+                # Already logged; the resource retries on its next use
+                pass
+
+    if not background:
+        _run()
+        return None
+    thread = threading.Thread(target=_run, name="warm-up", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,56 @@
+"""In-memory files for libraries that only accept a path.
+
+Decrypted media should not be written to disk.  Most decoders read from a
+buffer (``io.BytesIO``) or a pipe, but some native libraries (Picovoice
+Eagle, parts of dlib) insist on a filename.  :func:`memory_path` gives them
+one backed by anonymous memory: a ``memfd`` on Linux, reachable through
+``/proc/self/fd``, or a file in ``/dev/shm`` elsewhere.  Only on systems
+with neither does it fall back to a regular temporary file.
+"""
+
+from __future__ import annotations
+
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator, Union
+
+_SHM = "/dev/shm"
+
+
+def _memfd_available() -> bool:
+    return hasattr(os, "memfd_create") and os.path.isdir("/proc/self/fd")
+
+
+def _write_all(fd: int, data: Union[bytes, bytearray, memoryview]) -> None:
+    view = memoryview(data)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+@contextmanager
+def memory_path(data: Union[bytes, bytearray, memoryview], suffix: str = "") -> Iterator[str]:
+    """Yield a readable path holding ``data``; it disappears on exit.
+
+    ``suffix`` is kept for libraries that sniff the format from the
+    extension; memfd paths have none.
+    """
+    if _memfd_available():
+        fd = os.memfd_create(f"gesahni{suffix}", os.MFD_CLOEXEC)
+        try:
+            _write_all(fd, data)
+            yield f"/proc/self/fd/{fd}"
+        finally:
+            os.close(fd)
+        return
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=_SHM if os.path.isdir(_SHM) else None)
+    try:
+        _write_all(fd, data)
+        os.close(fd)
+        fd = -1
+        yield path
+    finally:
+        if fd >= 0:
+            os.close(fd)
+        os.unlink(path)
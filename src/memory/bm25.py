@@ -0,0 +1,104 @@
+"""Incremental BM25 inverted index for lexical search over memory chunks.
+
+Sentence embeddings blur exact names and rare keywords, so
+:class:`~src.memory.memory.Memory` keeps this index next to the Chroma
+collection and fuses both rankings in hybrid mode with
+:func:`reciprocal_rank_fusion`.  Documents are added as they are stored;
+only ids, term frequencies and the metadata used for filtering are kept,
+the texts themselves stay in Chroma.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Return the lower-cased word tokens of ``text``."""
+    return _WORD.findall(text.lower())
+
+
+def reciprocal_rank_fusion(rankings: Iterable[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists; each id scores ``sum(1 / (k + rank))``."""
+    scores: Dict[str, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class BM25Index:
+    """Okapi BM25 over documents added one batch at a time."""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Dict[str, int]] = defaultdict(dict)
+        self._lengths: Dict[str, int] = {}
+        self._metadata: Dict[str, Dict[str, Any]] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._lengths
+
+    def add(self, doc_id: str, text: str, metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Index ``text`` under ``doc_id``; already indexed ids are ignored."""
+        terms = Counter(tokenize(text))
+        with self._lock:
+            if doc_id in self._lengths:
+                return
+            for term, tf in terms.items():
+                self._postings[term][doc_id] = tf
+            length = sum(terms.values())
+            self._lengths[doc_id] = length
+            self._total_length += length
+            self._metadata[doc_id] = dict(metadata or {})
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 10,
+        predicate: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    ) -> List[Tuple[str, float]]:
+        """Return up to ``top_k`` ``(doc_id, score)`` pairs, best first.
+
+        ``predicate`` receives a document's metadata and excludes it from
+        the ranking when it returns false.
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._lengths)
+            if not n_docs or not terms:
+                return []
+            avg_length = self._total_length / n_docs
+            scores: Dict[str, float] = defaultdict(float)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[doc_id] / avg_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+            if predicate is not None:
+                scores = {d: s for d, s in scores.items() if predicate(self._metadata[d])}
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+    def stats(self) -> Dict[str, int]:
+        """Return the number of documents, distinct terms and postings."""
+        with self._lock:
+            return {
+                "documents": len(self._lengths),
+                "terms": len(self._postings),
+                "postings": sum(len(p) for p in self._postings.values()),
+            }
@@ -0,0 +1,85 @@
+"""Split transcripts into overlapping, token-bounded windows.
+
+The sentence-transformer behind :class:`~src.memory.memory.Memory` truncates
+its input (all-MiniLM-L6-v2 stops at 256 word pieces), so a whole recording
+stored as one document loses everything past its first minute and matches
+queries only coarsely.  :func:`split_text` cuts text into windows of at most
+``max_tokens`` tokens that overlap by up to ``overlap`` tokens and prefer to
+end on a sentence boundary.  :func:`chunk_id` derives an id from the chunk's
+content so identical chunks map to the same document and are stored once.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+from typing import Callable, List
+
+# Words and punctuation marks; a close, cheap stand-in for word pieces
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+_SENTENCE_END = (".", "!", "?")
+
+
+def count_tokens(text: str) -> int:
+    """Return the approximate number of model tokens in ``text``."""
+    return len(_TOKEN.findall(text))
+
+
+def normalize(text: str) -> str:
+    """Collapse runs of whitespace so formatting does not change chunk ids."""
+    return " ".join(text.split())
+
+
+def split_text(
+    text: str,
+    max_tokens: int = 200,
+    overlap: int = 40,
+    count: Callable[[str], int] = count_tokens,
+) -> List[str]:
+    """Return ``text`` as windows of at most ``max_tokens`` tokens.
+
+    Consecutive windows share up to ``overlap`` tokens so a passage cut at a
+    boundary is still found whole in one of them.  A window is shortened to
+    the last sentence end in its second half when there is one.  A single
+    word longer than ``max_tokens`` becomes its own window.
+    """
+    words = normalize(text).split(" ")
+    if words == [""]:
+        return []
+    sizes = [max(1, count(word)) for word in words]
+    max_tokens = max(1, int(max_tokens))
+    overlap = max(0, min(int(overlap), max_tokens - 1))
+
+    chunks: List[str] = []
+    start = 0
+    while start < len(words):
+        end, total = start, 0
+        while end < len(words) and (end == start or total + sizes[end] <= max_tokens):
+            total += sizes[end]
+            end += 1
+        if end < len(words):
+            for k in range(end, start + (end - start) // 2, -1):
+                if words[k - 1].endswith(_SENTENCE_END):
+                    end = k
+                    break
+        chunks.append(" ".join(words[start:end]))
+        if end >= len(words):
+            break
+        # Step back over up to ``overlap`` tokens, always moving forward
+        back, carried = end, 0
+        while back > start + 1 and carried + sizes[back - 1] <= overlap:
+            back -= 1
+            carried += sizes[back]
+        start = back
+    return chunks
+
+
+def chunk_id(text: str, namespace: str = "") -> str:
+    """Return a stable id for ``text`` within ``namespace``.
+
+    :class:`~src.memory.memory.Memory` namespaces ids by user, session and
+    speaker, so the same words said in another session or by another
+    speaker are stored separately.
+    """
+    digest = hashlib.sha1(f"{namespace}\x00{normalize(text)}".encode("utf-8"))
+    return digest.hexdigest()
@@ -0,0 +1,149 @@
+"""Background, batched ingestion of transcripts into :class:`Memory`.
+
+Embedding one transcript at a time inside a request costs a full
+SentenceTransformer forward pass and a SQLite write per chunk.  An
+:class:`IngestQueue` takes texts without blocking and a writer thread
+coalesces whatever arrived within ``flush_interval`` seconds (up to
+``max_batch`` texts) into a single :meth:`Memory.add_many` call, i.e. one
+embedding batch and one ``collection.add``.  Queued texts become searchable
+once their batch is written; :meth:`IngestQueue.flush` waits for that and
+:meth:`IngestQueue.close` drains the queue on shutdown.
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+if TYPE_CHECKING:  # pragma: no cover - avoid importing chromadb eagerly
+    from .memory import Memory
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class IngestQueue:
+    """Queue texts for ``memory`` and write them in batches on a worker thread."""
+
+    def __init__(
+        self,
+        memory: "Memory",
+        flush_interval: float = 0.5,
+        max_batch: int = 64,
+        max_queue: int = 10000,
+    ) -> None:
+        self.memory = memory
+        self.flush_interval = max(0.0, float(flush_interval))
+        self.max_batch = max(1, int(max_batch))
+        self.max_queue = max(1, int(max_queue))
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=self.max_queue)
+        self._cond = threading.Condition()
+        self._counts = {"enqueued": 0, "written": 0, "failed": 0, "dropped": 0, "batches": 0}
+        self._last_batch_ms = 0.0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="memory-ingest", daemon=True)
+        self._thread.start()
+
+    def put(self, text: str, metadata: Optional[Dict[str, Any]] = None) -> bool:
+        """Queue ``text`` for ingestion; ``False`` if it had to be dropped.
+
+        ``metadata`` is passed through to :meth:`Memory.add_many`.
+        """
+        if not text or not text.strip():
+            return True
+        if self._closed:
+            logger.warning("Ingest queue is closed; dropping transcript")
+            return False
+        try:
+            self._queue.put_nowait((text, metadata))
+        except queue.Full:
+            with self._cond:
+                self._counts["dropped"] += 1
+            logger.warning("Ingest queue is full (%d texts); dropping transcript", self.max_queue)
+            return False
+        with self._cond:
+            self._counts["enqueued"] += 1
+        return True
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch: List[Tuple[str, Optional[Dict[str, Any]]]] = [first]
+            stop = False
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stop = True
+                    break
+                batch.append(item)
+            self._write(batch)
+            if stop:
+                # Drain whatever was queued before close()
+                self._write_rest()
+                return
+
+    def _write_rest(self) -> None:
+        rest: List[Tuple[str, Optional[Dict[str, Any]]]] = []
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP:
+                rest.append(item)
+        for start in range(0, len(rest), self.max_batch):
+            self._write(rest[start:start + self.max_batch])
+
+    def _write(self, batch: List[Tuple[str, Optional[Dict[str, Any]]]]) -> None:
+        started = time.monotonic()
+        ok = True
+        try:
+            self.memory.add_many([text for text, _ in batch], [meta for _, meta in batch])
+        except Exception as exc:
+            ok = False
+            logger.exception("Failed to store %d transcripts in memory: %s", len(batch), exc)
+        with self._cond:
+            self._counts["written" if ok else "failed"] += len(batch)
+            self._counts["batches"] += 1
+            self._last_batch_ms = (time.monotonic() - started) * 1000
+            self._cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every text queued so far has been written (or failed)."""
+        with self._cond:
+            target = self._counts["enqueued"]
+            return self._cond.wait_for(
+                lambda: self._counts["written"] + self._counts["failed"] >= target, timeout=timeout
+            )
+
+    def close(self, timeout: Optional[float] = 10.0) -> None:
+        """Write all queued texts and stop the worker thread."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth and ingestion counters."""
+        with self._cond:
+            batches = self._counts["batches"]
+            done = self._counts["written"] + self._counts["failed"]
+            return {
+                "queued": self._queue.qsize(),
+                "max_queue": self.max_queue,
+                **self._counts,
+                "mean_batch_size": round(done / batches, 2) if batches else 0.0,
+                "last_batch_ms": round(self._last_batch_ms, 3),
+            }
@@ -1,69 +1,481 @@
 from __future__ import annotations
 
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from datetime import date, datetime
 from pathlib import Path
-from uuid import uuid4
+from typing import Any, Optional, Union
+
+from src.embeddings.service import get_embedding_service
+
+from .bm25 import BM25Index, reciprocal_rank_fusion
+from .chunking import chunk_id, split_text
+from .vector_index import NumpyCollection
+from .vector_index import matches as _matches
 
 try:
     import chromadb
     from chromadb.config import Settings
-    try:
-        from chromadb.utils.embedding_functions import SentenceTransformerEmbeddingFunction
-    except Exception:
-        SentenceTransformerEmbeddingFunction = None
 except ImportError:
     chromadb = None
-    SentenceTransformerEmbeddingFunction = None
+
+logger = logging.getLogger(__name__)
+
+# Deep pages are served by over-fetching from the vector index
+MAX_SEARCH_OFFSET = 1000
+SEARCH_MODES = ("vector", "hybrid")
+# Each ranking contributes this many times the requested depth to the fusion
+HYBRID_CANDIDATES = 3
+
+
+def _day(value: Union[str, date, int]) -> int:
+    """Return ``value`` (``YYYY-MM-DD``, a date or ``YYYYMMDD``) as ``YYYYMMDD``."""
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+    return value.year * 10000 + value.month * 100 + value.day
+
+
+def build_metadata(
+    session: Optional[str] = None,
+    user_id: Optional[str] = None,
+    speaker: Optional[str] = None,
+    timestamp: Optional[float] = None,
+) -> dict[str, Any]:
+    """Return the stored metadata for one transcript entry.
+
+    ``session`` is the session date (``YYYY-MM-DD``) and defaults to the
+    day of ``timestamp`` (seconds since the epoch, default now).  The date
+    is also stored as the integer ``date`` (``YYYYMMDD``) so range filters
+    can be pushed down to the vector store.  Unset fields are omitted.
+    """
+    timestamp = time.time() if timestamp is None else float(timestamp)
+    session = session or datetime.fromtimestamp(timestamp).date().isoformat()
+    metadata: dict[str, Any] = {"session": session, "timestamp": timestamp}
+    try:
+        metadata["date"] = _day(session)
+    except ValueError:
+        pass
+    if user_id:
+        metadata["user_id"] = str(user_id)
+    if speaker:
+        metadata["speaker"] = str(speaker)
+    return metadata
+
+
+def build_where(
+    session: Optional[str] = None,
+    user_id: Optional[str] = None,
+    speaker: Optional[str] = None,
+    date_from: Optional[Union[str, date, int]] = None,
+    date_to: Optional[Union[str, date, int]] = None,
+) -> Optional[dict[str, Any]]:
+    """Return a Chroma ``where`` clause for the given filters, or ``None``."""
+    clauses: list[dict[str, Any]] = []
+    for field, value in (("session", session), ("user_id", user_id), ("speaker", speaker)):
+        if value:
+            clauses.append({field: str(value)})
+    if date_from is not None:
+        clauses.append({"date": {"$gte": _day(date_from)}})
+    if date_to is not None:
+        clauses.append({"date": {"$lte": _day(date_to)}})
+    if not clauses:
+        return None
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
 
 
 class Memory:
     """Persistent vector store for transcripts."""
 
-    def __init__(self, persist_directory: str = "vector_store") -> None:
+    def __init__(
+        self,
+        persist_directory: str = "vector_store",
+        query_cache_size: int = 256,
+        result_ttl: float = 30.0,
+        chunk_tokens: int = 200,
+        chunk_overlap: int = 40,
+        search_mode: str = "vector",
+        rrf_k: int = 60,
+        lexical_refresh: float = 30.0,
+        quantization: Optional[str] = None,
+        rerank: int = 4,
+    ) -> None:
+        if search_mode not in SEARCH_MODES:
+            raise ValueError(f"search_mode must be one of {SEARCH_MODES}")
         Path(persist_directory).mkdir(parents=True, exist_ok=True)
+        # Long transcripts are stored as overlapping windows that fit the
+        # embedding model's input
+        self.chunk_tokens = chunk_tokens
+        self.chunk_overlap = chunk_overlap
+        # Query embeddings are reused indefinitely (LRU); search results only
+        # for ``result_ttl`` seconds and until the next write bumps
+        # ``_generation``.
+        self.query_cache_size = max(0, int(query_cache_size))
+        self.result_ttl = max(0.0, float(result_ttl))
+        self._cache_lock = threading.Lock()
+        self._generation = 0
+        self._query_embeddings: OrderedDict[str, Any] = OrderedDict()
+        self._results: dict[tuple, tuple[int, float, dict[str, Any]]] = {}
+        self._cache_counts = {
+            "embedding_hits": 0,
+            "embedding_misses": 0,
+            "result_hits": 0,
+            "result_misses": 0,
+        }
+        # ``hybrid`` also ranks with a BM25 index.  A background thread
+        # builds it from the collection and every ``lexical_refresh``
+        # seconds indexes chunks other processes stored; this process's
+        # writes are indexed as they happen.  Until the first build is done
+        # hybrid searches return the vector ranking.
+        self.search_mode = search_mode
+        self.rrf_k = max(1, int(rrf_k))
+        self.lexical_refresh = max(1.0, float(lexical_refresh))
+        self._bm25: Optional[BM25Index] = None
+        self._bm25_lock = threading.Lock()
+        self._bm25_ready = threading.Event()
+        self._bm25_stop = threading.Event()
+        self._latencies = {mode: deque(maxlen=512) for mode in SEARCH_MODES}
 
-        if chromadb is None:
-            # simple in-memory fallback
-            class _DummyCollection:
-                def __init__(self):
-                    self.docs = []
-                def add(self, documents, ids):
-                    self.docs.extend(documents)
-                def query(self, query_texts, n_results=5):
-                    return {"documents": [self.docs[:n_results]]}
-            self.collection = _DummyCollection()
+        # Texts are embedded by the shared service's batched text backend
+        # (MiniLM when installed), whichever store holds the vectors
+        embedding_fn = get_embedding_service().function("text")
+        self._embed_on_add = False
+        if chromadb is None or quantization or NumpyCollection.exists(persist_directory):
+            # NumPy index persisted next to where Chroma would keep its data;
+            # it is also the compact (quantized) store when one is requested.
+            # Once it holds records it stays the only store, whatever the
+            # quantization setting, so nothing written to it is left behind
+            # in an older Chroma collection.
+            self.collection = NumpyCollection(
+                persist_directory,
+                embedding_function=embedding_fn,
+                quantization=quantization,
+                rerank=rerank,
+            )
+            if chromadb is not None:
+                self._import_chroma(persist_directory)
         else:
-            embedding_fn = None
-            if SentenceTransformerEmbeddingFunction is not None:
-                try:
-                    embedding_fn = SentenceTransformerEmbeddingFunction(model_name="all-MiniLM-L6-v2")
-                except Exception:
-                    embedding_fn = None
-
-            if embedding_fn is None:
-                class DummyEmbed:
-                    def __call__(self, inputs):
-                        texts = inputs if isinstance(inputs, list) else [inputs]
-                        return [[0.0] * 384 for _ in texts]
-
-                    @staticmethod
-                    def name():
-                        return "dummy"
-
-                embedding_fn = DummyEmbed()
+            if embedding_fn.name().startswith("hashing"):
+                # Hashed embeddings live in a different space than MiniLM's,
+                # so they are never written to the persistent store
                 self.client = chromadb.EphemeralClient()
             else:
                 self.client = chromadb.PersistentClient(path=persist_directory)
+            try:
+                self.collection = self.client.get_or_create_collection(
+                    "transcripts", embedding_function=embedding_fn
+                )
+            except ValueError as exc:
+                # Stores created with Chroma's own MiniLM function keep its
+                # name in their config; the vectors are the same, so pass
+                # them in explicitly instead
+                logger.info("Opening transcripts without an embedding function: %s", exc)
+                self.collection = self.client.get_or_create_collection(
+                    "transcripts", embedding_function=None
+                )
+                self._embed_on_add = True
+        self._embed = embedding_fn
+        if search_mode == "hybrid":
+            self._start_lexical()
 
-            self.collection = self.client.get_or_create_collection(
-                "transcripts", embedding_function=embedding_fn
+    def _import_chroma(self, persist_directory: str) -> None:
+        """Copy an existing Chroma store into a still empty NumPy collection.
+
+        This runs once, when the NumPy store is created; Chroma is not read
+        or written again for this directory afterwards.
+        """
+        if self.collection.count():
+            return
+        try:
+            client = chromadb.PersistentClient(path=persist_directory)
+            stored = client.get_collection("transcripts").get(include=["documents", "metadatas"])
+        except Exception:
+            return
+        if stored["ids"]:
+            self.collection.add(
+                documents=stored["documents"], ids=stored["ids"], metadatas=stored["metadatas"]
             )
 
-    def add(self, text: str) -> None:
-        """Embed and store a text entry."""
-        doc_id = str(uuid4())
-        self.collection.add(documents=[text], ids=[doc_id])
+    def add(self, text: str, metadata: Optional[dict[str, Any]] = None) -> None:
+        """Embed and store a text entry.
+
+        ``metadata`` holds the :func:`build_metadata` fields (session,
+        user_id, speaker, timestamp).
+        """
+        self.add_many([text], [metadata or {}])
+
+    def add_many(
+        self, texts: list[str], metadatas: Optional[list[Optional[dict[str, Any]]]] = None
+    ) -> list[str]:
+        """Chunk, embed and store several texts with one ``collection.add`` call.
+
+        Each text is split into overlapping windows (see
+        :func:`~src.memory.chunking.split_text`) whose ids are derived from
+        their content, user, session and speaker, so a chunk that is already
+        stored for that conversation, or that repeats within the batch, is
+        skipped.  The embedding function sees all new chunks at once.
+        ``metadatas`` parallels ``texts``; missing session dates and
+        timestamps default to now.  Returns the ids of the newly stored
+        chunks.
+        """
+        metadatas = metadatas or [None] * len(texts)
+        entries: dict[str, tuple[str, dict[str, Any]]] = {}
+        for text, meta in zip(texts, metadatas):
+            if not text:
+                continue
+            base = build_metadata(**(meta or {}))
+            # "Okay." from another session or speaker is a different entry
+            namespace = "\x1f".join(base.get(k, "") for k in ("user_id", "session", "speaker"))
+            chunks = split_text(text, self.chunk_tokens, self.chunk_overlap)
+            for index, chunk in enumerate(chunks):
+                doc_id = chunk_id(chunk, namespace)
+                if doc_id not in entries:
+                    entries[doc_id] = (chunk, {**base, "chunk": index, "chunks": len(chunks)})
+        for doc_id in self._existing_ids(list(entries)):
+            entries.pop(doc_id, None)
+        if not entries:
+            return []
+        doc_ids = list(entries)
+        documents = [entries[i][0] for i in doc_ids]
+        extra = {"embeddings": self._embed(documents)} if self._embed_on_add else {}
+        self.collection.add(
+            documents=documents,
+            metadatas=[entries[i][1] for i in doc_ids],
+            ids=doc_ids,
+            **extra,
+        )
+        with self._bm25_lock:
+            if self._bm25 is not None:
+                for doc_id in doc_ids:
+                    self._bm25.add(doc_id, *entries[doc_id])
+        with self._cache_lock:
+            # Cached results no longer reflect the collection
+            self._generation += 1
+            self._results.clear()
+        return doc_ids
+
+    def _existing_ids(self, ids: list[str]) -> list[str]:
+        """Return which of ``ids`` are already stored."""
+        if not ids:
+            return []
+        try:
+            return list(self.collection.get(ids=ids, include=[])["ids"])
+        except Exception:
+            return []
+
+    def _query_embedding(self, query: str) -> Any:
+        """Return the embedding of ``query``, computing it at most once."""
+        with self._cache_lock:
+            embedding = self._query_embeddings.get(query)
+            if embedding is not None:
+                self._query_embeddings.move_to_end(query)
+                self._cache_counts["embedding_hits"] += 1
+                return embedding
+            self._cache_counts["embedding_misses"] += 1
+        embedding = self._embed([query])[0]
+        if self.query_cache_size:
+            with self._cache_lock:
+                self._query_embeddings[query] = embedding
+                while len(self._query_embeddings) > self.query_cache_size:
+                    self._query_embeddings.popitem(last=False)
+        return embedding
+
+    def search(self, query: str, top_k: int = 5, mode: Optional[str] = None, **filters: Any) -> list[str]:
+        """Search stored texts using semantic similarity.
+
+        ``filters`` are the :func:`build_where` keywords (session, user_id,
+        speaker, date_from, date_to).  ``mode`` overrides ``search_mode``.
+        """
+        return self.search_page(query, limit=top_k, mode=mode, **filters)["results"]
+
+    def search_page(
+        self,
+        query: str,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+        mode: Optional[str] = None,
+        **filters: Any,
+    ) -> dict[str, Any]:
+        """Return one page of matches and the cursor of the next page.
+
+        The result holds ``results`` (texts), ``metadatas`` and
+        ``next_cursor`` (``None`` on the last page).  Filters are pushed down
+        to the vector store as a ``where`` clause, so only matching entries
+        are ranked.  In ``hybrid`` mode the vector ranking is fused with a
+        BM25 ranking by reciprocal rank, so exact names and rare words are
+        found even when their embedding is not close.  Repeated queries
+        reuse their embedding, and identical searches within ``result_ttl``
+        seconds are answered from cache unless texts were added in between.
+        """
+        mode = mode or self.search_mode
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"mode must be one of {SEARCH_MODES}")
+        offset = int(cursor) if cursor else 0
+        if not 0 <= offset <= MAX_SEARCH_OFFSET:
+            raise ValueError(f"cursor must be between 0 and {MAX_SEARCH_OFFSET}")
+        where = build_where(**filters)
+        key = (query, limit, offset, mode, json.dumps(where, sort_keys=True))
+        now = time.monotonic()
+        with self._cache_lock:
+            cached = self._results.get(key)
+            if cached is not None and cached[0] == self._generation and cached[1] > now:
+                self._cache_counts["result_hits"] += 1
+                return {k: list(v) if isinstance(v, list) else v for k, v in cached[2].items()}
+            self._cache_counts["result_misses"] += 1
+            generation = self._generation
+
+        started = time.perf_counter()
+        # One extra hit tells whether another page exists
+        depth = offset + limit + 1
+        if mode == "hybrid":
+            documents, metadatas = self._hybrid_query(query, depth, where)
+        else:
+            _, documents, metadatas = self._vector_query(query, depth, where)
+        with self._cache_lock:
+            self._latencies[mode].append((time.perf_counter() - started) * 1000)
+        more = len(documents) > offset + limit
+        page = {
+            "results": documents[offset:offset + limit],
+            "metadatas": metadatas[offset:offset + limit],
+            "next_cursor": str(offset + limit) if more else None,
+        }
+
+        if self.result_ttl:
+            with self._cache_lock:
+                # Skip caching if a write landed while we were querying
+                if generation == self._generation:
+                    self._results.pop(key, None)
+                    self._results[key] = (generation, now + self.result_ttl, page)
+                    while len(self._results) > max(1, self.query_cache_size):
+                        self._results.pop(next(iter(self._results)))
+        return {k: list(v) if isinstance(v, list) else v for k, v in page.items()}
+
+    def _vector_query(
+        self, query: str, n_results: int, where: Optional[dict[str, Any]]
+    ) -> tuple[list[str], list[str], list[dict[str, Any]]]:
+        """Return ids, texts and metadatas of the ``n_results`` nearest chunks."""
+        kwargs: dict[str, Any] = {
+            "n_results": n_results,
+            "include": ["documents", "metadatas", "distances"],
+        }
+        if where is not None:
+            kwargs["where"] = where
+        result = self.collection.query(query_embeddings=[self._query_embedding(query)], **kwargs)
+        documents = list((result.get("documents") or [[]])[0])
+        metadatas = list((result.get("metadatas") or [[]])[0] or [{}] * len(documents))
+        ids = list((result.get("ids") or [[]])[0])
+        return ids, documents, metadatas
+
+    def _hybrid_query(
+        self, query: str, n_results: int, where: Optional[dict[str, Any]]
+    ) -> tuple[list[str], list[dict[str, Any]]]:
+        """Return texts and metadatas of the best ``n_results`` fused matches."""
+        candidates = n_results * HYBRID_CANDIDATES
+        ids, documents, metadatas = self._vector_query(query, candidates, where)
+        index = self._lexical_index()
+        if index is None:
+            return documents[:n_results], metadatas[:n_results]
+        rows = {i: (d, m) for i, d, m in zip(ids, documents, metadatas)}
+        lexical = index.search(
+            query, candidates, predicate=lambda meta: _matches(meta, where)
+        )
+        fused = reciprocal_rank_fusion(
+            [ids, [doc_id for doc_id, _ in lexical]], k=self.rrf_k
+        )[:n_results]
+        missing = [doc_id for doc_id, _ in fused if doc_id not in rows]
+        if missing:
+            found = self.collection.get(ids=missing, include=["documents", "metadatas"])
+            for doc_id, text, meta in zip(
+                found["ids"], found["documents"], found.get("metadatas") or [{}] * len(missing)
+            ):
+                rows[doc_id] = (text, meta or {})
+        hits = [rows[doc_id] for doc_id, _ in fused if doc_id in rows]
+        return [text for text, _ in hits], [meta for _, meta in hits]
+
+    def _lexical_index(self) -> Optional[BM25Index]:
+        """Return the BM25 index once built, starting the build if needed."""
+        self._start_lexical()
+        return self._bm25 if self._bm25_ready.is_set() else None
+
+    def _start_lexical(self) -> None:
+        with self._bm25_lock:
+            if self._bm25 is not None:
+                return
+            self._bm25 = BM25Index()
+        threading.Thread(target=self._lexical_loop, name="memory-bm25", daemon=True).start()
+
+    def _lexical_loop(self) -> None:
+        while True:
+            try:
+                self._sync_lexical()
+            except Exception as exc:
+                logger.warning("BM25 index refresh failed: %s", exc)
+            self._bm25_ready.set()
+            if self._bm25_stop.wait(self.lexical_refresh):
+                return
+
+    def _sync_lexical(self, batch: int = 512) -> None:
+        """Index stored chunks the BM25 index has not seen yet."""
+        index = self._bm25
+        if index is None or self.collection.count() == len(index):
+            return
+        missing = [i for i in self.collection.get(include=[])["ids"] if i not in index]
+        for start in range(0, len(missing), batch):
+            ids = missing[start:start + batch]
+            stored = self.collection.get(ids=ids, include=["documents", "metadatas"])
+            for doc_id, text, meta in zip(
+                stored["ids"],
+                stored["documents"],
+                stored.get("metadatas") or [{}] * len(stored["ids"]),
+            ):
+                index.add(doc_id, text or "", meta)
+        if missing:
+            with self._cache_lock:
+                self._generation += 1
+                self._results.clear()
+
+    def wait_lexical(self, timeout: Optional[float] = None) -> bool:
+        """Start the BM25 build if needed and wait for it; ``False`` on timeout."""
+        self._start_lexical()
+        return self._bm25_ready.wait(timeout)
+
+    def close(self) -> None:
+        """Stop the BM25 refresh thread."""
+        self._bm25_stop.set()
+
+    def search_stats(self) -> dict[str, Any]:
+        """Return the search mode, index sizes and query latencies."""
+        with self._cache_lock:
+            samples = {mode: sorted(values) for mode, values in self._latencies.items()}
+        latency = {}
+        for mode, values in samples.items():
+            latency[mode] = {
+                "count": len(values),
+                "p50_ms": round(values[len(values) // 2], 3) if values else None,
+                "p95_ms": round(values[int(len(values) * 0.95)], 3) if values else None,
+            }
+        with self._bm25_lock:
+            bm25 = self._bm25.stats() if self._bm25 is not None else None
+        if bm25 is not None:
+            bm25["ready"] = self._bm25_ready.is_set()
+        stats = getattr(self.collection, "stats", None)
+        return {
+            "mode": self.search_mode,
+            "storage": stats() if callable(stats) else None,
+            "bm25": bm25,
+            "latency_ms": latency,
+        }
 
-    def search(self, query: str, top_k: int = 5) -> list[str]:
-        """Search stored texts using semantic similarity."""
-        result = self.collection.query(query_texts=[query], n_results=top_k)
-        return result.get("documents", [[]])[0]
+    def cache_stats(self) -> dict[str, int]:
+        """Return query-embedding and result cache counters."""
+        with self._cache_lock:
+            return {
+                **self._cache_counts,
+                "generation": self._generation,
+                "cached_embeddings": len(self._query_embeddings),
+                "cached_results": len(self._results),
+            }
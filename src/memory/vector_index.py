@@ -0,0 +1,595 @@
+"""NumPy vector store used by :class:`~src.memory.memory.Memory` without chromadb.
+
+:class:`NumpyCollection` implements the part of the Chroma collection API
+that ``Memory`` uses (``add``, ``get``, ``query``, ``count``).  Embeddings
+are L2-normalised float32 rows of one contiguous matrix kept in a
+memory-mapped file that doubles in size as it fills, so cosine similarity
+against every stored chunk is a single matrix-vector product and the top
+``k`` are selected with :func:`numpy.argpartition`.  Texts and metadata are
+appended to a JSON-lines file next to it; both survive restarts.  Only ids
+and each record's byte offset are held in memory; texts and metadata are
+read back from the file for the rows a call returns.  ``where`` filters on
+the fields in :data:`INDEXED_FIELDS` are answered from per-value row lists
+kept in memory, so a filtered query scores only the matching rows; filters
+on other fields read every record.  Several
+processes may share one directory: writers take an exclusive ``fcntl`` lock,
+append after whatever the others wrote and derive row numbers from the
+records file, and readers pick up new records when the file grows.  A line
+torn by a crash is cut off before the next write.
+
+With ``quantization="int8"`` every row is also stored as int8 codes with a
+float32 scale.  Searches scan only the codes (388 instead of 1536 bytes per
+MiniLM vector), so they are the part of the store that stays resident, and
+re-score the best ``k * rerank`` candidates against their float32 rows,
+which are read from the memory-mapped file for those rows alone.  The
+float32 file is kept for that re-scoring, so disk use grows to
+``dim * 5 + 4`` bytes per vector; what shrinks is the working set.
+
+:func:`default_embedding` prefers the same MiniLM model Chroma would use and
+falls back to :class:`HashingEmbedding`, a dependency-free bag of hashed
+words and word pairs that still ranks lexical overlap sensibly.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import threading
+import zlib
+from array import array
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+try:
+    import fcntl
+except Exception:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+try:
+    from sentence_transformers import SentenceTransformer
+except Exception:
+    SentenceTransformer = None
+
+logger = logging.getLogger(__name__)
+
+_WORD = re.compile(r"\w+")
+_INITIAL_CAPACITY = 1024
+# Rows scored per step when scanning int8 codes; the float32 copy of a
+# block stays in cache instead of round-tripping through memory
+_SCAN_BLOCK = 1024
+# Rows quantized or re-embedded per step
+_WRITE_BLOCK = 16384
+QUANTIZATIONS = (None, "int8")
+# Metadata fields with a value -> rows index (see ``Memory.build_where``)
+INDEXED_FIELDS = ("session", "user_id", "speaker", "date")
+
+
+def matches(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate the subset of Chroma ``where`` syntax built by ``build_where``."""
+    if not where:
+        return True
+    if "$and" in where:
+        return all(matches(metadata, clause) for clause in where["$and"])
+    for field, cond in where.items():
+        value = metadata.get(field)
+        if isinstance(cond, dict):
+            for op, operand in cond.items():
+                if value is None:
+                    return False
+                if op == "$gte" and not value >= operand:
+                    return False
+                if op == "$lte" and not value <= operand:
+                    return False
+                if op == "$eq" and value != operand:
+                    return False
+        elif value != cond:
+            return False
+    return True
+
+
+class HashingEmbedding:
+    """Embed text as signed hashed counts of words and adjacent word pairs."""
+
+    def __init__(self, dim: int = 384) -> None:
+        self.dim = dim
+
+    # Chroma validates that the argument is called ``input``
+    def __call__(self, input: Union[str, Sequence[str]]) -> np.ndarray:  # noqa: A002
+        texts = [input] if isinstance(input, str) else list(input)
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _WORD.findall(text.lower())
+            features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            if not features:
+                continue
+            hashes = np.fromiter(
+                (zlib.crc32(f.encode("utf-8")) for f in features), dtype=np.uint32, count=len(features)
+            )
+            signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(out[row], hashes % self.dim, signs)
+        return out
+
+    def name(self) -> str:
+        return f"hashing-{self.dim}"
+
+
+class SentenceEmbedding:
+    """Normalised SentenceTransformer embeddings without chromadb."""
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2") -> None:
+        self.model_name = model_name
+        self.model = SentenceTransformer(model_name)
+
+    def __call__(self, input: Union[str, Sequence[str]]) -> np.ndarray:  # noqa: A002
+        texts = [input] if isinstance(input, str) else list(input)
+        return np.asarray(self.model.encode(texts, normalize_embeddings=True), dtype=np.float32)
+
+    def name(self) -> str:
+        return self.model_name
+
+
+def default_embedding() -> Callable[[Sequence[str]], Any]:
+    """Return MiniLM embeddings when available, else :class:`HashingEmbedding`."""
+    if SentenceTransformer is not None:
+        try:
+            return SentenceEmbedding()
+        except Exception as exc:
+            logger.warning("SentenceTransformer unavailable (%s); using hashed embeddings", exc)
+    return HashingEmbedding()
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def quantize(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return symmetric per-row int8 codes and the float32 scales to undo them."""
+    scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127.0
+    codes = np.rint(vectors / scales[:, None]).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def _open_matrix(path: Path, dtype: Any, shape: tuple) -> np.memmap:
+    """Memory-map ``path`` with ``shape``, resizing the file to fit."""
+    with open(path, "ab") as fh:
+        fh.truncate(int(np.prod(shape)) * np.dtype(dtype).itemsize)
+    return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+
+class NumpyCollection:
+    """Chroma-compatible collection backed by a memory-mapped float32 matrix."""
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        embedding_function: Optional[Callable[[Sequence[str]], Any]] = None,
+        name: str = "transcripts",
+        quantization: Optional[str] = None,
+        rerank: int = 4,
+    ) -> None:
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"quantization must be one of {QUANTIZATIONS}")
+        self.quantization = quantization
+        self.rerank = max(1, int(rerank))
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.embedding_function = embedding_function or HashingEmbedding()
+        self._vectors_path = self.directory / f"{name}.f32"
+        self._records_path = self.directory / f"{name}.jsonl"
+        self._info_path = self.directory / f"{name}.json"
+        self._codes_path = self.directory / f"{name}.i8"
+        self._scales_path = self.directory / f"{name}.scale"
+        self._lock_path = self.directory / f"{name}.lock"
+        self._lock = threading.RLock()
+        # Bytes of the records file already loaded into the lists below
+        self._records_size = 0
+        self.ids: List[str] = []
+        # Byte offset of each row's record; texts and metadata are read back
+        # on demand
+        self._offsets = array("q")
+        # field -> value -> ascending rows with that value
+        self._index: Dict[str, Dict[Any, array]] = {field: {} for field in INDEXED_FIELDS}
+        self._rows: Dict[str, int] = {}
+        self._vectors: Optional[np.memmap] = None
+        self._codes: Optional[np.memmap] = None
+        self._scales: Optional[np.memmap] = None
+        self.dim = 0
+        self._load()
+
+    @staticmethod
+    def exists(directory: Union[str, Path], name: str = "transcripts") -> bool:
+        """Return whether ``directory`` already holds records for ``name``."""
+        path = Path(directory) / f"{name}.jsonl"
+        return path.exists() and path.stat().st_size > 0
+
+    # -- persistence -----------------------------------------------------
+    def _embedder_name(self) -> str:
+        name = getattr(self.embedding_function, "name", None)
+        return name() if callable(name) else type(self.embedding_function).__name__
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool):
+        """Hold the thread lock and the directory's inter-process lock."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self._lock_path, "a") as fh:
+                fcntl.flock(fh, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _read_records(self, repair: bool) -> None:
+        """Load records appended since the last read.
+
+        An unterminated last line is a write interrupted by a crash; with
+        ``repair`` (under the exclusive lock) it is truncated so later
+        appends start on a fresh line.
+        """
+        if not self._records_path.exists():
+            return
+        torn = False
+        with open(self._records_path, "rb") as fh:
+            fh.seek(self._records_size)
+            for line in fh:
+                if not line.endswith(b"\n"):
+                    torn = True
+                    break
+                offset = self._records_size
+                self._records_size += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Left by older versions that appended after a torn line
+                    logger.warning("Skipping corrupt record in %s", self._records_path)
+                    continue
+                self._append_row(record, offset)
+        if torn and repair:
+            logger.warning("Truncating torn record at byte %d of %s", self._records_size, self._records_path)
+            with open(self._records_path, "r+b") as fh:
+                fh.truncate(self._records_size)
+
+    def _append_row(self, record: Dict[str, Any], offset: int) -> None:
+        self._rows[record["id"]] = len(self.ids)
+        row = len(self.ids)
+        self.ids.append(record["id"])
+        self._offsets.append(offset)
+        metadata = record.get("metadata") or {}
+        for field, index in self._index.items():
+            value = metadata.get(field)
+            if isinstance(value, (str, int, float)):
+                index.setdefault(value, array("q")).append(row)
+
+    def _records(self, rows: Sequence[int]) -> List[Dict[str, Any]]:
+        """Read the records of ``rows`` from the records file."""
+        if not len(rows):
+            return []
+        out = []
+        with open(self._records_path, "rb") as fh:
+            for row in rows:
+                fh.seek(self._offsets[row])
+                out.append(json.loads(fh.readline()))
+        return out
+
+    def _documents(self, rows: Sequence[int]) -> List[str]:
+        return [record["document"] for record in self._records(rows)]
+
+    def _filter(self, where: Optional[Dict[str, Any]], count: int) -> Optional[np.ndarray]:
+        """Return the ascending rows below ``count`` matching ``where``.
+
+        ``None`` means every row.  Clauses on indexed fields intersect their
+        row lists; any other clause is checked against the records of the
+        rows left.
+        """
+        if not where:
+            return None
+        clauses = where["$and"] if "$and" in where else [{f: c} for f, c in where.items()]
+        rows: Optional[np.ndarray] = None
+        rest = []
+        for clause in clauses:
+            found = self._indexed(clause)
+            if found is None:
+                rest.append(clause)
+                continue
+            rows = found if rows is None else np.intersect1d(rows, found, assume_unique=True)
+        if rows is None:
+            rows = np.arange(count)
+        rows = rows[rows < count]
+        if rest:
+            records = self._records(rows)
+            keep = [matches(r.get("metadata") or {}, {"$and": rest}) for r in records]
+            rows = rows[np.asarray(keep, dtype=bool)] if len(rows) else rows
+        return rows
+
+    def _indexed(self, clause: Dict[str, Any]) -> Optional[np.ndarray]:
+        """Rows matching a one-field clause, or ``None`` if it is not indexed."""
+        if len(clause) != 1 or "$and" in clause:
+            return None
+        (field, cond), = clause.items()
+        index = self._index.get(field)
+        if index is None or cond is None:
+            return None
+        if isinstance(cond, dict):
+            if not set(cond) <= {"$eq", "$gte", "$lte"}:
+                return None
+            lists = []
+            for value, rows in index.items():
+                try:
+                    if matches({field: value}, clause):
+                        lists.append(rows)
+                except TypeError:
+                    continue
+        else:
+            lists = [index[cond]] if cond in index else []
+        if not lists:
+            return np.empty(0, dtype=np.int64)
+        if len(lists) == 1:
+            return np.frombuffer(lists[0], dtype=np.int64).copy()
+        return np.sort(np.concatenate([np.frombuffer(rows, dtype=np.int64) for rows in lists]))
+
+    def _read_info(self) -> Dict[str, Any]:
+        if self._info_path.exists():
+            return json.loads(self._info_path.read_text())
+        return {}
+
+    def _sync(self, repair: bool = False) -> None:
+        """Catch up with records and matrix growth from other processes."""
+        self._read_records(repair)
+        info = self._read_info()
+        capacity = info.get("capacity", 0)
+        current = 0 if self._vectors is None else self._vectors.shape[0]
+        if capacity > current and info.get("embedding") == self._embedder_name():
+            for matrix in (self._vectors, self._codes, self._scales):
+                if matrix is not None:
+                    matrix.flush()
+            self.dim = int(info["dim"])
+            self._vectors = np.memmap(
+                self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim)
+            )
+            if self.quantization:
+                self._open_codes(capacity)
+
+    def _refresh(self) -> None:
+        """Pick up other processes' writes if the records file has grown."""
+        try:
+            size = os.stat(self._records_path).st_size
+        except OSError:
+            return
+        if size != self._records_size:
+            with self._file_lock(exclusive=False):
+                self._sync()
+
+    def _load(self) -> None:
+        with self._file_lock(exclusive=True):
+            self._read_records(repair=True)
+            self._load_vectors()
+
+    def _load_vectors(self) -> None:
+        info = self._read_info()
+        capacity = info.get("capacity", 0)
+        if (
+            self.ids
+            and info.get("embedding") == self._embedder_name()
+            and capacity >= len(self.ids)
+            and self._vectors_path.exists()
+        ):
+            self.dim = int(info["dim"])
+            self._vectors = np.memmap(
+                self._vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim)
+            )
+            if self.quantization:
+                self._open_codes(capacity)
+                if info.get("quantization") != self.quantization:
+                    self._quantize(0, len(self.ids))
+            if info.get("quantization") != self.quantization:
+                self._write_info()
+        elif self.ids:
+            logger.info("Re-embedding %d stored texts for %s", len(self.ids), self._embedder_name())
+            for start in range(0, len(self.ids), _WRITE_BLOCK):
+                stop = min(start + _WRITE_BLOCK, len(self.ids))
+                vectors = _normalize(self.embedding_function(self._documents(range(start, stop))))
+                self._allocate(vectors.shape[1], len(self.ids))
+                self._vectors[start:stop] = vectors
+            self._vectors.flush()
+            self._quantize(0, len(self.ids))
+
+    def _open_codes(self, capacity: int) -> None:
+        self._codes = _open_matrix(self._codes_path, np.int8, (capacity, self.dim))
+        self._scales = _open_matrix(self._scales_path, np.float32, (capacity,))
+
+    def _quantize(self, start: int, stop: int) -> None:
+        """Refresh the int8 codes of rows ``start:stop`` from the float32 rows."""
+        if not self.quantization or stop <= start:
+            return
+        for block in range(start, stop, _WRITE_BLOCK):
+            end = min(block + _WRITE_BLOCK, stop)
+            self._codes[block:end], self._scales[block:end] = quantize(self._vectors[block:end])
+        self._codes.flush()
+        self._scales.flush()
+
+    def _write_info(self) -> None:
+        self._info_path.write_text(
+            json.dumps(
+                {
+                    "dim": self.dim,
+                    "capacity": self._vectors.shape[0],
+                    "embedding": self._embedder_name(),
+                    "quantization": self.quantization,
+                }
+            )
+        )
+
+    def _allocate(self, dim: int, needed: int) -> None:
+        """Make room for ``needed`` rows, doubling the backing file as required."""
+        capacity = 0 if self._vectors is None else self._vectors.shape[0]
+        if self._vectors is not None and needed <= capacity:
+            return
+        new_capacity = max(_INITIAL_CAPACITY, capacity)
+        while new_capacity < needed:
+            new_capacity *= 2
+        for matrix in (self._vectors, self._codes, self._scales):
+            if matrix is not None:
+                matrix.flush()
+        self._vectors = self._codes = self._scales = None
+        self.dim = dim
+        self._vectors = _open_matrix(self._vectors_path, np.float32, (new_capacity, dim))
+        if self.quantization:
+            self._open_codes(new_capacity)
+        self._write_info()
+
+    # -- Chroma API ------------------------------------------------------
+    def count(self) -> int:
+        self._refresh()
+        return len(self.ids)
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the row count and per-vector bytes stored and scanned.
+
+        ``scanned_bytes_per_vector`` is what every query reads and keeps
+        resident: the int8 code and scale, or the float32 row.  The float32
+        rows are stored in both modes, so int8 raises
+        ``stored_bytes_per_vector``.  ``records_bytes`` is the size of the
+        records file, whose texts are not held in memory.
+        """
+        with self._lock:
+            full = self.dim * 4
+            codes = self.dim + 4 if self.quantization else 0
+            return {
+                "count": len(self.ids),
+                "dim": self.dim,
+                "quantization": self.quantization,
+                "stored_bytes_per_vector": full + codes,
+                "scanned_bytes_per_vector": codes or full,
+                "records_bytes": self._records_size,
+                "rerank": self.rerank if self.quantization else None,
+            }
+
+    def add(self, documents, ids, metadatas=None, embeddings=None, **kwargs) -> None:
+        metadatas = metadatas or [{} for _ in documents]
+        with self._file_lock(exclusive=True):
+            # Rows are numbered by position in the shared records file
+            self._sync(repair=True)
+            fresh = [k for k, doc_id in enumerate(ids) if doc_id not in self._rows]
+            if not fresh:
+                return
+            if embeddings is None:
+                vectors = self.embedding_function([documents[k] for k in fresh])
+            else:
+                vectors = [embeddings[k] for k in fresh]
+            vectors = _normalize(vectors)
+            start = len(self.ids)
+            self._allocate(vectors.shape[1], start + len(fresh))
+            # Vectors first: rows past the record count are simply ignored
+            self._vectors[start:start + len(fresh)] = vectors
+            self._vectors.flush()
+            self._quantize(start, start + len(fresh))
+            with open(self._records_path, "ab") as fh:
+                for k in fresh:
+                    record = {"id": ids[k], "document": documents[k], "metadata": metadatas[k] or {}}
+                    line = (json.dumps(record) + "\n").encode("utf-8")
+                    fh.write(line)
+                    self._append_row(record, self._records_size)
+                    self._records_size += len(line)
+
+    def get(self, ids=None, where=None, include=None, **kwargs) -> Dict[str, list]:
+        self._refresh()
+        with self._lock:
+            count = len(self.ids)
+            filtered = self._filter(where, count)
+            if ids is None:
+                rows = list(range(count)) if filtered is None else filtered.tolist()
+            else:
+                rows = [self._rows[i] for i in ids if i in self._rows]
+                if filtered is not None:
+                    allowed = set(filtered.tolist())
+                    rows = [r for r in rows if r in allowed]
+            return self._results(rows, include)
+
+    def query(
+        self,
+        query_embeddings=None,
+        query_texts=None,
+        n_results: int = 10,
+        where=None,
+        include=None,
+        **kwargs,
+    ) -> Dict[str, list]:
+        if query_embeddings is None:
+            query_embeddings = self.embedding_function(list(query_texts or []))
+        queries = _normalize(query_embeddings)
+        out: Dict[str, list] = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        self._refresh()
+        with self._lock:
+            count = len(self.ids)
+            candidates = self._filter(where, count)
+            for query in queries:
+                rows, scores = self._top_k(query, n_results, count, candidates)
+                for field, values in self._results(rows, include).items():
+                    out[field].append(values)
+                out["distances"].append([float(1.0 - s) for s in scores])
+        return out
+
+    def _results(self, rows: List[int], include: Optional[Sequence[str]]) -> Dict[str, list]:
+        records = (
+            self._records(rows) if _wants(include, "documents") or _wants(include, "metadatas") else []
+        )
+        return {
+            "ids": [self.ids[r] for r in rows],
+            "documents": [r["document"] for r in records] if _wants(include, "documents") else [],
+            "metadatas": [r.get("metadata") or {} for r in records] if _wants(include, "metadatas") else [],
+        }
+
+    def _top_k(self, query: np.ndarray, k: int, count: int, candidates: Optional[np.ndarray]):
+        if self._vectors is None or not count or k <= 0:
+            return [], []
+        rows = np.arange(count) if candidates is None else candidates
+        if not len(rows):
+            return [], []
+        if self.quantization:
+            # Shortlist on the int8 codes, then score the shortlist exactly
+            approx = self._approx_scores(query, count, candidates)
+            rows = rows[_best(approx, k * self.rerank)]
+            scores = self._vectors[rows] @ query
+        elif candidates is None:
+            scores = self._vectors[:count] @ query
+        else:
+            scores = self._vectors[rows] @ query
+        best = _best(scores, k)
+        return rows[best].tolist(), scores[best].tolist()
+
+    def _approx_scores(self, query: np.ndarray, count: int, candidates: Optional[np.ndarray]) -> np.ndarray:
+        total = count if candidates is None else len(candidates)
+        scores = np.empty(total, dtype=np.float32)
+        # One float32 block is reused for every step instead of a copy per step
+        block = np.empty((min(total, _SCAN_BLOCK), self.dim), dtype=np.float32)
+        for start in range(0, total, _SCAN_BLOCK):
+            stop = min(start + _SCAN_BLOCK, total)
+            index = slice(start, stop) if candidates is None else candidates[start:stop]
+            step = block[: stop - start]
+            np.copyto(step, self._codes[index], casting="unsafe")
+            np.dot(step, query, out=scores[start:stop])
+            scores[start:stop] *= self._scales[index]
+        return scores
+
+
+def _wants(include: Optional[Sequence[str]], field: str) -> bool:
+    """Chroma returns documents and metadatas unless ``include`` says otherwise."""
+    return include is None or field in include
+
+
+def _best(scores: np.ndarray, k: int) -> np.ndarray:
+    """Return the indices of the ``k`` highest ``scores``, best first."""
+    k = min(k, len(scores))
+    best = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+    return best[np.argsort(-scores[best], kind="stable")]
@@ -1,5 +1,7 @@
 """Session management utilities."""
 
+from .feed import TranscriptFeed
 from .manager import SessionManager
+from .transcript import TranscriptStore
 
-__all__ = ["SessionManager"]
+__all__ = ["SessionManager", "TranscriptFeed", "TranscriptStore"]
@@ -0,0 +1,73 @@
+"""Replay buffer for pushing transcript lines to subscribers.
+
+Every transcript line carries a sequence number: its 1-based line number in
+the session's ``transcript.txt`` (the same value ``TranscriptStore`` uses as
+a cursor), so numbers keep increasing across restarts.  :class:`TranscriptFeed`
+keeps the most recent lines of each session so a reconnecting client that
+sends its last sequence number gets only what it missed; when the gap is
+older than the buffer the caller falls back to the transcript file.
+"""
+
+import threading
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional
+
+
+class TranscriptFeed:
+    """Per-session bounded buffers of ``{"seq", "text", "session"}`` events."""
+
+    def __init__(self, replay: int = 500, max_sessions: int = 32) -> None:
+        self.replay = max(1, int(replay))
+        self.max_sessions = max(1, int(max_sessions))
+        self._cond = threading.Condition()
+        self._buffers: OrderedDict[str, Deque[Dict]] = OrderedDict()
+
+    def publish(self, session: str, seq: int, text: str, reset: bool = False) -> Dict:
+        """Record line ``seq`` of ``session`` and wake waiting subscribers.
+
+        ``reset`` says the transcript was truncated and numbering restarted,
+        which drops the buffered lines.  A line arriving out of order is
+        slotted in by sequence number instead.
+        """
+        event = {"seq": seq, "text": text, "session": session}
+        with self._cond:
+            buffer = self._buffers.pop(session, None)
+            if buffer is None or reset:
+                buffer = deque(maxlen=self.replay)
+            if not buffer or buffer[-1]["seq"] < seq:
+                buffer.append(event)
+            elif buffer[0]["seq"] < seq and all(e["seq"] != seq for e in buffer):
+                ordered = sorted([*buffer, event], key=lambda e: e["seq"])
+                buffer = deque(ordered[-self.replay:], maxlen=self.replay)
+            self._buffers[session] = buffer
+            while len(self._buffers) > self.max_sessions:
+                self._buffers.popitem(last=False)
+            self._cond.notify_all()
+        return event
+
+    def latest(self, session: str) -> int:
+        """Return the newest buffered sequence number for ``session`` (0 if none)."""
+        with self._cond:
+            buffer = self._buffers.get(session)
+            return buffer[-1]["seq"] if buffer else 0
+
+    def since(self, session: str, seq: int) -> Optional[List[Dict]]:
+        """Return buffered events after ``seq``.
+
+        Returns ``None`` when the buffer does not reach back to ``seq`` (the
+        missed lines were evicted or published before this process started).
+        """
+        with self._cond:
+            buffer = self._buffers.get(session)
+            if not buffer:
+                return None
+            if seq >= buffer[-1]["seq"]:
+                return []
+            if buffer[0]["seq"] > seq + 1:
+                return None
+            return [event for event in buffer if event["seq"] > seq]
+
+    def wait(self, session: str, seq: int, timeout: float) -> bool:
+        """Block until ``session`` has an event after ``seq``; ``False`` on timeout."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.latest(session) > seq, timeout=timeout)
@@ -0,0 +1,122 @@
+"""Append-only transcript file with a line index.
+
+``transcript.txt`` grows all day and status pollers only ever want its end.
+:class:`TranscriptStore` keeps the byte offset of every line and the most
+recent lines in memory, so the last line (or last N lines) is served without
+touching the file and older ranges are read with a single seek.  Lines are
+numbered from zero; a line number doubles as a cursor for fetching only the
+lines added since a previous call.
+
+The file stays the source of truth: each call stats it and indexes only the
+bytes appended since the last look, so writes from other processes are
+picked up and a truncated or replaced file is re-indexed from the start.
+"""
+
+import logging
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Deque, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptStore:
+    """Index of ``path`` with an in-memory tail of its last lines."""
+
+    def __init__(self, path: Union[str, Path], tail_size: int = 256) -> None:
+        self.path = Path(path)
+        self.tail_size = max(1, int(tail_size))
+        self._lock = threading.Lock()
+        # Bumped whenever the file is found truncated or replaced
+        self.generation = 0
+        self._reset()
+
+    def _reset(self) -> None:
+        self._offsets: List[int] = []
+        self._tail: Deque[str] = deque(maxlen=self.tail_size)
+        self._end = 0  # byte offset just past the last complete line
+        self._partial = ""  # trailing text not yet terminated by a newline
+        self._size = 0
+        self._inode: Optional[int] = None
+
+    def _sync(self) -> None:
+        """Index whatever was appended to the file since the last call."""
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            if self._inode is not None:
+                self.generation += 1
+            self._reset()
+            return
+        if stat.st_ino != self._inode or stat.st_size < self._end:
+            if self._inode is not None:
+                self.generation += 1
+            self._reset()
+            self._inode = stat.st_ino
+        if stat.st_size == self._size:
+            return
+        with open(self.path, "rb") as fh:
+            fh.seek(self._end)
+            data = fh.read(stat.st_size - self._end)
+        *complete, partial = data.split(b"\n")
+        for raw in complete:
+            self._offsets.append(self._end)
+            self._tail.append(raw.decode("utf-8", errors="replace").rstrip("\r"))
+            self._end += len(raw) + 1
+        self._partial = partial.decode("utf-8", errors="replace").rstrip("\r")
+        self._size = stat.st_size
+
+    def append(self, text: str) -> int:
+        """Append ``text`` as one or more lines; return the new line count."""
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as fh:
+                fh.write(text + "\n")
+            self._sync()
+            return len(self._offsets)
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._sync()
+            return len(self._offsets)
+
+    def last(self, n: int = 1) -> List[str]:
+        """Return the last ``n`` lines, oldest first."""
+        with self._lock:
+            self._sync()
+            if n <= 0:
+                return []
+            # An unterminated last line (written by someone else) counts too
+            complete = n - 1 if self._partial else n
+            lines = self._lines(max(0, len(self._offsets) - complete), len(self._offsets))
+            return lines + [self._partial] if self._partial else lines
+
+    def since(self, cursor: int, limit: Optional[int] = None) -> Tuple[List[str], int]:
+        """Return complete lines from line ``cursor`` on and the next cursor.
+
+        At most ``limit`` lines are returned; pass the returned cursor on the
+        next call to continue where this one stopped.
+        """
+        with self._lock:
+            self._sync()
+            total = len(self._offsets)
+            start = min(max(0, cursor), total)
+            stop = total if limit is None else min(total, start + max(0, limit))
+            return self._lines(start, stop), stop
+
+    def _lines(self, start: int, stop: int) -> List[str]:
+        """Return lines ``[start, stop)`` from the tail or with one file read."""
+        if start >= stop:
+            return []
+        first_cached = len(self._offsets) - len(self._tail)
+        if start >= first_cached:
+            return list(self._tail)[start - first_cached:stop - first_cached]
+        end = self._offsets[stop] if stop < len(self._offsets) else self._end
+        try:
+            with open(self.path, "rb") as fh:
+                fh.seek(self._offsets[start])
+                data = fh.read(end - self._offsets[start])
+        except OSError as exc:
+            logger.warning("Failed to read transcript %s: %s", self.path, exc)
+            return []
+        return [line.rstrip("\r") for line in data.decode("utf-8", errors="replace").split("\n")[:-1]]
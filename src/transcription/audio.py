@@ -0,0 +1,202 @@
+"""Audio decoding helpers that keep PCM in memory.
+
+Whisper consumes 16 kHz mono float32 samples.  Rather than writing media to a
+temporary file and forking ``ffmpeg`` to produce a WAV for every request, the
+helpers here pipe the encoded bytes through ``ffmpeg`` and read raw PCM back
+from its stdout.  :class:`StreamDecoder` keeps a single ``ffmpeg`` process
+alive for a whole stream so live WebM chunks are decoded incrementally.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import subprocess
+import threading
+import time
+import wave
+from typing import List, Optional, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+
+_PCM_OUTPUT = ["-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE), "pipe:1"]
+
+
+def _ffmpeg_command(source: str, *, low_latency: bool = False) -> List[str]:
+    cmd = ["ffmpeg", "-hide_banner", "-loglevel", "error"]
+    if low_latency:
+        # Live chunks carry their codec parameters in the WebM header, so a
+        # tiny probe is enough and lets ffmpeg start emitting PCM right away.
+        cmd += ["-fflags", "nobuffer", "-probesize", "32768", "-analyzeduration", "0"]
+    return cmd + ["-i", source] + _PCM_OUTPUT
+
+
+def pcm16_to_float32(data: Union[bytes, bytearray]) -> np.ndarray:
+    """Convert little-endian signed 16-bit PCM to float32 samples in [-1, 1)."""
+    usable = len(data) - (len(data) % 2)
+    samples = np.frombuffer(bytes(data[:usable]), dtype="<i2")
+    return samples.astype(np.float32) / 32768.0
+
+
+def decode_audio(source: Union[bytes, str]) -> np.ndarray:
+    """Decode ``source`` to 16 kHz mono float32 PCM.
+
+    ``source`` may be encoded media bytes, which are piped to ``ffmpeg`` over
+    stdin, or a path to a media file.  Raises ``subprocess.CalledProcessError``
+    when ``ffmpeg`` cannot decode the input.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        cmd = _ffmpeg_command("pipe:0")
+        proc = subprocess.run(
+            cmd,
+            input=bytes(source),
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+    else:
+        cmd = _ffmpeg_command(str(source))
+        proc = subprocess.run(
+            cmd,
+            check=True,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+        )
+    return pcm16_to_float32(proc.stdout)
+
+
+def write_wav(path: str, audio: np.ndarray, sample_rate: int = SAMPLE_RATE) -> None:
+    """Write float32 ``audio`` to ``path`` as a 16-bit mono WAV file."""
+    pcm = (np.clip(audio, -1.0, 1.0) * 32767.0).astype("<i2")
+    with wave.open(str(path), "wb") as fh:
+        fh.setnchannels(1)
+        fh.setsampwidth(2)
+        fh.setframerate(sample_rate)
+        fh.writeframes(pcm.tobytes())
+
+
+class StreamDecoder:
+    """Decode a continuous media stream with one long-lived ``ffmpeg`` process.
+
+    Encoded chunks are written to ``ffmpeg``'s stdin as they arrive and a
+    reader thread collects the PCM it produces.  Chunks after the first one in
+    a MediaRecorder stream have no container header, so decoding them through
+    a single process is also what keeps them decodable at all.
+    """
+
+    def __init__(self, settle: float = 0.05, timeout: float = 0.5) -> None:
+        self.settle = settle
+        self.timeout = timeout
+        self._proc: Optional[subprocess.Popen] = None
+        self._reader: Optional[threading.Thread] = None
+        self._buffer = bytearray()
+        self._cond = threading.Condition()
+        # Socket.IO may handle chunks of one connection on several threads;
+        # one writer at a time keeps the bytes ffmpeg sees in one piece
+        self._feed_lock = threading.Lock()
+        self._closed = False
+
+    def _start(self) -> subprocess.Popen:
+        proc = subprocess.Popen(
+            _ffmpeg_command("pipe:0", low_latency=True),
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            bufsize=0,
+        )
+        self._reader = threading.Thread(
+            target=self._read_loop, args=(proc,), name="ffmpeg-reader", daemon=True
+        )
+        self._reader.start()
+        logger.info("Started streaming decoder (pid %s)", proc.pid)
+        return proc
+
+    def _read_loop(self, proc: subprocess.Popen) -> None:
+        fd = proc.stdout.fileno()
+        while True:
+            try:
+                chunk = os.read(fd, 65536)
+            except OSError:
+                chunk = b""
+            with self._cond:
+                if not chunk:
+                    self._cond.notify_all()
+                    return
+                self._buffer.extend(chunk)
+                self._cond.notify_all()
+
+    def _take(self) -> np.ndarray:
+        usable = len(self._buffer) - (len(self._buffer) % 2)
+        data = bytes(self._buffer[:usable])
+        del self._buffer[:usable]
+        return pcm16_to_float32(data)
+
+    def feed(self, data: bytes) -> np.ndarray:
+        """Write ``data`` to the decoder and return the PCM decoded so far.
+
+        Waits up to ``timeout`` seconds for output to appear and returns once
+        it has stopped growing for ``settle`` seconds.  Concurrent calls run
+        one after another.  Raises ``RuntimeError`` if the decoder is closed
+        or ``ffmpeg`` has exited.
+        """
+        with self._feed_lock:
+            return self._feed(data)
+
+    def _feed(self, data: bytes) -> np.ndarray:
+        if self._closed:
+            raise RuntimeError("decoder is closed")
+        if self._proc is None:
+            self._proc = self._start()
+        if self._proc.poll() is not None:
+            raise RuntimeError(f"ffmpeg decoder exited with code {self._proc.returncode}")
+        try:
+            self._proc.stdin.write(data)
+            self._proc.stdin.flush()
+        except (BrokenPipeError, OSError) as exc:
+            raise RuntimeError(f"ffmpeg decoder rejected input: {exc}") from exc
+
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            size = len(self._buffer)
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                wait = min(self.settle, remaining) if self._buffer else remaining
+                self._cond.wait(wait)
+                if len(self._buffer) == size:
+                    if self._buffer or self._proc.poll() is not None:
+                        break
+                size = len(self._buffer)
+            return self._take()
+
+    def read(self) -> np.ndarray:
+        """Return PCM decoded since the last call without writing input."""
+        with self._cond:
+            return self._take()
+
+    def close(self) -> np.ndarray:
+        """Flush the decoder, stop ``ffmpeg`` and return any remaining PCM."""
+        self._closed = True
+        # Let a feed in progress finish writing before stdin is closed
+        with self._feed_lock:
+            proc, self._proc = self._proc, None
+        if proc is not None:
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+            try:
+                proc.wait(timeout=self.timeout * 4)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+                proc.wait()
+            if self._reader is not None:
+                self._reader.join(timeout=self.timeout)
+        with self._cond:
+            return self._take()
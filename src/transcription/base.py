@@ -1,7 +1,12 @@
 import logging
-import tempfile
-from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, List, NamedTuple, Optional, Union
+
+import numpy as np
+
+from .audio import decode_audio
+from .batching import MAX_SAMPLES, BatchingEngine, batch_api_available, decode_batch
+from .cache import TranscriptionCache
+from .registry import ModelRegistry, get_registry
 
 logger = logging.getLogger(__name__)
 
@@ -11,66 +16,200 @@ except Exception:  # pragma: no cover - whisper is optional
     whisper = None
 
 
+class Word(NamedTuple):
+    """A transcribed word with its timing in seconds, when known."""
+
+    start: Optional[float]
+    end: Optional[float]
+    text: str
+
+
 class TranscriptionService:
     """Transcribe audio files using Whisper if available."""
 
-    def __init__(self, model_name: str = "base", enable_diarization: bool = False) -> None:
+    def __init__(
+        self,
+        model_name: str = "base",
+        enable_diarization: Union[bool, str] = False,
+        batching: Optional[Dict[str, Any]] = None,
+        device: Optional[str] = None,
+        compute_type: Optional[str] = None,
+        registry: Optional[ModelRegistry] = None,
+        cache: Optional[Dict[str, Any]] = None,
+    ) -> None:
         self.model: Optional[object]
+        self.registry = registry or get_registry()
+        self._model_key = (model_name, device, compute_type)
         if whisper is not None:
             try:
-                self.model = whisper.load_model(model_name)
-                logger.info("Loaded whisper model '%s'", model_name)
+                self.model = self.registry.acquire(*self._model_key)
+                logger.info("Using whisper model '%s'", model_name)
             except Exception as exc:
                 logger.exception("Failed to load whisper model: %s", exc)
                 self.model = None
         else:
             self.model = None
+        # Whisper installs per-call KV-cache hooks on the model, so decodes
+        # running on different threads must not overlap.  The lock comes from
+        # the registry so every holder of the shared model uses the same one.
+        self._model_lock = self.registry.lock_for(self.model)
 
-        self.enable_diarization = enable_diarization
+        # Optional micro-batching of concurrent short segments
+        self.batcher = None
+        batching = batching or {}
+        if batching.get("enabled") and self.model is not None:
+            self.batcher = BatchingEngine(
+                self.model,
+                max_batch_size=batching.get("max_batch_size", 8),
+                max_wait_ms=batching.get("max_wait_ms", 20),
+                lock=self._model_lock,
+            )
+
+        # Optional cache of results keyed on the decoded PCM
+        self.cache = None
+        cache = dict(cache or {})
+        if cache.pop("enabled", False):
+            self.cache = TranscriptionCache(**cache)
+
+        # ``True``/"aligned" labels one full transcription with speaker turns;
+        # "segments" transcribes each speaker turn separately.
+        self.enable_diarization = bool(enable_diarization)
         self.diarization = None
         if enable_diarization:
+            mode = "segments" if enable_diarization == "segments" else "aligned"
             try:
                 from .diarization import DiarizationService
-                self.diarization = DiarizationService(self)
+                self.diarization = DiarizationService(self, mode=mode)
             except Exception as exc:
                 logger.exception("Failed to initialize diarization: %s", exc)
 
-    def _transcribe_no_diarization(self, audio_path: str) -> Optional[str]:
-        """Transcribe ``audio_path`` without applying diarization."""
+    def close(self) -> None:
+        """Release this service's reference to the shared model."""
+        if self.model is not None:
+            self.model = None
+            self.registry.release(*self._model_key)
+
+    def _transcribe_no_diarization(self, audio: Union[str, np.ndarray]) -> Optional[str]:
+        """Transcribe ``audio`` without applying diarization.
+
+        ``audio`` is either a path to a media file or 16 kHz mono float32 PCM.
+        """
         if self.model is None:
             logger.warning("Transcription requested but model is unavailable")
             return None
+        if isinstance(audio, np.ndarray) and audio.size == 0:
+            return ""
         try:
-            result = self.model.transcribe(audio_path)
+            if (
+                self.batcher is not None
+                and isinstance(audio, np.ndarray)
+                and len(audio) <= MAX_SAMPLES
+            ):
+                return self.batcher.transcribe(audio)
+            with self._model_lock:
+                result = self.model.transcribe(audio)
         except Exception as exc:
             logger.exception("Transcription failed: %s", exc)
             return None
         return result.get("text", "")
 
-    def transcribe(self, audio_path: str) -> Optional[str]:
-        """Transcribe audio file at ``audio_path``.
+    def transcribe_many(self, segments: List[np.ndarray], batch_size: int = 8) -> List[Optional[str]]:
+        """Transcribe PCM ``segments`` without diarization, preserving order.
+
+        Segments that fit one Whisper window are decoded ``batch_size`` at a
+        time with a single encoder pass per batch when the model supports it;
+        the rest are transcribed one by one.
+        """
+        if self.model is None:
+            logger.warning("Transcription requested but model is unavailable")
+            return [None] * len(segments)
+        results: List[Optional[str]] = [None] * len(segments)
+        batchable = [
+            i for i, seg in enumerate(segments) if 0 < len(seg) <= MAX_SAMPLES
+        ] if batch_api_available(self.model) else []
+        for start in range(0, len(batchable), batch_size):
+            indices = batchable[start:start + batch_size]
+            try:
+                with self._model_lock:
+                    texts = decode_batch(self.model, [segments[i] for i in indices])
+            except Exception as exc:
+                logger.exception("Batched transcription failed: %s", exc)
+                continue
+            for i, text in zip(indices, texts):
+                results[i] = text
+        done = set(batchable)
+        for i, seg in enumerate(segments):
+            if i not in done or results[i] is None:
+                results[i] = self._transcribe_no_diarization(seg)
+        return results
+
+    def transcribe_words(self, audio: Union[str, np.ndarray]) -> Optional[List[Word]]:
+        """Transcribe ``audio`` into words with timestamps.
+
+        Word timings come from Whisper's ``word_timestamps`` option; models
+        that cannot provide them yield words whose ``start``/``end`` are
+        ``None``.  Returns ``None`` if transcription cannot be performed.
+        """
+        if self.model is None:
+            logger.warning("Transcription requested but model is unavailable")
+            return None
+        if isinstance(audio, np.ndarray) and audio.size == 0:
+            return []
+        try:
+            with self._model_lock:
+                try:
+                    result = self.model.transcribe(audio, word_timestamps=True)
+                except TypeError:
+                    result = self.model.transcribe(audio)
+        except Exception as exc:
+            logger.exception("Transcription failed: %s", exc)
+            return None
+
+        words = [
+            Word(float(w["start"]), float(w["end"]), w["word"].strip())
+            for segment in result.get("segments") or []
+            for w in segment.get("words") or []
+            if w.get("word", "").strip()
+        ]
+        if not words:
+            words = [Word(None, None, w) for w in result.get("text", "").split()]
+        return words
+
+    def stream(self, **kwargs) -> "StreamingSession":
+        """Return a :class:`StreamingSession` for incremental transcription."""
+        from .streaming import StreamingSession
+
+        return StreamingSession(self, **kwargs)
+
+    def transcribe(self, audio: Union[str, np.ndarray]) -> Optional[str]:
+        """Transcribe ``audio``, a file path or 16 kHz mono float32 PCM.
 
         Returns ``None`` if transcription cannot be performed or fails.
+        Results for PCM input are served from :attr:`cache` when enabled.
         """
+        key = None
+        if self.cache is not None and isinstance(audio, np.ndarray) and audio.size:
+            mode = self.diarization.mode if self.diarization is not None else None
+            key = self.cache.key(audio, self._model_key, diarization=mode)
+            text = self.cache.get(key)
+            if text is not None:
+                return text
         if self.enable_diarization and self.diarization is not None:
-            return self.diarization.diarize(audio_path)
-        return self._transcribe_no_diarization(audio_path)
+            text = self.diarization.diarize(audio)
+        else:
+            text = self._transcribe_no_diarization(audio)
+        if key is not None and text is not None:
+            self.cache.put(key, text)
+        return text
 
     def transcribe_bytes(self, audio_bytes: bytes) -> Optional[str]:
-        """Transcribe raw audio bytes.
+        """Transcribe encoded audio bytes without touching the filesystem.
 
-        Returns ``None`` if the bytes cannot be written or transcription fails.
+        Returns ``None`` if the bytes cannot be decoded or transcription fails.
         """
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-            try:
-                tmp.write(audio_bytes)
-                tmp.flush()
-                path = tmp.name
-            except Exception as exc:
-                logger.exception(
-                    "Failed to write temporary audio file: %s", exc
-                )
-                return None
-        text = self.transcribe(path)
-        Path(path).unlink(missing_ok=True)
-        return text
+        try:
+            audio = decode_audio(audio_bytes)
+        except Exception as exc:
+            logger.exception("Failed to decode audio bytes: %s", exc)
+            return None
+        return self.transcribe(audio)
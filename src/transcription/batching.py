@@ -0,0 +1,140 @@
+"""Dynamic micro-batching of concurrent Whisper requests.
+
+Callers on different threads submit short PCM segments to a
+:class:`BatchingEngine`.  A collector thread waits up to ``max_wait_ms`` for
+up to ``max_batch_size`` segments, pads each one to Whisper's 30 second
+window, stacks their log-mel spectrograms and runs the encoder and decoder
+once for the whole batch.  Every caller gets its own text back through a
+future.
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+
+from .audio import SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+try:
+    import whisper  # type: ignore
+except Exception:  # pragma: no cover - whisper is optional
+    whisper = None
+
+# Whisper decodes fixed 30 second windows; longer audio uses model.transcribe.
+MAX_SAMPLES = 30 * SAMPLE_RATE
+
+
+def batch_api_available(model: Any) -> bool:
+    """Return ``True`` if ``model`` supports batched log-mel decoding."""
+    return (
+        whisper is not None
+        and hasattr(whisper, "log_mel_spectrogram")
+        and hasattr(whisper, "pad_or_trim")
+        and hasattr(whisper, "DecodingOptions")
+        and hasattr(model, "decode")
+    )
+
+
+def decode_batch(model: Any, audios: List[np.ndarray]) -> List[str]:
+    """Transcribe ``audios`` (each at most 30 s) with one encoder pass.
+
+    The segments are padded to Whisper's window, their log-mel spectrograms
+    stacked and decoded jointly.  Requires :func:`batch_api_available`.
+    """
+    import torch  # type: ignore
+
+    n_mels = getattr(getattr(model, "dims", None), "n_mels", 80)
+    mel = torch.stack(
+        [
+            whisper.log_mel_spectrogram(
+                whisper.pad_or_trim(torch.from_numpy(audio.astype(np.float32))), n_mels
+            )
+            for audio in audios
+        ]
+    ).to(model.device)
+    options = whisper.DecodingOptions(fp16=model.device.type != "cpu", without_timestamps=True)
+    return [result.text for result in model.decode(mel, options)]
+
+
+class BatchingEngine:
+    """Group concurrent transcription requests into batched decodes."""
+
+    def __init__(
+        self,
+        model: Any,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 20.0,
+        lock: Optional[threading.Lock] = None,
+    ) -> None:
+        self.model = model
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._lock = lock or threading.Lock()
+        self._pending: "queue.Queue[Tuple[np.ndarray, Future]]" = queue.Queue()
+        self._batched = batch_api_available(model)
+        self.batches = 0
+        self.items = 0
+        self._thread = threading.Thread(target=self._collect, name="whisper-batcher", daemon=True)
+        self._thread.start()
+        if not self._batched:
+            logger.info("Whisper batch API unavailable; batches run item by item")
+
+    def submit(self, audio: np.ndarray) -> Future:
+        """Queue ``audio`` (at most 30 s of 16 kHz PCM) for the next batch."""
+        if len(audio) > MAX_SAMPLES:
+            raise ValueError("batched segments must be at most 30 seconds long")
+        future: Future = Future()
+        self._pending.put((audio, future))
+        return future
+
+    def transcribe(self, audio: np.ndarray) -> str:
+        """Block until ``audio`` has been transcribed as part of a batch."""
+        return self.submit(audio).result()
+
+    @property
+    def mean_batch_size(self) -> float:
+        return self.items / self.batches if self.batches else 0.0
+
+    def _collect(self) -> None:
+        while True:
+            batch = [self._pending.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._run(batch)
+
+    def _run(self, batch: List[Tuple[np.ndarray, Future]]) -> None:
+        batch = [(audio, fut) for audio, fut in batch if fut.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        try:
+            with self._lock:
+                texts = self._decode_batch([audio for audio, _ in batch])
+        except BaseException as exc:
+            logger.exception("Batched transcription failed: %s", exc)
+            for _, fut in batch:
+                fut.set_exception(exc)
+            return
+        self.batches += 1
+        self.items += len(batch)
+        for (_, fut), text in zip(batch, texts):
+            fut.set_result(text)
+
+    def _decode_batch(self, audios: List[np.ndarray]) -> List[str]:
+        if not self._batched:
+            return [self.model.transcribe(audio).get("text", "") for audio in audios]
+        return decode_batch(self.model, audios)
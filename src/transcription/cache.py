@@ -0,0 +1,195 @@
+"""Content-addressed cache of transcription results.
+
+Clients retry uploads and the enrollment worker sees the same voice samples
+again, so identical audio would otherwise be decoded by Whisper every time.
+:class:`TranscriptionCache` keys each result on a hash of the audio (decoded
+PCM, or raw file bytes) together with the model and transcription options.
+Results live in an in-memory LRU and, when ``directory`` is set, in a disk
+tier that survives restarts and is shared by processes using the same path.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class TranscriptionCache:
+    """Two-tier (memory LRU + optional disk) cache of transcripts."""
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        ttl: Optional[float] = None,
+        directory: Optional[Union[str, Path]] = None,
+        max_disk_mb: float = 256.0,
+    ) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self.ttl = float(ttl) if ttl else None
+        self.directory = Path(directory) if directory else None
+        self.max_disk_bytes = int(float(max_disk_mb) * 1024 * 1024)
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._counts = {"hits": 0, "memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+        self._disk_bytes = 0
+        if self.directory is not None:
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self._disk_bytes = sum(p.stat().st_size for p in self.directory.glob("*/*.txt"))
+            except OSError as exc:
+                logger.warning("Disabling disk cache at %s: %s", self.directory, exc)
+                self.directory = None
+
+    @staticmethod
+    def key(audio: Union[np.ndarray, bytes], model: Any, **options: Any) -> str:
+        """Return the cache key for ``audio`` transcribed by ``model``.
+
+        ``audio`` is 16 kHz mono PCM or the raw bytes of an audio file;
+        ``options`` are any settings that change the transcript.
+        """
+        digest = hashlib.sha256()
+        digest.update(json.dumps([model, options], sort_keys=True, default=str).encode("utf-8"))
+        if isinstance(audio, np.ndarray):
+            digest.update(b"pcm:")
+            digest.update(np.ascontiguousarray(audio, dtype=np.float32).tobytes())
+        else:
+            digest.update(b"bytes:")
+            digest.update(audio)
+        return digest.hexdigest()
+
+    def _expired(self, stored_at: float) -> bool:
+        return self.ttl is not None and time.time() - stored_at > self.ttl
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.txt"
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached transcript for ``key`` or ``None`` on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if not self._expired(entry[0]):
+                    self._entries.move_to_end(key)
+                    self._counts["hits"] += 1
+                    self._counts["memory_hits"] += 1
+                    return entry[1]
+                del self._entries[key]
+
+        found = self._disk_get(key)
+        with self._lock:
+            if found is None:
+                self._counts["misses"] += 1
+                return None
+            self._counts["hits"] += 1
+            self._counts["disk_hits"] += 1
+            self._remember(key, found[1], found[0])
+        return found[1]
+
+    def put(self, key: str, text: str) -> None:
+        """Store ``text`` under ``key`` in both tiers."""
+        now = time.time()
+        with self._lock:
+            self._remember(key, text, now)
+        self._disk_put(key, text)
+
+    def _remember(self, key: str, text: str, stored_at: float) -> None:
+        self._entries[key] = (stored_at, text)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counts["evictions"] += 1
+
+    def _disk_get(self, key: str) -> Optional[Tuple[float, str]]:
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            stored_at = path.stat().st_mtime
+            if self._expired(stored_at):
+                self._disk_remove(path)
+                return None
+            return stored_at, path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+        except OSError as exc:
+            logger.warning("Failed to read cached transcript %s: %s", path, exc)
+            return None
+
+    def _disk_put(self, key: str, text: str) -> None:
+        if self.directory is None:
+            return
+        path = self._path(key)
+        data = text.encode("utf-8")
+        try:
+            replaced = path.stat().st_size if path.exists() else 0
+            path.parent.mkdir(exist_ok=True)
+            # Write then rename so readers never see a partial file
+            fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp, path)
+        except OSError as exc:
+            logger.warning("Failed to write cached transcript %s: %s", path, exc)
+            return
+        with self._lock:
+            self._disk_bytes += len(data) - replaced
+            over = self._disk_bytes > self.max_disk_bytes
+        if over:
+            self._disk_prune()
+
+    def _disk_remove(self, path: Path) -> None:
+        try:
+            size = path.stat().st_size
+            path.unlink()
+        except OSError:
+            return
+        with self._lock:
+            self._disk_bytes -= size
+
+    def _disk_prune(self) -> None:
+        """Delete the oldest disk entries until the tier fits its limit."""
+        files = []
+        for path in self.directory.glob("*/*.txt"):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                path.unlink()
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self._counts["evictions"] += 1
+        with self._lock:
+            self._disk_bytes = total
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the size of both tiers."""
+        with self._lock:
+            lookups = self._counts["hits"] + self._counts["misses"]
+            return {
+                **self._counts,
+                "hit_rate": round(self._counts["hits"] / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "disk_bytes": self._disk_bytes if self.directory is not None else None,
+            }
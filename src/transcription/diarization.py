@@ -1,10 +1,10 @@
 import logging
-import subprocess
-import tempfile
-from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import List, Optional, Tuple, Union
 
-from .base import TranscriptionService
+import numpy as np
+
+from .audio import SAMPLE_RATE, decode_audio
+from .base import TranscriptionService, Word
 
 logger = logging.getLogger(__name__)
 
@@ -13,12 +13,81 @@ try:
 except Exception:  # pragma: no cover - pyannote.audio optional
     Pipeline = None
 
+# (start seconds, end seconds, speaker label)
+Turn = Tuple[float, float, str]
+
+
+def merge_turns(turns: List[Turn], max_gap: float = 0.5, max_length: float = 30.0) -> List[Turn]:
+    """Merge consecutive turns of the same speaker.
+
+    Turns are joined when the silence between them is at most ``max_gap``
+    seconds and the merged turn stays within ``max_length`` seconds, so each
+    result still fits a single Whisper window.
+    """
+    merged: List[Turn] = []
+    for start, end, speaker in turns:
+        if merged:
+            prev_start, prev_end, prev_speaker = merged[-1]
+            if (
+                speaker == prev_speaker
+                and start - prev_end <= max_gap
+                and end - prev_start <= max_length
+            ):
+                merged[-1] = (prev_start, max(prev_end, end), speaker)
+                continue
+        merged.append((start, end, speaker))
+    return merged
+
+
+def assign_speakers(words: List[Word], turns: List[Turn]) -> List[Tuple[str, str]]:
+    """Label each timed word with the speaker of the turn it overlaps most.
+
+    Words that fall between turns take the nearest turn's speaker.  Returns
+    ``(speaker, text)`` pairs with consecutive words of one speaker joined.
+    """
+    turns = sorted(turns)
+    active: List[Turn] = []
+    nxt = 0
+    lines: List[Tuple[str, str]] = []
+    for word in sorted(words, key=lambda w: w.start):
+        # Sweep: admit turns starting before the word ends, drop finished ones
+        while nxt < len(turns) and turns[nxt][0] <= word.end:
+            active.append(turns[nxt])
+            nxt += 1
+        active = [t for t in active if t[1] >= word.start]
+        best, best_overlap = None, 0.0
+        for start, end, speaker in active:
+            overlap = min(end, word.end) - max(start, word.start)
+            if overlap > best_overlap:
+                best, best_overlap = speaker, overlap
+        if best is None:
+            mid = (word.start + word.end) / 2
+            nearest = min(turns, key=lambda t: min(abs(mid - t[0]), abs(mid - t[1])))
+            best = nearest[2]
+        if lines and lines[-1][0] == best:
+            lines[-1] = (best, f"{lines[-1][1]} {word.text}")
+        else:
+            lines.append((best, word.text))
+    return lines
+
 
 class DiarizationService:
     """Perform speaker diarization and return speaker-labelled text."""
 
-    def __init__(self, transcriber: TranscriptionService, model_name: str = "pyannote/speaker-diarization") -> None:
+    def __init__(
+        self,
+        transcriber: TranscriptionService,
+        model_name: str = "pyannote/speaker-diarization",
+        max_gap: float = 0.5,
+        max_turn_length: float = 30.0,
+        mode: str = "aligned",
+    ) -> None:
         self.transcriber = transcriber
+        # "aligned": one full transcription with word timestamps mapped onto
+        # speaker turns; "segments": transcribe every turn separately.
+        self.mode = mode
+        self.max_gap = max_gap
+        self.max_turn_length = max_turn_length
         if Pipeline is not None:
             try:
                 self.pipeline = Pipeline.from_pretrained(model_name)
@@ -29,49 +98,66 @@ class DiarizationService:
         else:  # pragma: no cover - pyannote not installed
             self.pipeline = None
 
-    def diarize(self, audio_path: str) -> Optional[str]:
-        """Return speaker-labelled transcription for ``audio_path``."""
+    def diarize(self, audio: Union[str, np.ndarray]) -> Optional[str]:
+        """Return speaker-labelled transcription for ``audio``.
+
+        ``audio`` is either a path to a media file or 16 kHz mono float32 PCM.
+        Files are decoded once; every speaker turn is then a view into the
+        same array and the turns are transcribed together.
+        """
         if self.pipeline is None:
             logger.warning("Diarization requested but model is unavailable")
             return None
+        if not isinstance(audio, np.ndarray):
+            try:
+                audio = decode_audio(audio)
+            except Exception as exc:
+                logger.exception("Failed to decode audio for diarization: %s", exc)
+                return None
         try:
-            diarization = self.pipeline(audio_path)
+            diarization = self.pipeline(self._pipeline_input(audio))
         except Exception as exc:
             logger.exception("Diarization failed: %s", exc)
             return None
 
+        turns = [
+            (turn.start, turn.end, speaker)
+            for turn, _, speaker in diarization.itertracks(yield_label=True)
+        ]
+        if not turns:
+            return ""
+        if self.mode == "aligned":
+            text = self._diarize_aligned(audio, turns)
+            if text is not None:
+                return text
+            logger.info("Word timestamps unavailable; transcribing speaker turns separately")
+        return self._diarize_segments(audio, turns)
+
+    def _diarize_aligned(self, audio: np.ndarray, turns: List[Turn]) -> Optional[str]:
+        """Transcribe ``audio`` once and split the words by speaker turn.
+
+        Returns ``None`` when the model cannot provide word timestamps.
+        """
+        words = self.transcriber.transcribe_words(audio)
+        if words is None or any(w.start is None for w in words):
+            return None
+        return "\n".join(f"{speaker}: {text}" for speaker, text in assign_speakers(words, turns))
+
+    def _diarize_segments(self, audio: np.ndarray, turns: List[Turn]) -> str:
+        """Transcribe every (merged) speaker turn as its own segment."""
+        turns = merge_turns(turns, max_gap=self.max_gap, max_length=self.max_turn_length)
+        slices = [audio[int(start * SAMPLE_RATE):int(end * SAMPLE_RATE)] for start, end, _ in turns]
+        texts = self.transcriber.transcribe_many(slices)
+
         segments: List[str] = []
-        for turn, _, speaker in diarization.itertracks(yield_label=True):
-            text = self._transcribe_segment(audio_path, turn.start, turn.end)
+        for (_, _, speaker), text in zip(turns, texts):
             if text:
                 segments.append(f"{speaker}: {text.strip()}")
         return "\n".join(segments)
 
-    def _transcribe_segment(self, audio_path: str, start: float, end: float) -> Optional[str]:
-        """Helper to transcribe a slice of audio using the parent transcriber."""
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp:
-            tmp_name = tmp.name
-        try:
-            subprocess.run(
-                [
-                    "ffmpeg",
-                    "-y",
-                    "-i",
-                    audio_path,
-                    "-ss",
-                    str(start),
-                    "-to",
-                    str(end),
-                    tmp_name,
-                ],
-                check=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-            )
-            text = self.transcriber._transcribe_no_diarization(tmp_name)
-        except Exception as exc:  # pragma: no cover - ffmpeg or transcription errors
-            logger.exception("Failed to transcribe segment: %s", exc)
-            text = None
-        finally:
-            Path(tmp_name).unlink(missing_ok=True)
-        return text
+    @staticmethod
+    def _pipeline_input(audio: np.ndarray):
+        """Return ``audio`` in the in-memory form accepted by pyannote."""
+        import torch  # type: ignore
+
+        return {"waveform": torch.from_numpy(audio).unsqueeze(0), "sample_rate": SAMPLE_RATE}
@@ -0,0 +1,146 @@
+"""Bounded background job queue for transcription work.
+
+Request handlers submit jobs to a :class:`TranscriptionPipeline` instead of
+running Whisper on their own thread.  A fixed pool of worker threads owns the
+:class:`~src.transcription.base.TranscriptionService` and drains the queue;
+when the queue is full ``submit`` raises :class:`QueueFullError` so callers
+can shed load (e.g. respond with HTTP 429) instead of piling up.
+
+``concurrency`` is the number of jobs in flight, not of Whisper calls.
+Every holder of a model shares its inference lock, so extra workers overlap
+the rest of a job (decoding, VAD, diarization, memory writes) with another
+job's inference.  Only with batching enabled do concurrent short segments
+share one encoder pass, which is why the server sizes the pool to the batch
+when batching is on.  Running several models in parallel (one per worker)
+is not supported.
+"""
+
+from __future__ import annotations
+
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Any, Callable, Deque, Dict, List
+
+if TYPE_CHECKING:  # pragma: no cover - avoid importing Whisper eagerly
+    from .base import TranscriptionService
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(RuntimeError):
+    """Raised when the pipeline cannot accept another job."""
+
+
+def _summary(samples: Deque[float]) -> Dict[str, float]:
+    if not samples:
+        return {"avg": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+    last = len(ordered) - 1
+    return {
+        "avg": round(sum(ordered) / len(ordered), 3),
+        "p50": round(ordered[last // 2], 3),
+        "p95": round(ordered[int(last * 0.95)], 3),
+        "max": round(ordered[last], 3),
+    }
+
+
+class TranscriptionPipeline:
+    """Run transcription jobs on a bounded queue served by worker threads.
+
+    Workers run jobs concurrently, but calls into one model are serialized
+    by its lock (see the module docstring).
+    """
+
+    def __init__(
+        self,
+        transcriber: "TranscriptionService",
+        concurrency: int = 1,
+        max_queue: int = 32,
+        history: int = 500,
+    ) -> None:
+        self.transcriber = transcriber
+        self.concurrency = max(1, int(concurrency))
+        self.max_queue = max(1, int(max_queue))
+        self._jobs: queue.Queue[tuple | None] = queue.Queue(maxsize=self.max_queue)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._counts = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0}
+        self._wait_ms: Deque[float] = deque(maxlen=history)
+        self._run_ms: Deque[float] = deque(maxlen=history)
+        self._workers: List[threading.Thread] = []
+        for i in range(self.concurrency):
+            worker = threading.Thread(
+                target=self._work, name=f"transcription-worker-{i}", daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Future:
+        """Queue ``fn(*args, **kwargs)`` and return a future for its result.
+
+        Raises :class:`QueueFullError` when ``max_queue`` jobs are waiting.
+        """
+        future: Future = Future()
+        try:
+            self._jobs.put_nowait((fn, args, kwargs, future, time.monotonic()))
+        except queue.Full:
+            with self._lock:
+                self._counts["rejected"] += 1
+            raise QueueFullError(f"transcription queue is full ({self.max_queue} jobs)")
+        with self._lock:
+            self._counts["submitted"] += 1
+        return future
+
+    def transcribe(self, audio: Any) -> Future:
+        """Queue a plain transcription of ``audio``."""
+        return self.submit(self.transcriber.transcribe, audio)
+
+    def _work(self) -> None:
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                self._jobs.task_done()
+                return
+            fn, args, kwargs, future, queued_at = job
+            started = time.monotonic()
+            with self._lock:
+                self._active += 1
+                self._wait_ms.append((started - queued_at) * 1000)
+            ok = True
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except BaseException as exc:
+                    ok = False
+                    logger.exception("Transcription job failed: %s", exc)
+                    future.set_exception(exc)
+            with self._lock:
+                self._active -= 1
+                self._run_ms.append((time.monotonic() - started) * 1000)
+                self._counts["completed" if ok else "failed"] += 1
+            self._jobs.task_done()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return queue depth, job counters and latency percentiles in ms."""
+        with self._lock:
+            return {
+                "concurrency": self.concurrency,
+                "max_queue": self.max_queue,
+                "queued": self._jobs.qsize(),
+                "active": self._active,
+                **self._counts,
+                "wait_ms": _summary(self._wait_ms),
+                "run_ms": _summary(self._run_ms),
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the workers once queued jobs have been processed."""
+        for _ in self._workers:
+            self._jobs.put(None)
+        if wait:
+            for worker in self._workers:
+                worker.join()
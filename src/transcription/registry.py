@@ -0,0 +1,200 @@
+"""Process-wide registry of loaded Whisper models.
+
+Every component that needs a model asks the registry instead of calling
+``whisper.load_model`` itself, so a model is loaded at most once per process
+for each ``(name, device, compute_type)`` key.  Holders ``acquire`` and
+``release`` models; unreferenced models can be unloaded after an idle period.
+"""
+
+from __future__ import annotations
+
+import gc
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ModelKey = Tuple[str, Optional[str], Optional[str]]
+
+
+def _load_whisper(name: str, device: Optional[str], compute_type: Optional[str]) -> Any:
+    import whisper  # type: ignore
+
+    model = whisper.load_model(name) if device is None else whisper.load_model(name, device=device)
+    if compute_type == "float16" and hasattr(model, "half"):
+        model = model.half()
+    elif compute_type == "float32" and hasattr(model, "float"):
+        model = model.float()
+    return model
+
+
+def model_nbytes(model: Any) -> Optional[int]:
+    """Return the bytes held by a torch model's parameters and buffers."""
+    try:
+        tensors = list(model.parameters()) + list(model.buffers())
+    except Exception:
+        return None
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+class _Entry:
+    __slots__ = ("model", "refs", "last_used", "loaded_at", "nbytes", "lock", "loading")
+
+    def __init__(self) -> None:
+        self.model: Any = None
+        self.refs = 0
+        self.last_used = time.monotonic()
+        self.loaded_at = 0.0
+        self.nbytes: Optional[int] = None
+        # Serialises inference on the shared model across all holders
+        self.lock = threading.Lock()
+        self.loading = threading.Lock()
+
+
+class ModelRegistry:
+    """Lazily load, share and unload models keyed by name/device/compute type."""
+
+    def __init__(
+        self,
+        loader: Callable[[str, Optional[str], Optional[str]], Any] = _load_whisper,
+        idle_timeout: Optional[float] = None,
+    ) -> None:
+        self.loader = loader
+        self.idle_timeout = idle_timeout
+        self._entries: Dict[ModelKey, _Entry] = {}
+        self._lock = threading.Lock()
+        self._reaper: Optional[threading.Thread] = None
+
+    def _entry(self, key: ModelKey) -> _Entry:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry()
+            return entry
+
+    def _load(self, key: ModelKey, entry: _Entry) -> Any:
+        with entry.loading:
+            if entry.model is None:
+                start = time.monotonic()
+                entry.model = self.loader(*key)
+                entry.loaded_at = time.time()
+                entry.nbytes = model_nbytes(entry.model)
+                logger.info(
+                    "Loaded model %s on %s (%s) in %.1fs",
+                    key[0], key[1] or "default device", key[2] or "default precision",
+                    time.monotonic() - start,
+                )
+            entry.last_used = time.monotonic()
+            return entry.model
+
+    def acquire(self, name: str, device: Optional[str] = None, compute_type: Optional[str] = None) -> Any:
+        """Return the model for the key, loading it on first use.
+
+        Each call takes a reference that must be returned with :meth:`release`.
+        """
+        key = (name, device, compute_type)
+        entry = self._entry(key)
+        model = self._load(key, entry)
+        with self._lock:
+            entry.refs += 1
+        return model
+
+    def get(self, name: str, device: Optional[str] = None, compute_type: Optional[str] = None) -> Any:
+        """Return the model without taking a reference.
+
+        Suitable for short-lived use such as a single task; the model may be
+        unloaded once idle and is transparently reloaded on the next call.
+        """
+        key = (name, device, compute_type)
+        return self._load(key, self._entry(key))
+
+    def release(self, name: str, device: Optional[str] = None, compute_type: Optional[str] = None) -> None:
+        """Return a reference taken by :meth:`acquire`."""
+        with self._lock:
+            entry = self._entries.get((name, device, compute_type))
+            if entry is None or entry.refs == 0:
+                return
+            entry.refs -= 1
+            entry.last_used = time.monotonic()
+
+    @contextmanager
+    def use(self, name: str, device: Optional[str] = None, compute_type: Optional[str] = None) -> Iterator[Any]:
+        """Context manager pairing :meth:`acquire` with :meth:`release`."""
+        model = self.acquire(name, device, compute_type)
+        try:
+            yield model
+        finally:
+            self.release(name, device, compute_type)
+
+    def lock_for(self, model: Any) -> threading.Lock:
+        """Return the inference lock shared by every holder of ``model``."""
+        if model is None:
+            return threading.Lock()
+        with self._lock:
+            for entry in self._entries.values():
+                if entry.model is model:
+                    return entry.lock
+        return threading.Lock()
+
+    def unload_idle(self, max_idle: Optional[float] = None) -> List[ModelKey]:
+        """Unload unreferenced models idle for longer than ``max_idle`` seconds."""
+        max_idle = self.idle_timeout if max_idle is None else max_idle
+        if max_idle is None:
+            return []
+        now = time.monotonic()
+        unloaded = []
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if entry.model is not None and entry.refs == 0 and now - entry.last_used >= max_idle:
+                    del self._entries[key]
+                    unloaded.append(key)
+        if unloaded:
+            gc.collect()
+            for key in unloaded:
+                logger.info("Unloaded idle model %s on %s (%s)", *key)
+        return unloaded
+
+    def start_reaper(self, interval: float = 60.0) -> None:
+        """Periodically unload idle models on a daemon thread."""
+        if self._reaper is not None or self.idle_timeout is None:
+            return
+
+        def _reap() -> None:
+            while True:
+                time.sleep(interval)
+                try:
+                    self.unload_idle()
+                except Exception as exc:  # pragma: no cover - defensive
+                    logger.warning("Idle model reaper failed: %s", exc)
+
+        self._reaper = threading.Thread(target=_reap, name="model-reaper", daemon=True)
+        self._reaper.start()
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Describe resident models, their reference counts and memory use."""
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {
+                    "model": key[0],
+                    "device": key[1],
+                    "compute_type": key[2],
+                    "refs": entry.refs,
+                    "bytes": entry.nbytes,
+                    "idle_seconds": round(now - entry.last_used, 1),
+                    "loaded_at": entry.loaded_at,
+                }
+                for key, entry in self._entries.items()
+                if entry.model is not None
+            ]
+
+
+_registry = ModelRegistry()
+
+
+def get_registry() -> ModelRegistry:
+    """Return the process-wide model registry."""
+    return _registry
@@ -0,0 +1,135 @@
+"""Incremental transcription over a rolling audio window.
+
+A :class:`StreamingSession` accumulates PCM for one live stream and
+re-transcribes the part of it that has not been committed yet.  Words are
+committed once two consecutive hypotheses agree on them (stable-prefix
+commit), so words straddling a chunk boundary are decoded with their full
+context instead of being cut in half.  Committed audio is dropped from the
+window, which keeps the cost of every decode bounded by ``max_window``.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from typing import Dict, List
+
+import numpy as np
+
+from .audio import SAMPLE_RATE
+from .base import TranscriptionService, Word
+
+logger = logging.getLogger(__name__)
+
+
+def _normalize(word: str) -> str:
+    return word.strip().lower().strip(".,!?;:\"'")
+
+
+class StreamingSession:
+    """Rolling-window transcription state for one live audio stream.
+
+    ``push`` returns a list of events.  ``{"text": ..., "final": True}``
+    carries newly committed text that will not change again, while
+    ``{"text": ..., "final": False}`` carries the current unstable tail and
+    replaces any previous partial.
+    """
+
+    def __init__(
+        self,
+        transcriber: TranscriptionService,
+        min_chunk_seconds: float = 0.5,
+        max_window_seconds: float = 15.0,
+    ) -> None:
+        self.transcriber = transcriber
+        self.min_chunk = int(min_chunk_seconds * SAMPLE_RATE)
+        self.max_window = int(max_window_seconds * SAMPLE_RATE)
+        self.lock = threading.Lock()
+        self._buffer = np.zeros(0, dtype=np.float32)
+        self._pending = 0
+        self._committed = 0
+        self._hypothesis: List[Word] = []
+
+    @property
+    def buffered_seconds(self) -> float:
+        return len(self._buffer) / SAMPLE_RATE
+
+    def append(self, audio: np.ndarray) -> None:
+        """Add ``audio`` to the window without decoding it."""
+        with self.lock:
+            self._buffer = np.concatenate([self._buffer, audio.astype(np.float32, copy=False)])
+            self._pending += len(audio)
+
+    def push(self, audio: np.ndarray) -> List[Dict]:
+        """Append ``audio`` and return the events produced by decoding."""
+        self.append(audio)
+        return self.step()
+
+    def step(self) -> List[Dict]:
+        """Re-decode the uncommitted tail if enough new audio has arrived."""
+        with self.lock:
+            if self._pending < self.min_chunk:
+                return []
+            self._pending = 0
+            words = self.transcriber.transcribe_words(self._buffer)
+            if words is None:
+                return []
+            hypothesis = words[self._committed:]
+
+            agreed = 0
+            for old, new in zip(self._hypothesis, hypothesis):
+                if _normalize(old.text) != _normalize(new.text):
+                    break
+                agreed += 1
+            commit = hypothesis[:agreed]
+            tentative = hypothesis[agreed:]
+
+            if len(self._buffer) >= self.max_window:
+                # The window is full: commit everything so it can be dropped.
+                commit, tentative = hypothesis, []
+            self._committed += len(commit)
+            self._hypothesis = tentative
+            self._trim(words[: self._committed])
+            if len(self._buffer) >= self.max_window:
+                # Nothing could be committed (e.g. silence); keep only the
+                # newest audio so the window stays bounded.
+                self._buffer = self._buffer[-self.min_chunk:]
+                self._committed = 0
+                self._hypothesis = []
+            return self._events(commit, tentative)
+
+    def flush(self) -> List[Dict]:
+        """Decode whatever is buffered and commit it as final text."""
+        with self.lock:
+            commit: List[Word] = []
+            if len(self._buffer):
+                words = self.transcriber.transcribe_words(self._buffer) or []
+                commit = words[self._committed:]
+            self._buffer = np.zeros(0, dtype=np.float32)
+            self._pending = 0
+            self._committed = 0
+            self._hypothesis = []
+            return self._events(commit, [])
+
+    def _trim(self, committed: List[Word]) -> None:
+        """Drop committed audio from the front of the window."""
+        if not committed:
+            return
+        end = committed[-1].end
+        if end is not None:
+            cut = min(int(end * SAMPLE_RATE), len(self._buffer))
+            self._buffer = self._buffer[cut:]
+            self._committed = 0
+        elif len(self._buffer) >= self.max_window:
+            # Without word timings the only safe cut is the whole window.
+            self._buffer = np.zeros(0, dtype=np.float32)
+            self._committed = 0
+
+    @staticmethod
+    def _events(commit: List[Word], tentative: List[Word]) -> List[Dict]:
+        events = []
+        if commit:
+            events.append({"text": " ".join(w.text for w in commit), "final": True})
+        if tentative:
+            events.append({"text": " ".join(w.text for w in tentative), "final": False})
+        return events
@@ -0,0 +1,116 @@
+"""Energy-based voice activity detection ahead of Whisper.
+
+Live chunks and short uploads are often mostly silence.  Whisper still pays
+for a full window on them and tends to hallucinate text from noise, so
+:class:`VoiceActivityFilter` drops silent frames before audio is queued for
+transcription.  Speech is detected per frame from its RMS level; short
+blips are ignored and every speech region is padded so word onsets and
+endings are not clipped.  Skipped audio is counted per session.
+"""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .audio import SAMPLE_RATE
+
+
+def _runs(mask: np.ndarray) -> List[Tuple[int, int]]:
+    """Return ``[start, end)`` index ranges where ``mask`` is true."""
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return list(zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)))
+
+
+class VoiceActivityFilter:
+    """Trim silence from 16 kHz mono PCM and count what was skipped."""
+
+    def __init__(
+        self,
+        threshold_db: float = -45.0,
+        frame_ms: float = 30.0,
+        min_speech_ms: float = 90.0,
+        padding_ms: float = 200.0,
+        max_sessions: int = 256,
+    ) -> None:
+        self.threshold_db = float(threshold_db)
+        self.frame = max(1, int(SAMPLE_RATE * frame_ms / 1000))
+        self.min_speech = max(1, int(round(min_speech_ms / frame_ms)))
+        self.padding = max(0, int(round(padding_ms / frame_ms)))
+        self.max_sessions = max(1, int(max_sessions))
+        self._lock = threading.Lock()
+        self._sessions: "OrderedDict[str, Dict[str, float]]" = OrderedDict()
+        self._total = self._counters()
+
+    @staticmethod
+    def _counters() -> Dict[str, float]:
+        return {"chunks": 0, "skipped_chunks": 0, "seconds": 0.0, "skipped_seconds": 0.0}
+
+    def speech_regions(self, audio: np.ndarray) -> List[Tuple[int, int]]:
+        """Return ``[start, end)`` sample ranges of ``audio`` containing speech."""
+        if audio.size == 0:
+            return []
+        n_frames = -(-len(audio) // self.frame)
+        frames = np.zeros(n_frames * self.frame, dtype=np.float32)
+        frames[: len(audio)] = audio
+        rms = np.sqrt(np.mean(np.square(frames.reshape(n_frames, self.frame)), axis=1))
+        speech = 20 * np.log10(rms + 1e-10) > self.threshold_db
+
+        # Ignore blips (clicks, bumps) shorter than min_speech frames
+        for start, end in _runs(speech):
+            if end - start < self.min_speech:
+                speech[start:end] = False
+        # Pad every remaining region on both sides
+        if self.padding:
+            padded = speech.copy()
+            for start, end in _runs(speech):
+                padded[max(0, start - self.padding):end + self.padding] = True
+            speech = padded
+        return [
+            (int(start) * self.frame, min(int(end) * self.frame, len(audio)))
+            for start, end in _runs(speech)
+        ]
+
+    def trim(self, audio: np.ndarray) -> np.ndarray:
+        """Return only the speech in ``audio``; empty if there is none."""
+        regions = self.speech_regions(audio)
+        if not regions:
+            return audio[:0]
+        if regions == [(0, len(audio))]:
+            return audio
+        return np.concatenate([audio[start:end] for start, end in regions])
+
+    def filter(self, audio: np.ndarray, session: Optional[str] = None) -> np.ndarray:
+        """Trim ``audio`` and record the skipped seconds under ``session``."""
+        speech = self.trim(audio)
+        seconds = len(audio) / SAMPLE_RATE
+        skipped = (len(audio) - len(speech)) / SAMPLE_RATE
+        with self._lock:
+            buckets = [self._total]
+            if session is not None:
+                counters = self._sessions.pop(session, None) or self._counters()
+                self._sessions[session] = counters
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+                buckets.append(counters)
+            for counters in buckets:
+                counters["chunks"] += 1
+                counters["skipped_chunks"] += int(speech.size == 0)
+                counters["seconds"] += seconds
+                counters["skipped_seconds"] += skipped
+        return speech
+
+    def stats(self) -> Dict[str, Dict]:
+        """Return skipped-audio counters overall and for recent sessions."""
+
+        def _rounded(counters: Dict[str, float]) -> Dict[str, float]:
+            return {key: round(value, 3) for key, value in counters.items()}
+
+        with self._lock:
+            return {
+                "total": _rounded(self._total),
+                "sessions": {key: _rounded(value) for key, value in self._sessions.items()},
+            }
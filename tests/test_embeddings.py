@@ -0,0 +1,124 @@
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.embeddings import EmbeddingService, TextBackend, VoiceBackend  # noqa: E402
+
+
+class LengthBackend:
+    def __init__(self):
+        self.batches = []
+
+    def embed_many(self, items):
+        self.batches.append(list(items))
+        return [np.array([len(item)], dtype=np.float32) for item in items]
+
+
+def test_embed_many_batches_and_reports_throughput():
+    backend = LengthBackend()
+    service = EmbeddingService({"text": backend}, max_workers=2)
+    vectors = service.embed_many("text", ["a", "bbb", "cc"])
+    assert [v[0] for v in vectors] == [1, 3, 2]
+    assert backend.batches == [["a", "bbb", "cc"]]
+    assert service.embed("text", "dddd")[0] == 4
+    assert asyncio.run(service.aembed_many("text", ["ee"]))[0][0] == 2
+
+    stats = service.stats()
+    assert stats["pending"] == 0
+    assert stats["backends"]["text"]["batches"] == 3
+    assert stats["backends"]["text"]["items"] == 5
+    assert stats["backends"]["text"]["items_per_second"] > 0
+    with pytest.raises(KeyError):
+        service.embed("face", b"")
+    service.shutdown()
+
+
+def test_failed_batches_are_counted_and_raised():
+    class Broken:
+        def embed_many(self, items):
+            raise ValueError("boom")
+
+    service = EmbeddingService({"face": Broken()})
+    with pytest.raises(ValueError):
+        service.embed_many("face", [b"x", b"y"])
+    assert service.stats()["backends"]["face"]["failures"] == 2
+    service.shutdown()
+
+
+def test_routed_kind_runs_on_outside_executor_and_keeps_its_refusals():
+    from concurrent.futures import ThreadPoolExecutor
+
+    class Refusing:
+        name = "full"
+
+        def submit(self, fn, *args):
+            raise RuntimeError("saturated")
+
+    backend = LengthBackend()
+    service = EmbeddingService({"face": backend, "text": LengthBackend()})
+    outside = ThreadPoolExecutor(1, thread_name_prefix="outside")
+    service.route("face", outside)
+    assert service.embed_many("face", [b"ab"])[0][0] == 2
+    assert service.stats()["backends"]["face"]["items"] == 1
+
+    service.route("face", Refusing())
+    with pytest.raises(RuntimeError):
+        service.embed_many("face", [b"x"])
+    stats = service.stats()
+    assert stats["routes"] == {"face": "full"} and stats["pending"] == 0
+    assert backend.batches == [[b"ab"]]
+    outside.shutdown()
+    service.shutdown()
+
+
+def test_text_function_and_voice_backend():
+    from src.memory.vector_index import HashingEmbedding
+
+    service = EmbeddingService({"text": TextBackend(HashingEmbedding)})
+    embed = service.function("text")
+    vectors = embed(["hello world", "hello"])
+    assert len(vectors) == 2 and vectors[0].shape == (384,)
+    assert embed.name() == "hashing-384"
+
+    made = []
+
+    class Profiler:
+        def __init__(self):
+            made.append(threading.get_ident())
+
+        def enroll(self, path):
+            return Path(path).read_bytes()[:3]
+
+    voice = VoiceBackend(Profiler)
+    assert [v.tobytes() for v in voice.embed_many([b"abcdef", b"xyz"])] == [b"abc", b"xyz"]
+    assert len(made) == 1
+
+
+def test_text_backend_loads_its_model_once_across_threads():
+    from src.memory.vector_index import HashingEmbedding
+
+    loads = []
+
+    def factory():
+        loads.append(1)
+        time.sleep(0.05)
+        return HashingEmbedding()
+
+    backend = TextBackend(factory)
+    threads = [threading.Thread(target=backend.name) for _ in range(4)]
+    threads += [threading.Thread(target=backend.embed_many, args=(["hi"],)) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(loads) == 1
+    import pickle
+
+    assert pickle.loads(pickle.dumps(TextBackend(HashingEmbedding))).name() == "hashing-384"
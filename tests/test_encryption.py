@@ -1,4 +1,5 @@
 import base64
+import time
 import importlib
 import sys
 from pathlib import Path
@@ -43,3 +44,120 @@ def test_bytes_round_trip(encryption_module):
     encrypted = enc.encrypt_bytes(payload)
     decrypted = enc.decrypt_bytes(encrypted)
     assert decrypted == payload
+
+
+def test_chunked_file_streams_and_decrypts_ranges(tmp_path, encryption_module):
+    enc = encryption_module
+    if not enc._crypto_available:
+        pytest.skip("cryptography not installed")
+    data = bytes(range(256)) * 41  # 10496 bytes: several chunks, partial tail
+    original = tmp_path / "clip.wav"
+    original.write_bytes(data)
+    enc_path = tmp_path / "clip.enc"
+    dec_path = tmp_path / "clip.dec"
+
+    enc.encrypt_file(str(original), str(enc_path), chunk_size=1024)
+    assert enc_path.read_bytes().startswith(enc.MAGIC)
+    assert enc.plaintext_size(str(enc_path)) == len(data)
+    enc.decrypt_file(str(enc_path), str(dec_path))
+    assert dec_path.read_bytes() == data
+    for offset, length in [(0, 10), (1000, 100), (3072, 1024), (10400, 500), (20000, 5)]:
+        assert enc.decrypt_range(str(enc_path), offset, length) == data[offset:offset + length]
+
+    # Dropping the final chunk is detected rather than yielding a short file
+    truncated = tmp_path / "truncated.enc"
+    truncated.write_bytes(enc_path.read_bytes()[: -(len(data) % 1024 + 16)])
+    with pytest.raises(Exception):
+        enc.decrypt_file(str(truncated), str(tmp_path / "out"))
+    assert not (tmp_path / "out").exists()
+
+
+def test_legacy_blobs_still_decrypt(tmp_path, encryption_module):
+    enc = encryption_module
+    if not enc._crypto_available:
+        pytest.skip("cryptography not installed")
+    nonce = b"\x01" * 12
+    legacy = tmp_path / "legacy.enc"
+    legacy.write_bytes(nonce + enc.AESGCM(enc.AES_KEY).encrypt(nonce, b"old format", None))
+    out = tmp_path / "legacy.dec"
+    enc.decrypt_file(str(legacy), str(out))
+    assert out.read_bytes() == b"old format"
+    assert enc.decrypt_range(str(legacy), 4, 3) == b"for"
+
+    empty = tmp_path / "empty"
+    empty.write_bytes(b"")
+    enc.encrypt_file(str(empty), str(tmp_path / "empty.enc"))
+    enc.decrypt_file(str(tmp_path / "empty.enc"), str(out))
+    assert out.read_bytes() == b""
+
+
+def test_decrypt_buffer_matches_decrypt_file(tmp_path, encryption_module):
+    enc = encryption_module
+    original = tmp_path / "clip.wav"
+    original.write_bytes(bytes(range(256)) * 700)
+    enc.encrypt_file(str(original), str(tmp_path / "clip.enc"), chunk_size=4096)
+    ciphertext = (tmp_path / "clip.enc").read_bytes()
+
+    assert enc.decrypt_buffer(ciphertext) == original.read_bytes()
+    with open(tmp_path / "clip.enc", "rb") as fh:
+        assert enc.decrypt_buffer(fh) == original.read_bytes()
+    # Unencrypted uploads pass through like they do for decrypt_file
+    assert enc.decrypt_buffer(b"plain jpeg") == b"plain jpeg"
+
+
+def test_key_rotation_reencrypts_and_resumes(tmp_path, monkeypatch):
+    old = _reload_encryption(monkeypatch)
+    if not old._crypto_available:
+        pytest.skip("cryptography not installed")
+    media = tmp_path / "media" / "u1"
+    media.mkdir(parents=True)
+    face = tmp_path / "uploads" / "face"
+    face.mkdir(parents=True)
+    plain = tmp_path / "voice.wav"
+    plain.write_bytes(b"voice sample" * 1000)
+    old.encrypt_file(str(plain), str(media / "voice.enc"))
+    (face / "front.enc").write_bytes(old.encrypt_bytes(b"jpeg bytes"))
+
+    new_key = base64.urlsafe_b64encode(b"2" * 32).decode()
+    new_fernet = base64.urlsafe_b64encode(b"3" * 32).decode()
+    monkeypatch.setenv("AES_KEYS", base64.urlsafe_b64encode(b"0" * 32).decode())
+    monkeypatch.setenv("FERNET_KEYS", base64.urlsafe_b64encode(b"1" * 32).decode())
+    monkeypatch.setenv("AES_KEY", new_key)
+    monkeypatch.setenv("FERNET_KEY", new_fernet)
+    sys.modules.pop("app.utils.encryption", None)
+    sys.modules.pop("app.utils.key_rotation", None)
+    enc = importlib.import_module("app.utils.encryption")
+    rotation = importlib.import_module("app.utils.key_rotation")
+
+    # Old ciphertexts keep decrypting until rotation finishes
+    assert enc.needs_rotation(str(media / "voice.enc"))
+    assert enc.decrypt_range(str(media / "voice.enc"), 0, 5) == b"voice"
+    roots = [str(tmp_path / "media"), str(face)]
+    checkpoint = str(tmp_path / "rotation.checkpoint")
+    report = rotation.rotate_all(roots, workers=2, checkpoint_path=checkpoint, include_db=False)
+    assert report["rotated"] == 2 and report["failed"] == 0
+    assert enc.file_key_id(str(media / "voice.enc")) == enc.key_id(enc.AES_KEY).hex()
+    assert not enc.bytes_need_rotation((face / "front.enc").read_bytes())
+
+    again = rotation.rotate_all(roots, checkpoint_path=checkpoint, include_db=False)
+    assert again["resumed"] == 2 and again["rotated"] == 0
+
+    # With the old keys gone everything still decrypts
+    monkeypatch.delenv("AES_KEYS")
+    monkeypatch.delenv("FERNET_KEYS")
+    sys.modules.pop("app.utils.encryption", None)
+    enc = importlib.import_module("app.utils.encryption")
+    enc.decrypt_file(str(media / "voice.enc"), str(tmp_path / "out.wav"))
+    assert (tmp_path / "out.wav").read_bytes() == plain.read_bytes()
+    assert enc.decrypt_bytes((face / "front.enc").read_bytes()) == b"jpeg bytes"
+
+
+def test_throttle_paces_bytes(monkeypatch):
+    from app.utils.key_rotation import Throttle
+
+    throttle = Throttle(rate=1000)
+    start = time.monotonic()
+    throttle.consume(0)
+    throttle.consume(100)
+    throttle.consume(100)
+    assert time.monotonic() - start >= 0.09
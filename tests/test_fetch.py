@@ -0,0 +1,78 @@
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.utils.fetch import Fetcher  # noqa: E402
+
+
+class SlowServer:
+    """Mock upload server that records how many requests overlap."""
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def _enter(self):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+
+    def _leave(self, request):
+        with self.lock:
+            self.active -= 1
+        if request.url.path == "/missing":
+            return httpx.Response(404)
+        return httpx.Response(200, content=request.url.path.encode())
+
+    def __call__(self, request):
+        self._enter()
+        time.sleep(self.delay)
+        return self._leave(request)
+
+
+class AsyncSlowServer(SlowServer):
+    async def __call__(self, request):
+        self._enter()
+        await asyncio.sleep(self.delay)
+        return self._leave(request)
+
+
+def test_fetch_all_sync_runs_in_parallel_and_keeps_order():
+    server = SlowServer()
+    fetcher = Fetcher(max_concurrency=2, transport=httpx.MockTransport(server))
+    urls = [f"http://tus/{name}" for name in ("front", "left", "right")]
+    assert fetcher.fetch_all_sync(urls) == [b"/front", b"/left", b"/right"]
+    assert server.peak == 2
+    assert fetcher.stats()["requests"] == 3
+    with pytest.raises(httpx.HTTPStatusError):
+        fetcher.fetch_all_sync(["http://tus/front", "http://tus/missing"])
+    assert fetcher.stats()["failures"] == 1
+    fetcher.close()
+
+
+def test_fetch_all_async_is_bounded_and_reports_failures():
+    server = AsyncSlowServer()
+    fetcher = Fetcher(max_concurrency=3, transport=httpx.MockTransport(server))
+    urls = [f"http://tus/{i}" for i in range(6)] + ["http://tus/missing"]
+
+    async def run():
+        try:
+            return await fetcher.fetch_all(urls, return_exceptions=True)
+        finally:
+            await fetcher.aclose()
+
+    started = time.perf_counter()
+    bodies = asyncio.run(run())
+    assert time.perf_counter() - started < 0.3
+    assert bodies[:6] == [f"/{i}".encode() for i in range(6)]
+    assert isinstance(bodies[6], httpx.HTTPStatusError)
+    assert server.peak == 3
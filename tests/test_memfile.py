@@ -0,0 +1,17 @@
+import os
+
+from src import memfile
+
+
+def test_memory_path_holds_data_and_cleans_up():
+    with memfile.memory_path(b"RIFF wav bytes", suffix=".wav") as path:
+        with open(path, "rb") as fh:
+            assert fh.read() == b"RIFF wav bytes"
+
+
+def test_memory_path_without_memfd(monkeypatch):
+    monkeypatch.setattr(memfile, "_memfd_available", lambda: False)
+    with memfile.memory_path(memoryview(b"x" * 100000), suffix=".jpg") as path:
+        assert path.endswith(".jpg")
+        assert os.path.getsize(path) == 100000
+    assert not os.path.exists(path)
@@ -39,3 +39,372 @@ def test_memory_add_and_search_top_k(tmp_path):
 
     results = mem.search("hello", top_k=1)
     assert results == ["hello world"]
+
+
+def test_ingest_queue_batches_and_flushes(tmp_path):
+    from src.memory.ingest import IngestQueue
+
+    class RecordingMemory:
+        def __init__(self):
+            self.batches = []
+
+        def add_many(self, texts, metadatas):
+            self.batches.append(list(texts))
+            self.metadatas = metadatas
+
+    memory = RecordingMemory()
+    ingest = IngestQueue(memory, flush_interval=0.2, max_batch=3)
+    for text in ["a", "b", "c", "d", ""]:
+        ingest.put(text)
+    assert ingest.flush(timeout=5)
+    assert memory.batches[0] == ["a", "b", "c"]
+    assert sum(memory.batches, []) == ["a", "b", "c", "d"]
+
+    ingest.put("e", {"speaker": "A"})
+    ingest.close()
+    assert memory.batches[-1] == ["e"]
+    assert memory.metadatas == [{"speaker": "A"}]
+    stats = ingest.stats()
+    assert stats["written"] == 5 and stats["queued"] == 0
+    assert ingest.put("late") is False
+
+
+def test_memory_add_many_uses_one_collection_call(tmp_path, monkeypatch):
+    import src.memory.memory as memory_mod
+    monkeypatch.setattr(memory_mod, "chromadb", None)
+
+    mem = Memory(persist_directory=str(tmp_path))
+    calls = []
+    original = mem.collection.add
+    mem.collection.add = lambda documents, ids, metadatas: calls.append(documents) or original(
+        documents, ids, metadatas
+    )
+    assert len(mem.add_many(["one", "", "two"])) == 2
+    assert calls == [["one", "two"]]
+
+
+def test_search_caches_embeddings_and_results(tmp_path, monkeypatch):
+    import src.memory.memory as memory_mod
+    monkeypatch.setattr(memory_mod, "chromadb", None)
+
+    mem = Memory(persist_directory=str(tmp_path), result_ttl=60)
+    embedded = []
+    queries = []
+    mem._embed = lambda texts: embedded.extend(texts) or [[0.0] * 3 for _ in texts]
+
+    def query(query_embeddings, n_results=5, **kwargs):
+        queries.append(n_results)
+        return {"documents": [get()["documents"][:n_results]]}
+
+    get = mem.collection.get
+
+    mem.collection.query = query
+    mem.add("first")
+    assert mem.search("hello") == ["first"]
+    assert mem.search("hello") == ["first"]
+    assert len(queries) == 1
+
+    # A write bumps the generation; the embedding is still reused
+    mem.add("second")
+    assert mem.search("hello") == ["first", "second"]
+    assert len(queries) == 2
+    assert embedded == ["hello"]
+    stats = mem.cache_stats()
+    assert stats["result_hits"] == 1 and stats["embedding_hits"] == 1
+
+
+def test_search_filters_and_pages(tmp_path, monkeypatch):
+    import src.memory.memory as memory_mod
+    monkeypatch.setattr(memory_mod, "chromadb", None)
+
+    mem = Memory(persist_directory=str(tmp_path))
+    mem.add_many(
+        ["a1", "a2", "b1", "a3"],
+        [
+            {"session": "2024-05-01", "speaker": "A", "user_id": "u1"},
+            {"session": "2024-05-02", "speaker": "A", "user_id": "u1"},
+            {"session": "2024-05-02", "speaker": "B", "user_id": "u2"},
+            {"session": "2024-05-03", "speaker": "A", "user_id": "u1"},
+        ],
+    )
+    assert memory_mod.build_where(speaker="A", date_from="2024-05-02") == {
+        "$and": [{"speaker": "A"}, {"date": {"$gte": 20240502}}]
+    }
+    assert mem.search("x", speaker="A", date_from="2024-05-02") == ["a2", "a3"]
+    assert mem.search("x", session="2024-05-02", user_id="u2") == ["b1"]
+
+    first = mem.search_page("x", limit=2, user_id="u1")
+    assert first["results"] == ["a1", "a2"] and first["next_cursor"] == "2"
+    assert first["metadatas"][0]["date"] == 20240501
+    second = mem.search_page("x", limit=2, cursor=first["next_cursor"], user_id="u1")
+    assert second["results"] == ["a3"] and second["next_cursor"] is None
+
+
+def test_split_text_windows_overlap_and_end_on_sentences():
+    from src.memory.chunking import count_tokens, split_text
+
+    text = " ".join(f"Sentence number {i} has words." for i in range(12))
+    chunks = split_text(text, max_tokens=20, overlap=7)
+    assert all(count_tokens(c) <= 20 for c in chunks)
+    assert all(c.endswith(".") for c in chunks)
+    # Each window repeats the last sentence of the previous one
+    for prev, nxt in zip(chunks, chunks[1:]):
+        assert nxt.startswith(prev.rsplit(". ", 1)[-1])
+    assert chunks[-1].endswith("Sentence number 11 has words.")
+    assert split_text("short text") == ["short text"]
+
+
+def test_add_many_chunks_and_skips_duplicates(tmp_path, monkeypatch):
+    import src.memory.memory as memory_mod
+    monkeypatch.setattr(memory_mod, "chromadb", None)
+
+    mem = Memory(persist_directory=str(tmp_path), chunk_tokens=20, chunk_overlap=7)
+    long_text = " ".join(f"Sentence number {i} has words." for i in range(12))
+    ids = mem.add_many([long_text, "hello  world"], [{"session": "2024-05-01"}, None])
+    assert len(ids) > 2
+    first = mem.collection.get(ids=ids[:1])["metadatas"][0]
+    assert first["chunk"] == 0
+    assert first["chunks"] == len(ids) - 1
+    # Same content (modulo whitespace) again: nothing new is stored
+    assert mem.add_many(["hello world", long_text], [None, {"session": "2024-05-01"}]) == []
+    assert mem.add_many(["hello world"], [{"user_id": "u1"}]) != []
+
+
+def test_identical_text_in_other_sessions_is_kept(tmp_path, monkeypatch):
+    import src.memory.memory as memory_mod
+    monkeypatch.setattr(memory_mod, "chromadb", None)
+
+    mem = Memory(persist_directory=str(tmp_path))
+    assert mem.add_many(["Okay."], [{"session": "2024-05-01", "speaker": "A"}])
+    assert mem.add_many(["Okay."], [{"session": "2024-05-02", "speaker": "B"}])
+    assert mem.add_many(["Okay."], [{"session": "2024-05-02", "speaker": "B"}]) == []
+    assert mem.search("Okay", session="2024-05-02") == ["Okay."]
+    assert mem.search("Okay", speaker="B") == ["Okay."]
+    assert mem.search("Okay", speaker="A", session="2024-05-01") == ["Okay."]
+
+
+def test_bm25_index_ranks_and_filters():
+    from src.memory.bm25 import BM25Index, reciprocal_rank_fusion
+
+    index = BM25Index()
+    index.add("a", "the budget meeting with Zorblat", {"speaker": "A"})
+    index.add("b", "the budget review", {"speaker": "B"})
+    index.add("c", "weekend plans", {"speaker": "A"})
+    index.add("a", "ignored duplicate")
+    assert [d for d, _ in index.search("Zorblat budget")] == ["a", "b"]
+    assert [d for d, _ in index.search("budget", predicate=lambda m: m["speaker"] == "B")] == ["b"]
+    assert index.stats()["documents"] == 3
+    fused = reciprocal_rank_fusion([["x", "y"], ["y", "z"]], k=60)
+    assert fused[0][0] == "y"
+
+
+def test_hybrid_search_finds_keyword_matches(tmp_path, monkeypatch):
+    import src.memory.memory as memory_mod
+    monkeypatch.setattr(memory_mod, "chromadb", None)
+
+    mem = Memory(persist_directory=str(tmp_path), search_mode="hybrid")
+    coll = mem.collection
+
+    def query(query_embeddings, n_results=5, where=None, **kwargs):
+        # A vector ranking that knows nothing: insertion order
+        stored = coll.get(where=where)
+        return {field: [values[:n_results]] for field, values in stored.items()}
+
+    coll.query = query
+    assert mem.wait_lexical(timeout=5)
+    mem.add_many([f"filler entry {i}" for i in range(10)])
+    mem.add("lunch with Zorblat on friday", {"speaker": "A"})
+    assert "lunch with Zorblat on friday" not in mem.search("Zorblat", top_k=3, mode="vector")
+    assert mem.search("Zorblat", top_k=3)[0] == "lunch with Zorblat on friday"
+    # Writes after the index is built are indexed too
+    mem.add("Zorblat called back", {"speaker": "B"})
+    assert mem.search("Zorblat called", top_k=1, speaker="B") == ["Zorblat called back"]
+    stats = mem.search_stats()
+    assert stats["mode"] == "hybrid"
+    assert stats["bm25"]["documents"] == 12
+    assert stats["latency_ms"]["hybrid"]["count"] == 2
+    with pytest.raises(ValueError):
+        mem.search("x", mode="fuzzy")
+    mem.close()
+
+
+def test_lexical_index_builds_in_background_and_picks_up_other_writers(tmp_path, monkeypatch):
+    import src.memory.memory as memory_mod
+    monkeypatch.setattr(memory_mod, "chromadb", None)
+
+    writer = Memory(persist_directory=str(tmp_path))
+    writer.add_many([f"filler entry {i}" for i in range(5)] + ["call Zorblat tomorrow"])
+    reader = Memory(persist_directory=str(tmp_path), lexical_refresh=1.0)
+    assert reader._bm25 is None  # vector mode builds nothing
+    # Before the index exists hybrid answers with the vector ranking
+    reader.search("Zorblat", mode="hybrid")
+    assert reader.wait_lexical(timeout=5)
+    assert reader.search_stats()["bm25"]["documents"] == 6
+    writer.add("Zorblat phoned back")
+    reader._sync_lexical()
+    assert reader.search_stats()["bm25"]["documents"] == 7
+    reader.close()
+
+
+def test_numpy_collection_repairs_torn_records(tmp_path):
+    from src.memory.vector_index import NumpyCollection
+
+    coll = NumpyCollection(tmp_path)
+    coll.add(["alpha note", "beta note"], ["a", "b"])
+    with open(tmp_path / "transcripts.jsonl", "a", encoding="utf-8") as fh:
+        fh.write('{"id": "c", "docum')  # crash mid-write
+    reopened = NumpyCollection(tmp_path)
+    assert reopened.ids == ["a", "b"]
+    reopened.add(["delta note"], ["d"])
+    again = NumpyCollection(tmp_path)
+    assert again.ids == ["a", "b", "d"]
+    assert again.query(query_texts=["delta note"], n_results=1)["ids"] == [["d"]]
+
+
+def test_numpy_collections_share_a_directory(tmp_path):
+    from src.memory.vector_index import NumpyCollection
+
+    api, worker = NumpyCollection(tmp_path), NumpyCollection(tmp_path)
+    api.add(["budget meeting notes"], ["a"])
+    worker.add(["weekend hiking plans"], ["b"])
+    api.add(["dentist appointment"], ["c"])
+    worker.add(["budget meeting notes"], ["a"])  # stored by the other process
+    for coll in (api, worker, NumpyCollection(tmp_path)):
+        assert coll.count() == 3
+        for text, doc_id in [("weekend hiking plans", "b"), ("dentist appointment", "c")]:
+            assert coll.query(query_texts=[text], n_results=1)["ids"] == [[doc_id]]
+
+
+def test_numpy_collection_ranks_filters_and_persists(tmp_path, monkeypatch):
+    import src.memory.vector_index as vector_index
+
+    monkeypatch.setattr(vector_index, "_INITIAL_CAPACITY", 4)
+    coll = vector_index.NumpyCollection(tmp_path)
+    texts = [f"filler note number {i}" for i in range(8)] + ["the quarterly budget review"]
+    coll.add(texts, [f"id{i}" for i in range(9)], [{"n": i} for i in range(9)])
+    coll.add(["duplicate"], ["id0"])
+    assert coll.count() == 9
+    assert coll._vectors.shape[0] == 16
+
+    hit = coll.query(query_texts=["budget review"], n_results=2)
+    assert hit["ids"][0][0] == "id8"
+    assert hit["distances"][0][0] < hit["distances"][0][1]
+    filtered = coll.query(query_texts=["budget review"], n_results=3, where={"n": {"$lte": 1}})
+    assert sorted(filtered["ids"][0]) == ["id0", "id1"]
+
+    reopened = vector_index.NumpyCollection(tmp_path)
+    assert reopened.count() == 9
+    assert reopened.get(ids=["id8"])["documents"] == ["the quarterly budget review"]
+    assert reopened.query(query_texts=["budget review"], n_results=1)["ids"] == [["id8"]]
+
+
+def test_numpy_collection_int8_reranks_and_requantizes(tmp_path):
+    import numpy as np
+    from src.memory.vector_index import NumpyCollection
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((200, 16)).astype(np.float32)
+    ids = [str(i) for i in range(200)]
+    exact = NumpyCollection(tmp_path / "f32")
+    exact.add(ids, ids, embeddings=vectors)
+    compact = NumpyCollection(tmp_path / "f32", quantization="int8", rerank=4)
+    stats = compact.stats()
+    assert stats["scanned_bytes_per_vector"] == 16 + 4
+    assert stats["stored_bytes_per_vector"] == 16 * 4 + 16 + 4
+    assert exact.stats()["stored_bytes_per_vector"] == exact.stats()["scanned_bytes_per_vector"] == 16 * 4
+    assert stats["records_bytes"] > 0
+
+    class Rows:
+        # Records which float32 rows a query reads
+        def __init__(self, matrix):
+            self.matrix, self.read = matrix, []
+
+        def __getitem__(self, index):
+            self.read.append(len(np.arange(len(self.matrix))[index]))
+            return self.matrix[index]
+
+    full = compact._vectors = Rows(compact._vectors)
+    for query in vectors[:20] + 0.1:
+        want = exact.query(query_embeddings=[query], n_results=5)
+        got = compact.query(query_embeddings=[query], n_results=5)
+        assert got["ids"] == want["ids"]
+        assert np.allclose(got["distances"], want["distances"], atol=1e-5)
+    # Only the 5 * rerank shortlist is read in full precision
+    assert full.read == [20] * 20
+
+
+def test_chroma_store_embeds_through_the_shared_service(tmp_path, monkeypatch):
+    import types
+    import src.memory.memory as memory_mod
+    from src.embeddings.service import EmbeddingFunction
+
+    opened = {}
+
+    class FakeClient:
+        def __init__(self, path=None):
+            opened["client"] = "persistent" if path else "ephemeral"
+
+        def get_or_create_collection(self, name, embedding_function=None):
+            opened["embedding_function"] = embedding_function
+            return vector_index.NumpyCollection(tmp_path, embedding_function)
+
+    from src.memory import vector_index
+
+    fake = types.SimpleNamespace(PersistentClient=FakeClient, EphemeralClient=FakeClient)
+    monkeypatch.setattr(memory_mod, "chromadb", fake)
+    mem = Memory(persist_directory=str(tmp_path))
+    assert isinstance(opened["embedding_function"], EmbeddingFunction)
+    # Without MiniLM the hashed vectors must not be persisted
+    assert opened["client"] == "ephemeral"
+    mem.add("shared service embeddings")
+    assert mem.search("shared service") == ["shared service embeddings"]
+
+
+def test_numpy_store_stays_authoritative_after_quantization_is_turned_off(tmp_path, monkeypatch):
+    import types
+    import src.memory.memory as memory_mod
+
+    class NoChroma:
+        def __init__(self, path=None):
+            raise AssertionError("Chroma must not be opened over a NumPy store")
+
+    fake = types.SimpleNamespace(PersistentClient=NoChroma, EphemeralClient=NoChroma)
+    monkeypatch.setattr(memory_mod, "chromadb", fake)
+    monkeypatch.setattr(Memory, "_import_chroma", lambda self, path: None)
+    quantized = Memory(persist_directory=str(tmp_path), quantization="int8")
+    quantized.add("written while quantized")
+
+    plain = Memory(persist_directory=str(tmp_path))
+    assert plain.collection.quantization is None
+    assert plain.search("written while quantized") == ["written while quantized"]
+
+
+def test_numpy_collection_filters_through_the_metadata_index(tmp_path, monkeypatch):
+    from src.memory import vector_index
+    from src.memory.memory import build_metadata, build_where
+
+    coll = vector_index.NumpyCollection(tmp_path)
+    texts, ids, metas = [], [], []
+    for i in range(40):
+        texts.append(f"note {i} about the budget")
+        ids.append(f"id{i}")
+        metas.append(build_metadata(session=f"2024-05-{i % 4 + 1:02d}", user_id=f"u{i % 2}", timestamp=0))
+    coll.add(texts, ids, metas)
+    read = []
+    records = coll._records
+    monkeypatch.setattr(coll, "_records", lambda rows: read.append(len(rows)) or records(rows))
+
+    where = build_where(user_id="u1", date_from="2024-05-02", date_to="2024-05-03")
+    hits = coll.query(query_texts=["budget"], n_results=50, where=where)
+    want = {f"id{i}" for i in range(40) if i % 2 == 1 and i % 4 + 1 in (2, 3)}
+    assert set(hits["ids"][0]) == want
+    # Only the returned rows were read back; the filter used the index
+    assert read == [len(want)]
+    assert set(coll.get(where=where)["ids"]) == want
+    assert coll.get(where={"speaker": "nobody"})["ids"] == []
+
+    # Unindexed fields fall back to the stored records
+    unindexed = coll.get(where={"$and": [{"user_id": "u0"}, {"chunk": {"$gte": 0}}]})
+    assert unindexed["ids"] == []
+    reopened = vector_index.NumpyCollection(tmp_path)
+    assert set(reopened.get(where=where)["ids"]) == want
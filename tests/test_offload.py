@@ -0,0 +1,155 @@
+import asyncio
+import os
+import sys
+import threading
+import types
+import uuid
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+
+class _DummyCelery:
+    def __init__(self, *a, **k):
+        pass
+
+    def task(self, *args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda fn: fn
+
+
+_celery = types.ModuleType("celery")
+_celery.Celery = _DummyCelery
+sys.modules.setdefault("celery", _celery)
+
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.pool import StaticPool  # noqa: E402
+
+from app import models  # noqa: E402
+from app.database import get_session  # noqa: E402
+from app.routes import enroll  # noqa: E402
+from app.utils import offload  # noqa: E402
+from app.utils.offload import OffloadPool, PoolSaturated  # noqa: E402
+from src.embeddings import EmbeddingService  # noqa: E402
+
+
+def test_pool_bounds_admission_and_reports_saturation():
+    pool = OffloadPool("io", workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def run():
+        first = asyncio.ensure_future(pool.run(release.wait, 5))
+        second = asyncio.ensure_future(pool.run(lambda: "queued"))
+        await asyncio.sleep(0.05)
+        busy = pool.stats()
+        with pytest.raises(PoolSaturated):
+            await pool.run(lambda: "rejected")
+        release.set()
+        return busy, await first, await second
+
+    busy, first, second = asyncio.run(run())
+    assert (first, second) == (True, "queued")
+    assert busy["in_flight"] == 2 and busy["queued"] == 1 and busy["utilization"] == 1.0
+    stats = pool.stats()
+    assert stats["completed"] == 2 and stats["rejected"] == 1 and stats["in_flight"] == 0
+    assert stats["wait_ms"]["p99"] > 0
+    with pytest.raises(ZeroDivisionError):
+        asyncio.run(pool.run(lambda: 1 / 0))
+    assert pool.stats()["failed"] == 1
+    pool.shutdown()
+
+
+def test_process_pool_runs_picklable_work():
+    pool = OffloadPool("cpu", workers=1, max_queue=0, kind="process")
+    try:
+        assert asyncio.run(pool.run(pow, 2, 10)) == 1024
+        assert pool.stats()["completed"] == 1
+    finally:
+        pool.shutdown()
+
+
+class _FakeFace:
+    def __init__(self):
+        self.threads = []
+
+    def embed_many(self, items):
+        self.threads.append(threading.current_thread().name)
+        return [np.full(128, len(items[0]), dtype=np.float32)]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    models.Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+
+    def session():
+        db = Session()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    monkeypatch.chdir(tmp_path)
+    # Encoding runs on threads here; the real pool spawns processes
+    monkeypatch.setattr(offload, "cpu_pool", OffloadPool("cpu", workers=1, max_queue=4))
+    monkeypatch.setattr(offload, "io_pool", OffloadPool("io", workers=2, max_queue=16))
+    app = FastAPI()
+    app.include_router(enroll.router, prefix="/enroll")
+    app.dependency_overrides[get_session] = session
+    client = TestClient(app)
+    client.session_factory = Session
+    yield client
+    offload.io_pool.shutdown()
+    offload.cpu_pool.shutdown()
+
+
+def test_enroll_face_runs_blocking_work_off_the_loop(client, monkeypatch):
+    face = _FakeFace()
+    service = EmbeddingService({"face": face}, max_workers=1)
+    monkeypatch.setattr(enroll, "get_embedding_service", lambda: service)
+    uid = str(uuid.uuid4())
+    files = {
+        name: (f"{name}.jpg", f"{name} image".encode(), "image/jpeg")
+        for name in ("front", "left", "right")
+    }
+    resp = client.post(f"/enroll/face/{uid}", files=files)
+    assert resp.status_code == 200
+    assert face.threads and face.threads[0].startswith("offload-cpu")
+    assert np.load(f"embeddings/{uid}.npy")[0] == len(b"front image")
+    with client.session_factory() as db:
+        sample = db.query(models.FaceSample).filter_by(user_id=uid).one()
+        assert Path(sample.left_path).exists()
+    assert offload.cpu_pool.stats()["completed"] == 1
+    stats = service.stats()
+    assert stats["routes"] == {"face": "cpu"}
+    assert stats["backends"]["face"]["items"] == 1 and stats["pending"] == 0
+    assert offload.io_pool.stats()["completed"] >= 5
+
+    resp = client.post(f"/enroll/face/{uid}", files=files)
+    assert resp.status_code == 409
+
+
+def test_enroll_voice_queues_transcription(client, monkeypatch):
+    queued = []
+    monkeypatch.setattr(
+        enroll.transcribe_voice, "delay", lambda path, uid: queued.append((path, uid)), raising=False
+    )
+    uid = str(uuid.uuid4())
+    resp = client.post(
+        f"/enroll/voice/{uid}", files={"file": ("voice.wav", b"RIFF", "audio/wav")}
+    )
+    assert resp.status_code == 200
+    assert queued == [(str(Path("media") / uid / "voice.enc"), uid)]
+    with client.session_factory() as db:
+        assert db.query(models.VoiceSample).filter_by(user_id=uid).count() == 1
@@ -1,19 +1,26 @@
 import io
-import subprocess
+import os
+import tempfile
+import time
 from pathlib import Path
 import sys
 
+import numpy as np
+
 sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+# Keep transcripts stored by the routes under test out of ./vector_store
+os.environ.setdefault("VECTOR_STORE_DIR", tempfile.mkdtemp(prefix="vector_store-"))
+# Build Whisper and the vector store only when a test touches them
+os.environ["WARM_UP"] = "0"
 import server
 import pytest
 
 @pytest.fixture
 def client(tmp_path, monkeypatch):
     server.SESSION_DIR = tmp_path
-    def fake_run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE):
-        Path(cmd[-1]).write_bytes(b"audio")
-        return subprocess.CompletedProcess(cmd, 0, b"", b"")
-    monkeypatch.setattr(server.subprocess, "run", fake_run)
+    # Routes refresh the session directory through the manager on each call
+    monkeypatch.setattr(server.session_manager, "create_today_session", lambda: str(tmp_path))
+    monkeypatch.setattr(server, "decode_audio", lambda data: np.zeros(1600, dtype=np.float32))
     return server.app.test_client()
 
 def test_transcribe_success(client, monkeypatch):
@@ -60,20 +67,250 @@ def test_search_route(client, monkeypatch):
     assert resp.get_json() == {"results": ["one", "two"]}
 
 
+class FakeDecoder:
+    def __init__(self):
+        self.fed = []
+        self.closed = False
+
+    def feed(self, data):
+        self.fed.append(data)
+        return np.zeros(1600, dtype=np.float32)
+
+    def close(self):
+        self.closed = True
+        return np.zeros(0, dtype=np.float32)
+
+
 def test_handle_chunk_ws(tmp_path, monkeypatch):
     server.SESSION_DIR = tmp_path
 
-    def fake_run(cmd, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE):
-        Path(cmd[-1]).write_bytes(b"audio")
-        return subprocess.CompletedProcess(cmd, 0, b"", b"")
+    decoders = []
 
-    monkeypatch.setattr(server.subprocess, "run", fake_run)
+    def make_decoder():
+        decoders.append(FakeDecoder())
+        return decoders[-1]
+
+    monkeypatch.setattr(server, "StreamDecoder", make_decoder)
     monkeypatch.setattr(server.transcriber, "transcribe", lambda p: "chunk")
     monkeypatch.setattr(server.memory, "add", lambda t: None)
     monkeypatch.setattr(server.session_manager, "create_today_session", lambda: str(tmp_path))
 
     client = server.socketio.test_client(server.app)
     client.emit("chunk", b"data")
-    received = client.get_received()
+    client.emit("chunk", b"more")
+    received = []
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and not any(r["name"] == "transcription" for r in received):
+        received += client.get_received()
+        time.sleep(0.01)
     assert any(r["name"] == "transcription" and r["args"][0] == {"text": "chunk"} for r in received)
 
+    # Both chunks go through a single decoder that is closed on disconnect
+    assert len(decoders) == 1
+    assert decoders[0].fed == [b"data", b"more"]
+    client.disconnect()
+    assert decoders[0].closed
+
+
+
+def _ws_client(tmp_path, monkeypatch, decoder_class):
+    server.SESSION_DIR = tmp_path
+    decoders = []
+
+    def make_decoder():
+        decoders.append(decoder_class())
+        return decoders[-1]
+
+    monkeypatch.setattr(server, "StreamDecoder", make_decoder)
+    monkeypatch.setattr(server, "vad", None)
+    monkeypatch.setattr(server, "STREAMING", False)
+    monkeypatch.setattr(server.session_manager, "create_today_session", lambda: str(tmp_path))
+    return server.socketio.test_client(server.app), decoders
+
+
+def test_chunks_are_reordered_and_the_decoder_tail_is_transcribed(tmp_path, monkeypatch):
+    class TailDecoder(FakeDecoder):
+        def close(self):
+            self.closed = True
+            return np.full(800, 0.1, dtype=np.float32)
+
+    heard = []
+    monkeypatch.setattr(server.transcriber, "transcribe", lambda audio: heard.append(len(audio)) or "words")
+    client, decoders = _ws_client(tmp_path, monkeypatch, TailDecoder)
+    client.emit("chunk", {"rec": 1, "seq": 1, "data": b"b"})
+    client.emit("chunk", {"rec": 1, "seq": 0, "data": b"a"})
+    client.emit("chunk", {"rec": 1, "seq": 2, "data": b"c"})
+    assert [d.fed for d in decoders] == [[b"a", b"b", b"c"]]
+
+    client.disconnect()
+    assert decoders[0].closed
+    deadline = time.monotonic() + 5
+    while time.monotonic() < deadline and sum(heard) < 3 * 1600 + 800:
+        time.sleep(0.01)
+    # The PCM still buffered in ffmpeg at disconnect is transcribed too
+    assert sum(heard) == 3 * 1600 + 800
+
+
+def test_failed_decoder_drops_the_recording_until_a_new_one_starts(tmp_path, monkeypatch):
+    class BrokenDecoder(FakeDecoder):
+        def feed(self, data):
+            if data == b"bad":
+                raise RuntimeError("ffmpeg decoder exited with code 1")
+            return super().feed(data)
+
+    monkeypatch.setattr(server.transcriber, "transcribe", lambda audio: "words")
+    client, decoders = _ws_client(tmp_path, monkeypatch, BrokenDecoder)
+    client.emit("chunk", {"rec": 1, "seq": 0, "data": b"bad"})
+    errors = [r["args"][0] for r in client.get_received() if r["name"] == "transcription"]
+    assert errors and errors[0]["fatal"] is True
+    # A headerless chunk must not start a fresh decoder
+    client.emit("chunk", {"rec": 1, "seq": 1, "data": b"more"})
+    assert len(decoders) == 1 and decoders[0].closed
+
+    client.emit("chunk", {"rec": 2, "seq": 0, "data": b"new"})
+    assert len(decoders) == 2 and decoders[1].fed == [b"new"]
+    client.disconnect()
+
+
+def test_upload_rejected_when_queue_full(client, monkeypatch):
+    def reject(audio):
+        raise server.QueueFullError("transcription queue is full")
+
+    monkeypatch.setattr(server.pipeline, "transcribe", reject)
+    data = {"file": (io.BytesIO(b"data"), "chunk.webm")}
+    resp = client.post("/upload", data=data, content_type="multipart/form-data")
+    assert resp.status_code == 429
+
+
+def test_pipeline_status(client):
+    resp = client.get("/status/pipeline")
+    assert resp.status_code == 200
+    assert {"queued", "active", "rejected", "wait_ms", "run_ms"} <= set(resp.get_json())
+
+
+def test_liveness_and_readiness(client, monkeypatch):
+    assert client.get("/healthz").status_code == 200
+
+    pending = server.LazyResource("pending", lambda: object())
+    monkeypatch.setattr(server, "HEAVY_RESOURCES", (pending,))
+    resp = client.get("/readyz")
+    assert resp.status_code == 503
+    assert resp.get_json()["components"]["pending"]["state"] == "pending"
+
+    pending._resolve()
+    assert pending.ready and pending.describe()["state"] == "ready"
+    resp = client.get("/readyz")
+    assert resp.status_code == 200
+    assert resp.get_json()["ready"] is True
+
+
+def test_upload_skips_silence_with_vad(client, monkeypatch):
+    calls = []
+    monkeypatch.setattr(server, "vad", server.VoiceActivityFilter())
+    monkeypatch.setattr(server.pipeline, "transcribe", lambda audio: calls.append(audio))
+    data = {"file": (io.BytesIO(b"data"), "chunk.webm")}
+    resp = client.post("/upload", data=data, content_type="multipart/form-data")
+    assert resp.status_code == 200
+    assert resp.get_json() == {"text": ""}
+    assert calls == []
+    stats = client.get("/status/vad").get_json()
+    assert stats["enabled"] is True
+    assert stats["total"]["skipped_chunks"] == 1
+
+
+def test_status_lines_and_cursor(client, tmp_path):
+    store = server._transcript_store(tmp_path)
+    for line in ("one", "two", "three"):
+        store.append(line)
+    assert client.get("/status/last-line").get_json() == {"text": "three"}
+    resp = client.get("/status/latest?n=2").get_json()
+    assert resp == {"text": "three", "lines": ["two", "three"], "cursor": 3}
+
+    store.append("four")
+    resp = client.get("/status/latest?cursor=3").get_json()
+    assert resp["lines"] == ["four"] and resp["cursor"] == 4
+    assert client.get("/status/latest?cursor=x").status_code == 400
+
+
+def test_concurrent_appends_publish_in_order(tmp_path, monkeypatch):
+    import threading
+
+    monkeypatch.setattr(server, "feed", server.TranscriptFeed(replay=100))
+    threads = [
+        threading.Thread(target=server._append_transcript, args=(tmp_path, f"line {i}"))
+        for i in range(20)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    events = server.feed.since(tmp_path.name, 0)
+    assert [e["seq"] for e in events] == list(range(1, 21))
+    lines = (tmp_path / "transcript.txt").read_text().splitlines()
+    assert [e["text"] for e in events] == lines
+
+
+def test_subscribe_and_sse_resume_from_seq(tmp_path, monkeypatch):
+    server.SESSION_DIR = tmp_path
+    monkeypatch.setattr(server, "feed", server.TranscriptFeed(replay=2))
+    server._append_transcript(tmp_path, "one")
+    server._append_transcript(tmp_path, "A: two\nB: three")
+
+    sio = server.socketio.test_client(server.app)
+    sio.get_received()
+    sio.emit("subscribe", {"since": 0})
+    received = sio.get_received()
+    assert received[0]["args"][0] == {"session": tmp_path.name, "seq": 3}
+    # Line 1 is older than the replay buffer and is read back from the file
+    assert [r["args"][0]["seq"] for r in received[1:]] == [1, 2, 3]
+
+    server._append_transcript(tmp_path, "four")
+    pushed = sio.get_received()
+    assert pushed[0]["args"][0] == {"seq": 4, "text": "four", "session": tmp_path.name}
+    sio.disconnect()
+
+    client = server.app.test_client()
+    resp = client.get("/stream/transcript", headers={"Last-Event-ID": "2"})
+    assert resp.mimetype == "text/event-stream"
+    body = b""
+    for chunk in resp.response:
+        body += chunk
+        if b"four" in body:
+            break
+    resp.close()
+    assert b"id: 3\nevent: transcript" in body and b'"text": "four"' in body
+    assert b'"seq": 2' not in body
+
+
+def test_multi_line_transcript_is_pushed_line_by_line(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "feed", server.TranscriptFeed())
+    monkeypatch.setattr(server.transcriber, "transcribe", lambda audio: "A: hi there\nB: hello\nA: bye")
+    sio = server.socketio.test_client(server.app)
+    sio.emit("subscribe", {"since": 0})
+    sio.get_received()
+
+    data = {"file": (io.BytesIO(b"data"), "video.webm")}
+    resp = client.post("/transcribe", data=data, content_type="multipart/form-data")
+    assert resp.status_code == 200
+    events = [r["args"][0] for r in sio.get_received() if r["name"] == "final_transcript"]
+    # One event per line, in order; joined by seq they give the whole text
+    assert [e["seq"] for e in events] == [1, 2, 3]
+    assert "\n".join(e["text"] for e in events) == resp.get_json()["text"]
+    sio.disconnect()
+
+
+def test_search_route_filters_and_pages(client, monkeypatch):
+    calls = []
+
+    def search_page(query, limit=10, cursor=None, **filters):
+        calls.append((query, limit, cursor, filters))
+        return {"results": ["hit"], "metadatas": [{}], "next_cursor": None}
+
+    monkeypatch.setattr(server.memory, "search_page", search_page)
+    resp = client.get("/search?q=hi&speaker=A&from=2024-05-01&limit=5&cursor=5")
+    assert resp.status_code == 200
+    assert resp.get_json()["results"] == ["hit"]
+    assert calls == [("hi", 5, "5", {"speaker": "A", "date_from": "2024-05-01"})]
+    assert client.get("/search?q=hi&limit=many").status_code == 400
+    client.get("/search?q=hi&limit=5&mode=vector")
+    assert calls[-1] == ("hi", 5, None, {"mode": "vector"})
@@ -38,3 +38,58 @@ def test_get_latest_session_returns_most_recent(tmp_path):
     old_dir.mkdir()
     new_dir.mkdir()
     assert manager.get_latest_session() == str(new_dir)
+
+
+def test_transcript_store_tail_and_cursor(tmp_path):
+    from src.sessions import TranscriptStore
+
+    path = tmp_path / "transcript.txt"
+    path.write_text("one\ntwo\n", encoding="utf-8")
+    store = TranscriptStore(path, tail_size=2)
+    assert store.append("A: three\nB: four") == 4
+    assert store.last(3) == ["two", "A: three", "B: four"]
+    # Lines older than the in-memory tail are read from their offsets
+    assert store.since(0, limit=2) == (["one", "two"], 2)
+
+    # Appends by other writers are indexed on the next call
+    with open(path, "a", encoding="utf-8") as fh:
+        fh.write("five\n")
+    assert store.since(4) == (["five"], 5)
+    path.write_text("fresh\n", encoding="utf-8")
+    assert store.last() == ["fresh"] and len(store) == 1
+
+
+def test_transcript_feed_replays_after_seq():
+    from src.sessions import TranscriptFeed
+
+    feed = TranscriptFeed(replay=2)
+    assert feed.since("s", 0) is None
+    for seq, text in enumerate(["a", "b", "c"], start=1):
+        feed.publish("s", seq, text)
+    assert [e["text"] for e in feed.since("s", 1)] == ["b", "c"]
+    assert feed.since("s", 3) == []
+    # Line 1 was evicted, so the caller must fall back to the file
+    assert feed.since("s", 0) is None
+    assert feed.wait("s", 3, timeout=0.01) is False
+
+
+def test_transcript_feed_keeps_buffer_on_out_of_order_seq():
+    from src.sessions import TranscriptFeed
+
+    feed = TranscriptFeed(replay=4)
+    for seq in (1, 3, 2):
+        feed.publish("s", seq, f"line {seq}")
+    assert [e["seq"] for e in feed.since("s", 0)] == [1, 2, 3]
+    feed.publish("s", 1, "fresh", reset=True)
+    assert [e["text"] for e in feed.since("s", 0)] == ["fresh"]
+
+
+def test_transcript_store_counts_truncations(tmp_path):
+    from src.sessions import TranscriptStore
+
+    store = TranscriptStore(tmp_path / "transcript.txt")
+    store.append("one\ntwo")
+    assert store.generation == 0
+    (tmp_path / "transcript.txt").write_text("", encoding="utf-8")
+    assert store.append("again") == 1
+    assert store.generation == 1
@@ -0,0 +1,336 @@
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.transcription.audio import pcm16_to_float32
+from src.transcription.base import TranscriptionService
+
+
+class DummyModel:
+    def __init__(self):
+        self.calls = []
+
+    def transcribe(self, audio):
+        self.calls.append(audio)
+        return {"text": "hello"}
+
+
+def test_pcm16_to_float32_scales_and_drops_odd_byte():
+    data = np.array([0, 16384, -32768], dtype="<i2").tobytes() + b"\x01"
+    samples = pcm16_to_float32(data)
+    assert samples.dtype == np.float32
+    assert samples.tolist() == [0.0, 0.5, -1.0]
+
+
+def test_stream_decoder_writes_one_chunk_at_a_time(monkeypatch):
+    import threading
+    import time
+
+    from src.transcription.audio import StreamDecoder
+
+    class Stdin:
+        def __init__(self):
+            self.writing = False
+            self.overlaps = 0
+            self.data = b""
+
+        def write(self, data):
+            self.overlaps += self.writing
+            self.writing = True
+            for byte in data:
+                self.data += bytes([byte])
+                time.sleep(0.001)
+            self.writing = False
+
+        def flush(self):
+            pass
+
+        def close(self):
+            pass
+
+    class Proc:
+        returncode = 0
+
+        def __init__(self):
+            self.stdin = Stdin()
+
+        def poll(self):
+            return None
+
+        def wait(self, timeout=None):
+            return 0
+
+    proc = Proc()
+    decoder = StreamDecoder(settle=0.001, timeout=0.01)
+    monkeypatch.setattr(decoder, "_start", lambda: proc)
+    chunks = [bytes([n]) * 20 for n in range(4)]
+    threads = [threading.Thread(target=decoder.feed, args=(chunk,)) for chunk in chunks]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert proc.stdin.overlaps == 0
+    assert sorted(proc.stdin.data[i : i + 20] for i in range(0, 80, 20)) == chunks
+    decoder.close()
+    with pytest.raises(RuntimeError):
+        decoder.feed(b"late")
+
+
+def test_transcribe_passes_pcm_to_model():
+    service = TranscriptionService()
+    service.model = DummyModel()
+    audio = np.zeros(16000, dtype=np.float32)
+    assert service.transcribe(audio) == "hello"
+    assert service.model.calls[0] is audio
+    # Empty chunks never reach the model
+    assert service.transcribe(np.zeros(0, dtype=np.float32)) == ""
+    assert len(service.model.calls) == 1
+
+
+class ScriptedService(TranscriptionService):
+    """Return a scripted sequence of word hypotheses."""
+
+    def __init__(self, hypotheses):
+        super().__init__()
+        self.hypotheses = list(hypotheses)
+
+    def transcribe_words(self, audio):
+        from src.transcription.base import Word
+
+        words = self.hypotheses.pop(0)
+        return [Word(i * 0.5, i * 0.5 + 0.4, w) for i, w in enumerate(words.split())]
+
+
+def test_streaming_commits_stable_prefix():
+    service = ScriptedService(["hello wor", "hello world how", "how are you"])
+    stream = service.stream(min_chunk_seconds=0.5)
+    chunk = np.zeros(8000, dtype=np.float32)
+
+    assert stream.push(chunk) == [{"text": "hello wor", "final": False}]
+    # "hello" agreed across two hypotheses and is committed; its audio is trimmed
+    assert stream.push(chunk) == [
+        {"text": "hello", "final": True},
+        {"text": "world how", "final": False},
+    ]
+    assert stream.buffered_seconds == pytest.approx(0.6)
+    assert stream.push(chunk) == [{"text": "how are you", "final": False}]
+
+
+def test_streaming_waits_for_min_chunk():
+    service = ScriptedService(["hi"])
+    stream = service.stream(min_chunk_seconds=1.0)
+    assert stream.push(np.zeros(8000, dtype=np.float32)) == []
+    assert stream.push(np.zeros(8000, dtype=np.float32)) == [{"text": "hi", "final": False}]
+
+
+def test_pipeline_runs_jobs_and_rejects_when_full():
+    import threading
+
+    from src.transcription.pipeline import QueueFullError, TranscriptionPipeline
+
+    service = TranscriptionService()
+    service.model = DummyModel()
+    pipeline = TranscriptionPipeline(service, concurrency=1, max_queue=1)
+    assert pipeline.transcribe(np.zeros(10, dtype=np.float32)).result(timeout=5) == "hello"
+
+    gate = threading.Event()
+    blocker = pipeline.submit(gate.wait)
+    while pipeline.stats()["active"] == 0:
+        pass
+    queued = pipeline.submit(lambda: "queued")
+    with pytest.raises(QueueFullError):
+        pipeline.submit(lambda: "rejected")
+    gate.set()
+    assert blocker.result(timeout=5) is True
+    assert queued.result(timeout=5) == "queued"
+    stats = pipeline.stats()
+    assert stats["rejected"] == 1
+    pipeline.shutdown()
+    assert pipeline.stats()["completed"] == 3
+
+
+def test_pipeline_workers_overlap_jobs_but_not_inference():
+    import threading
+    import time
+
+    from src.transcription.pipeline import TranscriptionPipeline
+
+    class CountingModel(DummyModel):
+        active = peak = 0
+
+        def transcribe(self, audio):
+            CountingModel.active += 1
+            CountingModel.peak = max(CountingModel.peak, CountingModel.active)
+            time.sleep(0.02)
+            CountingModel.active -= 1
+            return {"text": "hello"}
+
+    service = TranscriptionService()
+    service.model = CountingModel()
+    pipeline = TranscriptionPipeline(service, concurrency=2)
+    both = threading.Barrier(2, timeout=5)
+
+    def job():
+        both.wait()  # e.g. decoding, which does run in parallel
+        return service.transcribe(np.zeros(10, dtype=np.float32))
+
+    futures = [pipeline.submit(job) for _ in range(2)]
+    assert [f.result(timeout=5) for f in futures] == ["hello", "hello"]
+    assert CountingModel.peak == 1
+    pipeline.shutdown()
+
+
+def test_batching_engine_groups_concurrent_requests():
+    from concurrent.futures import ThreadPoolExecutor
+
+    from src.transcription.batching import BatchingEngine
+
+    class RecordingEngine(BatchingEngine):
+        sizes = []
+
+        def _decode_batch(self, audios):
+            self.sizes.append(len(audios))
+            return [f"len={len(a)}" for a in audios]
+
+    engine = RecordingEngine(DummyModel(), max_batch_size=4, max_wait_ms=200)
+    audios = [np.zeros(n, dtype=np.float32) for n in (100, 200, 300, 400)]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        texts = list(pool.map(engine.transcribe, audios))
+    # Each caller gets its own result back, in a single batch
+    assert texts == ["len=100", "len=200", "len=300", "len=400"]
+    assert RecordingEngine.sizes == [4]
+    assert engine.mean_batch_size == 4
+
+
+def test_registry_shares_and_unloads_models():
+    from src.transcription.registry import ModelRegistry
+
+    loads = []
+
+    def loader(name, device, compute_type):
+        loads.append((name, device, compute_type))
+        return DummyModel()
+
+    registry = ModelRegistry(loader=loader)
+    first = TranscriptionService("tiny", registry=registry)
+    second = TranscriptionService("tiny", registry=registry)
+    assert first.model is second.model
+    assert first._model_lock is second._model_lock
+    assert loads == [("tiny", None, None)]
+    assert registry.stats()[0]["refs"] == 2
+
+    first.close()
+    assert registry.unload_idle(max_idle=0) == []
+    second.close()
+    assert registry.unload_idle(max_idle=0) == [("tiny", None, None)]
+    assert registry.stats() == []
+
+
+def test_merge_turns_joins_adjacent_same_speaker():
+    from src.transcription.diarization import merge_turns
+
+    turns = [(0.0, 1.0, "A"), (1.2, 2.0, "A"), (2.1, 3.0, "B"), (5.0, 6.0, "B"), (6.1, 40.0, "B")]
+    assert merge_turns(turns, max_gap=0.5, max_length=30.0) == [
+        (0.0, 2.0, "A"),
+        (2.1, 3.0, "B"),
+        (5.0, 6.0, "B"),
+        (6.1, 40.0, "B"),
+    ]
+
+
+def test_diarize_slices_decoded_audio_once(monkeypatch):
+    import types
+
+    from src.transcription import diarization as diar_mod
+
+    class FakeAnnotation:
+        def itertracks(self, yield_label=False):
+            for start, end, speaker in [(0.0, 1.0, "A"), (1.1, 2.0, "A"), (2.0, 3.0, "B")]:
+                yield types.SimpleNamespace(start=start, end=end), None, speaker
+
+    decoded = []
+
+    def fake_decode(path):
+        decoded.append(path)
+        return np.arange(3 * 16000, dtype=np.float32)
+
+    monkeypatch.setattr(diar_mod, "decode_audio", fake_decode)
+    monkeypatch.setattr(diar_mod.DiarizationService, "_pipeline_input", staticmethod(lambda a: a))
+
+    service = TranscriptionService()
+    service.model = DummyModel()
+    diarizer = diar_mod.DiarizationService.__new__(diar_mod.DiarizationService)
+    diarizer.transcriber = service
+    diarizer.max_gap = 0.5
+    diarizer.max_turn_length = 30.0
+    diarizer.mode = "segments"
+    diarizer.pipeline = lambda audio: FakeAnnotation()
+
+    assert diarizer.diarize("meeting.wav") == "A: hello\nB: hello"
+    assert decoded == ["meeting.wav"]
+    # The two "A" turns were merged and every segment is a view of one array
+    first, second = service.model.calls
+    assert len(first) == 2 * 16000 and first.base is not None
+    assert first[0] == 0.0 and second[0] == 2 * 16000
+
+
+def test_assign_speakers_uses_overlapping_turn():
+    from src.transcription.base import Word
+    from src.transcription.diarization import assign_speakers
+
+    turns = [(0.0, 2.0, "A"), (2.0, 4.0, "B"), (5.0, 6.0, "A")]
+    words = [
+        Word(0.1, 0.5, "hi"),
+        Word(0.6, 1.0, "there"),
+        Word(1.9, 2.6, "hello"),  # mostly inside B's turn
+        Word(4.2, 4.4, "um"),  # between turns, nearest is B
+        Word(5.1, 5.5, "bye"),
+    ]
+    assert assign_speakers(words, turns) == [("A", "hi there"), ("B", "hello um"), ("A", "bye")]
+
+
+def test_vad_trims_silence_and_counts_skipped_audio():
+    from src.transcription.vad import VoiceActivityFilter
+
+    vad = VoiceActivityFilter(threshold_db=-40, frame_ms=10, min_speech_ms=30, padding_ms=0)
+    audio = np.zeros(16000, dtype=np.float32)
+    audio[4000:8000] = 0.1  # 250 ms of "speech"
+    audio[12000] = 1.0  # a click shorter than min_speech_ms
+    assert vad.speech_regions(audio) == [(4000, 8000)]
+
+    assert len(vad.filter(audio, session="a")) == 4000
+    assert vad.filter(np.zeros(8000, dtype=np.float32), session="a").size == 0
+    stats = vad.stats()
+    assert stats["sessions"]["a"] == {
+        "chunks": 2,
+        "skipped_chunks": 1,
+        "seconds": 1.5,
+        "skipped_seconds": 1.25,
+    }
+    assert stats["total"]["skipped_seconds"] == 1.25
+
+
+def test_transcription_cache_serves_repeated_audio(tmp_path, monkeypatch):
+    from src.transcription import cache as cache_mod
+
+    service = TranscriptionService(cache={"enabled": True, "directory": str(tmp_path)})
+    service.model = DummyModel()
+    audio = np.ones(1600, dtype=np.float32)
+    assert service.transcribe(audio) == "hello"
+    assert service.transcribe(audio.copy()) == "hello"
+    assert len(service.model.calls) == 1
+    assert service.cache.stats()["memory_hits"] == 1
+
+    # A fresh process finds the result on disk; expired entries are misses
+    other = cache_mod.TranscriptionCache(directory=tmp_path, ttl=60)
+    key = cache_mod.TranscriptionCache.key(audio, service._model_key, diarization=None)
+    assert other.get(key) == "hello"
+    assert other.stats()["disk_hits"] == 1
+    now = cache_mod.time.time()
+    monkeypatch.setattr(cache_mod.time, "time", lambda: now + 120)
+    assert cache_mod.TranscriptionCache(directory=tmp_path, ttl=60).get(key) is None
@@ -1,15 +1,15 @@
 import os
-import uuid
-from pathlib import Path
 from typing import List
 
 import requests
 import numpy as np
 from celery import Celery
 
-from app.utils.encryption import decrypt_file
+from app.utils.encryption import decrypt_buffer
+from app.utils.fetch import get_fetcher
 from app.database import SessionLocal
 from app.models import VoicePrint, FacePrint
+from src.embeddings import RemoteFaceBackend, VoiceBackend, get_embedding_service
 
 try:
     from pv_eagle_python import Eagle
@@ -24,6 +24,26 @@ celery_app = Celery(
 )
 
 
+def _eagle():
+    if Eagle is None:
+        raise RuntimeError("pv_eagle_python not available")
+    return Eagle()
+
+
+# Voice profiles and face encodings go through the shared embedding pool.
+# Faces are encoded by the API's /embed endpoint unless FACE_EMBEDDER=local.
+embeddings = get_embedding_service(
+    max_workers=int(os.getenv("EMBED_WORKERS", "2")),
+    executor=os.getenv("EMBED_EXECUTOR", "thread"),
+)
+embeddings.register("voice", VoiceBackend(_eagle))
+if os.getenv("FACE_EMBEDDER", "remote") == "remote":
+    embeddings.register("face", RemoteFaceBackend(f"{API_BASE}/embed"))
+
+# Assets are downloaded over one keep-alive pool, several at a time
+fetcher = get_fetcher()
+
+
 def _post_callback(path: str, payload: dict) -> None:
     """Send a POST request to ``API_BASE``/``path`` ignoring failures."""
     url = f"{API_BASE}{path}"
@@ -36,48 +56,22 @@ def _post_callback(path: str, payload: dict) -> None:
 @celery_app.task(autoretry_for=(Exception,), retry_backoff=True, retry_kwargs={"max_retries": 3})
 def speaker_job(tus_url: str, user_id: str) -> None:
     """Enroll a speaker from a remote encrypted WAV file."""
-    tmp_enc = Path("/tmp") / f"{uuid.uuid4()}.wav.enc"
-    tmp_wav = tmp_enc.with_suffix(".wav")
-    try:
-        resp = requests.get(tus_url, timeout=30)
-        resp.raise_for_status()
-        tmp_enc.write_bytes(resp.content)
-        decrypt_file(str(tmp_enc), str(tmp_wav))
-        if Eagle is None:
-            raise RuntimeError("pv_eagle_python not available")
-        eagle = Eagle()
-        vector: bytes = eagle.enroll(str(tmp_wav))
-        with SessionLocal() as db:
-            vp = VoicePrint(user_id=user_id, vector=vector)
-            db.add(vp)
-            db.commit()
-    finally:
-        tmp_enc.unlink(missing_ok=True)
-        tmp_wav.unlink(missing_ok=True)
+    # Decrypted audio stays in memory all the way to the profiler
+    wav = decrypt_buffer(fetcher.fetch_sync(tus_url))
+    vector: bytes = embeddings.embed("voice", wav).tobytes()
+    with SessionLocal() as db:
+        vp = VoicePrint(user_id=user_id, vector=vector)
+        db.add(vp)
+        db.commit()
     _post_callback("/internal/voice_done", {"user_id": user_id})
 
 
 @celery_app.task(autoretry_for=(Exception,), retry_backoff=True, retry_kwargs={"max_retries": 3})
 def face_job(tus_urls: List[str], user_id: str) -> None:
     """Enroll a face from multiple encrypted images."""
-    vectors = []
-    for url in tus_urls:
-        tmp_enc = Path("/tmp") / f"{uuid.uuid4()}.jpg.enc"
-        tmp_img = tmp_enc.with_suffix(".jpg")
-        try:
-            resp = requests.get(url, timeout=30)
-            resp.raise_for_status()
-            tmp_enc.write_bytes(resp.content)
-            decrypt_file(str(tmp_enc), str(tmp_img))
-            with open(tmp_img, "rb") as fh:
-                r = requests.post(f"{API_BASE}/embed", files={"file": fh}, timeout=30)
-            r.raise_for_status()
-            data = r.json()
-            embedding = np.array(data.get("vector") or data.get("embedding"), dtype=np.float32)
-            vectors.append(embedding)
-        finally:
-            tmp_enc.unlink(missing_ok=True)
-            tmp_img.unlink(missing_ok=True)
+    images = [decrypt_buffer(body) for body in fetcher.fetch_all_sync(tus_urls)]
+    # All images are encoded as one batch
+    vectors = embeddings.embed_many("face", images)
     if vectors:
         avg = np.mean(vectors, axis=0)
         with SessionLocal() as db:
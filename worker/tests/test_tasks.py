@@ -9,6 +9,7 @@ import types
 import pytest
 import uuid
 import numpy as np
+import httpx
 
 os.environ.setdefault("DATABASE_URL", "sqlite:///test.db")
 sys.modules.setdefault("whisper", types.ModuleType("whisper"))
@@ -29,6 +30,7 @@ sys.modules.setdefault("celery", cel)
 from app import models, database
 from app.utils import whisper_worker
 from worker import tasks
+from app.utils.fetch import Fetcher
 
 @pytest.fixture()
 def setup_db(tmp_path, monkeypatch):
@@ -44,14 +46,13 @@ def test_transcribe_voice_updates_sample(setup_db, tmp_path, monkeypatch):
     voice = tmp_path / "sample.enc"
     voice.write_bytes(b"data")
 
-    def fake_decrypt(src, dest):
-        Path(dest).write_bytes(Path(src).read_bytes())
-
     class DummyModel:
-        def transcribe(self, path):
+        def transcribe(self, audio):
+            assert isinstance(audio, np.ndarray)
             return {"text": "hi"}
 
-    monkeypatch.setattr(whisper_worker, "decrypt_file", fake_decrypt)
+    monkeypatch.setattr(whisper_worker, "decrypt_buffer", lambda src: src.read())
+    monkeypatch.setattr(whisper_worker, "decode_audio", lambda data: np.zeros(len(data), np.float32))
     monkeypatch.setattr(whisper_worker, "get_model", lambda: DummyModel())
     monkeypatch.chdir(tmp_path)
 
@@ -69,6 +70,28 @@ def test_transcribe_voice_updates_sample(setup_db, tmp_path, monkeypatch):
         sample = db.query(models.VoiceSample).filter_by(user_id=uid).first()
         assert sample.transcript_path == str(out)
 
+def test_transcribe_voice_cache_keys_on_decoded_pcm(setup_db, tmp_path, monkeypatch):
+    # Two containers (e.g. a remux) that decode to the same samples
+    first, second = tmp_path / "a.enc", tmp_path / "b.enc"
+    first.write_bytes(b"webm")
+    second.write_bytes(b"ogg!")
+    calls = []
+
+    class DummyModel:
+        def transcribe(self, audio):
+            calls.append(audio)
+            return {"text": "hi"}
+
+    monkeypatch.setattr(whisper_worker, "decrypt_buffer", lambda src: src.read())
+    monkeypatch.setattr(whisper_worker, "decode_audio", lambda data: np.ones(160, np.float32))
+    monkeypatch.setattr(whisper_worker, "get_model", lambda: DummyModel())
+    monkeypatch.chdir(tmp_path)
+
+    whisper_worker.transcribe_voice(str(first), str(uuid.uuid4()))
+    whisper_worker.transcribe_voice(str(second), str(uuid.uuid4()))
+
+    assert len(calls) == 1
+
 def _setup_worker_db(tmp_path, monkeypatch):
     engine = create_engine(f"sqlite:///{tmp_path}/db.sqlite")
     SessionLocal = sessionmaker(bind=engine)
@@ -81,27 +104,20 @@ def _setup_worker_db(tmp_path, monkeypatch):
 def test_speaker_job_vectorization(tmp_path, monkeypatch):
     SessionLocal = _setup_worker_db(tmp_path, monkeypatch)
 
-    def fake_get(url, timeout=30):
-        class Resp:
-            content = b"enc"
-            def raise_for_status(self): pass
-        return Resp()
-
     def fake_post(url, json=None, files=None, timeout=10):
         class Resp:
             def raise_for_status(self): pass
         return Resp()
 
-    def fake_decrypt(src, dest):
-        Path(dest).write_bytes(b"wav")
-
     class DummyEagle:
         def enroll(self, path):
+            assert Path(path).read_bytes() == b"wav"
             return b"vec"
 
-    monkeypatch.setattr(tasks.requests, "get", fake_get)
+    transport = httpx.MockTransport(lambda request: httpx.Response(200, content=b"enc"))
+    monkeypatch.setattr(tasks, "fetcher", Fetcher(transport=transport))
     monkeypatch.setattr(tasks.requests, "post", fake_post)
-    monkeypatch.setattr(tasks, "decrypt_file", fake_decrypt)
+    monkeypatch.setattr(tasks, "decrypt_buffer", lambda data: b"wav")
     monkeypatch.setattr(tasks, "Eagle", DummyEagle)
     monkeypatch.setattr(tasks, "_post_callback", lambda *a, **k: None)
 
@@ -119,32 +135,26 @@ def test_face_job_vectorization(tmp_path, monkeypatch):
         np.array([1.0, 2.0], dtype=np.float32),
         np.array([3.0, 4.0], dtype=np.float32),
     ]
-    get_calls = []
+    by_image = {b"/url1": vectors[0], b"/url2": vectors[1]}
 
-    def fake_get(url, timeout=30):
-        class Resp:
-            content = b"enc"
-            def raise_for_status(self): pass
-        get_calls.append(url)
-        return Resp()
+    def serve(request):
+        return httpx.Response(200, content=request.url.path.encode())
 
     def fake_post(url, files=None, timeout=30):
+        _, image = files["file"]
         class Resp:
             def raise_for_status(self): pass
-            def json(self): return {"vector": vectors[len(get_calls)-1].tolist()}
+            def json(self): return {"vector": by_image[image].tolist()}
         return Resp()
 
-    def fake_decrypt(src, dest):
-        Path(dest).write_bytes(b"img")
-
-    monkeypatch.setattr(tasks.requests, "get", fake_get)
+    monkeypatch.setattr(tasks, "fetcher", Fetcher(transport=httpx.MockTransport(serve)))
     monkeypatch.setattr(tasks.requests, "post", fake_post)
-    monkeypatch.setattr(tasks, "decrypt_file", fake_decrypt)
+    monkeypatch.setattr(tasks, "decrypt_buffer", bytes)
     monkeypatch.setattr(tasks, "_post_callback", lambda *a, **k: None)
     monkeypatch.setattr(tasks, "Eagle", None)
 
     uid = str(uuid.uuid4())
-    tasks.face_job(["url1", "url2"], uid)
+    tasks.face_job(["http://tus/url1", "http://tus/url2"], uid)
 
     avg = np.mean(vectors, axis=0)
     with SessionLocal() as db: